@@ -0,0 +1,158 @@
+import os
+import json
+import hashlib
+import pandas as pd
+
+# Parquet 依赖 pyarrow，未安装时退回 pickle（同样按列存储的 DataFrame，只是不能按列投影读取）
+try:
+    import pyarrow.parquet as pq
+    _HAS_ARROW = True
+except ImportError:
+    _HAS_ARROW = False
+
+_FRAME_EXT = ".parquet" if _HAS_ARROW else ".pkl"
+
+# 缓存清单格式版本：清单结构或文件布局变化时递增，旧缓存随之失效
+FORMAT_VERSION = 2
+
+
+def file_fingerprint(file_path, chunk_size=1 << 20):
+    """
+    计算源文件的内容哈希（sha1）
+    """
+    h = hashlib.sha1()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def write_frame(df, path):
+    """
+    写入列式缓存文件
+    """
+    tmp_path = path + ".tmp"
+    if _HAS_ARROW:
+        df.to_parquet(tmp_path, index=False)
+    else:
+        df.to_pickle(tmp_path)
+    # 先写临时文件再替换，避免中途中断留下损坏的缓存
+    os.replace(tmp_path, path)
+
+
+def read_frame(path, columns=None):
+    """
+    读取列式缓存文件，columns 不为空时只读取指定列
+    """
+    if _HAS_ARROW:
+        return pd.read_parquet(path, columns=columns)
+    df = pd.read_pickle(path)
+    return df[columns] if columns is not None else df
+
+
+def iter_frame(path, chunk_rows, columns=None):
+    """
+    分批读取列式缓存文件，每批不超过 chunk_rows 行（Parquet 按行组流式读取，pickle 只能整表读取后切片）
+    """
+    if _HAS_ARROW:
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows, columns=columns):
+            yield batch.to_pandas()
+        return
+    df = read_frame(path, columns=columns)
+    for start in range(0, len(df), chunk_rows):
+        yield df.iloc[start:start + chunk_rows]
+
+
+def _jsonable(schema):
+    # 与写入清单后再读回的结果一致（元组变为列表等），便于直接比较
+    return json.loads(json.dumps(schema, ensure_ascii=False))
+
+
+class ColumnarCache:
+    """
+    Excel 工作表的持久化列式缓存
+
+    以源文件的 (内容哈希, 修改时间) 为键：修改时间与大小未变时直接命中；
+    修改时间变化但内容哈希不变时刷新清单后命中；内容变化时重建。
+    清单同时记录每张工作表的读取模式（列与类型，由调用方给出）及格式版本，不一致时同样重建；
+    缓存文件名包含源文件绝对路径的哈希，不同目录下的同名工作簿互不覆盖。
+    """
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _base(self, file_path):
+        stem = os.path.splitext(os.path.basename(file_path))[0]
+        path_hash = hashlib.sha1(os.path.abspath(file_path).encode("utf-8")).hexdigest()[:12]
+        return os.path.join(self.cache_dir, f"{stem}_{path_hash}")
+
+    def _manifest_path(self, file_path):
+        return self._base(file_path) + ".json"
+
+    def _frame_path(self, file_path, sheet_name):
+        return f"{self._base(file_path)}.{sheet_name}{_FRAME_EXT}"
+
+    def _load_manifest(self, file_path):
+        try:
+            with open(self._manifest_path(file_path), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _save_manifest(self, file_path, manifest):
+        tmp_path = self._manifest_path(file_path) + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self._manifest_path(file_path))
+
+    def is_valid(self, file_path, sheet_names, schemas=None):
+        """
+        判断指定工作表的缓存是否与当前源文件及读取模式 schemas（{sheet_name: 可 JSON 序列化的模式}）一致
+        """
+        manifest = self._load_manifest(file_path)
+        if manifest is None or manifest.get("format") != FORMAT_VERSION:
+            return False
+        sheets = manifest.get("sheets", {})
+        if any(s not in sheets for s in sheet_names):
+            return False
+        if schemas is not None and any(sheets[s] != _jsonable(schemas[s]) for s in sheet_names):
+            return False
+        if any(not os.path.exists(self._frame_path(file_path, s)) for s in sheet_names):
+            return False
+
+        stat = os.stat(file_path)
+        if manifest.get("mtime") == stat.st_mtime and manifest.get("size") == stat.st_size:
+            return True
+
+        # 修改时间变化：按内容哈希确认是否真的改动
+        if manifest.get("sha1") == file_fingerprint(file_path):
+            manifest["mtime"] = stat.st_mtime
+            manifest["size"] = stat.st_size
+            self._save_manifest(file_path, manifest)
+            return True
+        return False
+
+    def load(self, file_path, sheet_name, columns=None):
+        return read_frame(self._frame_path(file_path, sheet_name), columns=columns)
+
+    def iter_chunks(self, file_path, sheet_name, chunk_rows, columns=None):
+        return iter_frame(self._frame_path(file_path, sheet_name), chunk_rows, columns=columns)
+
+    def store(self, file_path, frames, schemas=None):
+        """
+        写入一组工作表缓存，frames 为 {sheet_name: DataFrame}，schemas 为对应的读取模式
+        """
+        stat = os.stat(file_path)
+        sha1 = file_fingerprint(file_path)
+        manifest = self._load_manifest(file_path)
+        if manifest is None or manifest.get("format") != FORMAT_VERSION or manifest.get("sha1") != sha1:
+            manifest = {"format": FORMAT_VERSION, "sheets": {}}
+
+        for sheet_name, df in frames.items():
+            write_frame(df, self._frame_path(file_path, sheet_name))
+            manifest["sheets"][sheet_name] = _jsonable(None if schemas is None else schemas[sheet_name])
+
+        manifest.update({"source": os.path.abspath(file_path), "sha1": sha1,
+                         "mtime": stat.st_mtime, "size": stat.st_size})
+        self._save_manifest(file_path, manifest)
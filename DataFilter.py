@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+import config
+
+
+def normalize_stations(stations):
+    """
+    工位过滤条件 → 工位编号集合（None 表示不过滤）
+
+    每一项可以是工位编号、config.station_map 中的工位名，或线体名（如 "Line 2"，表示该线体全部工位）
+    """
+    if stations is None:
+        return None
+    if isinstance(stations, (str, int, np.integer)):
+        stations = [stations]
+    numbers = set()
+    for item in stations:
+        if isinstance(item, (int, np.integer)):
+            numbers.add(int(item))
+        elif item in config.station_map:
+            numbers.add(config.station_map[item])
+        else:
+            line = [n for name, n in config.station_map.items() if name.startswith(f"{item} ")]
+            if not line:
+                raise ValueError(f"未知工位或线体: {item}")
+            numbers.update(line)
+    return numbers
+
+
+def date_mask(dates, start_date=None, end_date=None):
+    """
+    日期是否在 [start_date, end_date] 内（按天比较，两端都包含；None 表示不限），返回布尔数组
+    """
+    dates = pd.to_datetime(pd.Series(dates)).to_numpy()
+    mask = np.ones(len(dates), dtype=bool)
+    if start_date is not None:
+        mask &= dates >= pd.Timestamp(start_date).normalize().to_datetime64()
+    if end_date is not None:
+        mask &= dates < (pd.Timestamp(end_date).normalize() + pd.Timedelta(days=1)).to_datetime64()
+    return mask
+
+
+def select_rows(df, date_col, station_col=None, start_date=None, end_date=None, stations=None):
+    """
+    按日期范围与工位过滤行；没有任何条件时原样返回
+    """
+    if start_date is None and end_date is None and stations is None:
+        return df
+    mask = date_mask(df[date_col], start_date, end_date)
+    numbers = normalize_stations(stations)
+    if numbers is not None:
+        mask &= df[station_col].isin(numbers).to_numpy()
+    return df[mask]
+
+
+def history_start(start_date, window_days):
+    """
+    start_date 起的时间窗口（window_days 天，含当天）最早用到的日期；start_date 为 None 时返回 None
+    """
+    if start_date is None:
+        return None
+    return pd.Timestamp(start_date).normalize() - pd.Timedelta(days=window_days - 1)
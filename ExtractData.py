@@ -1,80 +1,473 @@
+import logging
 import config
+import numpy as np
 import pandas as pd
+from openpyxl import load_workbook
+from ColumnarCache import ColumnarCache
+from SqlSource import SqlSource
+import DataFilter
+import FastExcel
+import Profiler
 
-def Combined_rework_costs(file_path):
-    # 读取各业务表，分别包含质量事件、产出数据、返工信息和过程结果
-    df1 = pd.read_excel(file_path, sheet_name="pdca_incident_quality_info", dtype={"id": str, "process_result_id": str})
-    df2 = pd.read_excel(file_path, sheet_name="pdca_biq_rework", dtype={"quality_info_id": str} )
+# ID 字符串 → 整数优先用 pyarrow 向量化转换，未安装时逐个 int() 转换
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ImportError:
+    pa = None
+
+logger = logging.getLogger(__name__)
+
+# 各业务表需要的列（debug_status 为可选列，仅用于过滤调试数据）
+need_df1_cols = ["id", "defect_number", "process_result_id", "date", "shift_id", "line_id", "area_id"]
+need_df2_cols = ["quality_info_id", '返工检测成本', "返工总成本"]
+need_df_cols = ["date", "shift_id", "line_id", "regions_id", "real_out_put"]
+optional_df1_cols = ["debug_status"]
+
+# 各业务表中标识工位的 ID 列
+INCIDENT_STATION_COLS = ["line_id", "area_id"]
+OUTPUT_STATION_COLS = ["line_id", "regions_id"]
+
+# 各业务表名
+SHEET_INCIDENT = "pdca_incident_quality_info"
+SHEET_REWORK = "pdca_biq_rework"
+SHEET_OUTPUT = "oee_sun_shi_manager"
+
+# 各业务表需要读取的列
+TABLE_COLUMNS = {
+    SHEET_INCIDENT: need_df1_cols + optional_df1_cols,
+    SHEET_REWORK: need_df2_cols,
+    SHEET_OUTPUT: need_df_cols,
+}
+
+# 列类型：ID 统一按字符串读取（与 config 中各 map 的键一致），date 解析为日期，其余为数值
+str_cols = {"id", "quality_info_id", "process_result_id", "shift_id", "line_id", "area_id", "regions_id"}
+date_cols = {"date"}
+
+# 读取类型规则的版本：_typed_frame 的转换方式变化时递增，使已有的列式缓存失效
+TYPED_FRAME_VERSION = 2
+
+# 映射后的名称均为分类类型，类别取自 config 中各 map 的值并按字典序排列，不同表之间类别一致
+SHIFT_NAMES = sorted(set(config.shift_name_map.values()))
+LINE_NAMES = sorted(set(config.line_area_map.values()))
+AREA_NAMES = sorted(set(config.station_name_map.values()))
+PROCESS_RESULT_NAMES = sorted(set(config.process_result_map.values()))
+
+def _line_area_categories():
+    # 线体 × 工位区域的全部组合 "线体 工位区域"，按字典序排列；同时返回 (线体编码, 区域编码) → 类别编码 的查找表
+    pairs = np.array([f"{line} {area}" for line in LINE_NAMES for area in AREA_NAMES], dtype=object)
+    categories, inverse = np.unique(pairs, return_inverse=True)
+    return list(categories), inverse.reshape(len(LINE_NAMES), len(AREA_NAMES))
+
+LINE_AREA_NAMES, _LINE_AREA_CODES = _line_area_categories()
+
+def categorize_ids(series):
+    """
+    ID 列 → 分类类型（类别为出现过的 ID，按字典序排列）
+    """
+    return series.astype(pd.CategoricalDtype(sorted(series.dropna().unique())))
+
+def map_categorical(ids, mapping, categories):
+    """
+    按 config 映射把分类 ID 列转换为名称分类列：只对每个 ID 类别映射一次，再按编码展开，
+    映射不到的 ID 记为缺失
+    """
+    category_names = pd.Index(ids.cat.categories).map(mapping)
+    name_codes = pd.Categorical(category_names, categories=categories).codes
+    id_codes = ids.cat.codes.to_numpy()
+    codes = np.where(id_codes >= 0, name_codes[id_codes], -1)
+    return pd.Series(pd.Categorical.from_codes(codes, categories=categories), index=ids.index)
+
+def line_area_name(line_name, area_name):
+    """
+    由线体与工位区域的类别编码直接组合出 "线体 工位区域" 分类列（任一缺失则为缺失），不做字符串拼接
+    """
+    line_codes = line_name.cat.codes.to_numpy()
+    area_codes = area_name.cat.codes.to_numpy()
+    valid = (line_codes >= 0) & (area_codes >= 0)
+    codes = np.where(valid, _LINE_AREA_CODES[np.maximum(line_codes, 0), np.maximum(area_codes, 0)], -1)
+    return pd.Series(pd.Categorical.from_codes(codes, categories=LINE_AREA_NAMES), index=line_name.index)
+
+def _typed_frame(records, columns):
+    df = pd.DataFrame.from_records(records, columns=columns)
+    for col in columns:
+        if col in str_cols:
+            df[col] = df[col].map(lambda v: v if isinstance(v, str) else str(v), na_action="ignore")
+        elif col in date_cols:
+            df[col] = pd.to_datetime(df[col], errors="coerce")
+        else:
+            df[col] = pd.to_numeric(df[col], errors="coerce")
+    return df
+
+def _cache_schema(sheet_name):
+    # 列式缓存清单中记录的读取模式：需要的列、各列类型及类型规则版本
+    columns = TABLE_COLUMNS[sheet_name]
+    types = {c: "str" if c in str_cols else "date" if c in date_cols else "num" for c in columns}
+    return {"columns": columns, "types": types, "version": TYPED_FRAME_VERSION}
+
+def _iter_sheet_chunks(ws, columns, chunk_rows=None):
+    # 流式遍历工作表，每 chunk_rows 行产出一个带类型的 DataFrame（None 时整表一次产出）
+    rows = ws.iter_rows(values_only=True)
+    header = next(rows, ())
+    # 去除列名首尾空格，保证跨表字段匹配；只保留需要的列
+    positions = {str(c).strip(): i for i, c in enumerate(header) if c is not None}
+    present = [c for c in columns if c in positions]
+    idx = [positions[c] for c in present]
+    records = []
+    for row in rows:
+        values = tuple(row[i] if i < len(row) else None for i in idx)
+        if any(v is not None for v in values):
+            records.append(values)
+            if chunk_rows and len(records) >= chunk_rows:
+                yield _typed_frame(records, present)
+                records = []
+    if records or not chunk_rows:
+        yield _typed_frame(records, present)
+
+def parse_workbook(file_path, tables):
+    """
+    以只读流式模式打开一次工作簿，一次遍历读取所有需要的工作表及列
+    tables 为 {sheet_name: 列名列表}，返回 {sheet_name: DataFrame}
+    """
+    wb = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        frames = {}
+        for sheet_name, columns in tables.items():
+            if sheet_name not in wb.sheetnames:
+                raise KeyError(f"工作簿缺少工作表: {sheet_name}")
+            frames[sheet_name] = next(_iter_sheet_chunks(wb[sheet_name], columns))
+    finally:
+        wb.close()
+    return frames
+
+@Profiler.stage()
+def load_quality_tables(file_path, sheet_names=None):
+    """
+    读取质量工作簿中的业务表，开启缓存时优先读取列式缓存，源文件变化时才重新解析 Excel
+    """
+    sheet_names = list(TABLE_COLUMNS) if sheet_names is None else list(sheet_names)
+    cache = ColumnarCache(config.cache_dir) if config.use_cache else None
+    schemas = {s: _cache_schema(s) for s in sheet_names}
+    if cache is not None and cache.is_valid(file_path, sheet_names, schemas):
+        Profiler.count("cache_hit")
+        return {s: cache.load(file_path, s) for s in sheet_names}
+
+    Profiler.count("cache_miss")
+    frames = parse_workbook(file_path, {s: TABLE_COLUMNS[s] for s in sheet_names})
+    if cache is not None:
+        cache.store(file_path, frames, schemas)
+    return frames
+
+def sql_query(source, sheet_name, start_date=None, end_date=None):
+    """
+    数据库来源的下推查询，返回 (查询, 列名)：只选择需要的列；质量事件表排除调试数据
+    （debug_status 为空或不等于 1）与处理结果为空的记录，产量表与质量事件表按来源日期范围
+    及 [start_date, end_date] 日期窗口过滤，返工表只取其中质量事件对应的返工记录
+    """
+    valid = [source.not_blank(SHEET_INCIDENT, "process_result_id")]
+    if source.has_column(SHEET_INCIDENT, "debug_status"):
+        valid.append(source.exclude_value(SHEET_INCIDENT, "debug_status", 1))
+    incident_where = source.date_filter(SHEET_INCIDENT) + valid
+    incident_where += source.window(SHEET_INCIDENT, INCIDENT_STATION_COLS, start_date, end_date, incident_where)
+
+    if sheet_name == SHEET_INCIDENT:
+        return source.select(sheet_name, need_df1_cols, incident_where)
+    if sheet_name == SHEET_OUTPUT:
+        output_where = source.date_filter(SHEET_OUTPUT)
+        output_where += source.window(SHEET_OUTPUT, OUTPUT_STATION_COLS, start_date, end_date, output_where)
+        return source.select(sheet_name, need_df_cols, output_where)
+    if sheet_name == SHEET_REWORK:
+        where = [source.in_subquery(SHEET_REWORK, "quality_info_id", SHEET_INCIDENT, "id", incident_where)]
+        return source.select(sheet_name, need_df2_cols, where)
+    raise KeyError(f"未知业务表: {sheet_name}")
+
+@Profiler.stage()
+def load_sql_tables(source, sheet_names=None, start_date=None, end_date=None):
+    """
+    从数据库来源读取业务表（过滤、日期窗口与列选择在 SQL 中完成），返回 {sheet_name: DataFrame}
+    """
+    sheet_names = list(TABLE_COLUMNS) if sheet_names is None else list(sheet_names)
+    frames = {}
+    for sheet_name in sheet_names:
+        query, columns = sql_query(source, sheet_name, start_date, end_date)
+        frames[sheet_name] = _typed_frame(source.read(query), columns)
+    return frames
+
+def _resolve_tables(source, sheet_names, start_date=None, end_date=None):
+    # source 可以是工作簿路径、数据库来源 SqlSource，也可以是 load_quality_tables 预先读取的 {sheet_name: DataFrame}
+    # 日期窗口只对数据库来源下推，其余来源由调用方在读取后过滤
+    if isinstance(source, dict):
+        missing = [s for s in sheet_names if s not in source]
+        if missing:
+            raise KeyError(f"缺少业务表: {missing}")
+        return source
+    if isinstance(source, SqlSource):
+        return load_sql_tables(source, sheet_names, start_date, end_date)
+    return load_quality_tables(source, sheet_names)
+
+def iter_table_chunks(source, sheet_name, chunk_rows, start_date=None, end_date=None):
+    """
+    按 chunk_rows 行分块读取一张业务表：source 为 {sheet_name: DataFrame} 时按行切片；
+    为 SqlSource 时按服务端游标分批取回；为工作簿路径时，列式缓存有效则按 Parquet 行组分批读取，
+    否则用 openpyxl 流式逐行解析（不写缓存）；日期窗口只对数据库来源下推
+    """
+    if isinstance(source, dict):
+        df = _resolve_tables(source, [sheet_name])[sheet_name]
+        for start in range(0, max(len(df), 1), chunk_rows):
+            yield df.iloc[start:start + chunk_rows]
+        return
+
+    if isinstance(source, SqlSource):
+        query, columns = sql_query(source, sheet_name, start_date, end_date)
+        empty = True
+        for rows in source.iter_batches(query, chunk_rows):
+            empty = False
+            yield _typed_frame(rows, columns)
+        if empty:
+            yield _typed_frame([], columns)
+        return
+
+    cache = ColumnarCache(config.cache_dir) if config.use_cache else None
+    if cache is not None and cache.is_valid(source, [sheet_name], {sheet_name: _cache_schema(sheet_name)}):
+        Profiler.count("cache_hit")
+        yield from cache.iter_chunks(source, sheet_name, chunk_rows)
+        return
 
+    Profiler.count("cache_miss")
+    wb = load_workbook(source, read_only=True, data_only=True)
+    try:
+        if sheet_name not in wb.sheetnames:
+            raise KeyError(f"工作簿缺少工作表: {sheet_name}")
+        yield from _iter_sheet_chunks(wb[sheet_name], TABLE_COLUMNS[sheet_name], chunk_rows)
+    finally:
+        wb.close()
+
+def _first_rows_before(df, start_date, station_cols):
+    # 每个工位（按原始 ID 列）早于 start_date 的最早一行的行标签
+    before = df[df["date"] < pd.Timestamp(start_date).normalize()]
+    return before.groupby(station_cols, sort=False)["date"].idxmin().to_numpy()
+
+def date_window(df, start_date, end_date, station_cols):
+    """
+    日期窗口过滤：保留 [start_date, end_date] 内的行，外加每个工位早于 start_date 的最早一行。
+    后者让各工位的预热截断（首日 / 前 window_days 天）仍以真实首日计算，且不落在 start_date
+    之后任何日期所需的窗口内，因此窗口内的结果与全量计算一致
+    """
+    if start_date is None and end_date is None:
+        return df
+    keep = DataFilter.date_mask(df["date"], start_date, end_date)
+    if start_date is not None:
+        keep |= df.index.isin(_first_rows_before(df, start_date, station_cols))
+    return df[keep]
+
+def _valid_incidents(df1):
     # 若存在调试数据则排除，避免脏数据影响统计
     if "debug_status" in df1.columns:
         df1 = df1[df1["debug_status"] != 1] 
 
     # 去除列名首尾空格，保证跨表字段匹配
     df1.columns = df1.columns.astype(str).str.strip()
-    df2.columns = df2.columns.astype(str).str.strip()
 
     # 检查关键字段是否存在，缺失则直接中断
-    need_df1_cols = ["id", "defect_number", "process_result_id", "date", "shift_id", "line_id", "area_id"]
-    need_df2_cols = ["quality_info_id", '返工检测成本', "返工总成本"]
     missing1 = [c for c in need_df1_cols if c not in df1.columns]
-    missing2 = [c for c in need_df2_cols if c not in df2.columns]
     if missing1:
         raise KeyError(f"df1 缺少列: {missing1}")
+    df1 = df1[need_df1_cols]
+
+    # 删除 process_result_id 为空的行（包括 NaN 和空字符串）
+    return df1[df1["process_result_id"].notna() & (df1["process_result_id"].astype(str).str.strip() != "")].copy()
+
+def _map_incidents(df1):
+    # 低基数 ID 转为分类类型，根据map，替换id为对应的真实意义（同为分类类型）
+    for col in ["process_result_id", "shift_id", "line_id", "area_id"]:
+        df1[col] = categorize_ids(df1[col])
+    df1["process_result_name"] = map_categorical(df1["process_result_id"], config.process_result_map, PROCESS_RESULT_NAMES)
+    df1["shift_name"] = map_categorical(df1["shift_id"], config.shift_name_map, SHIFT_NAMES)
+    df1["line_name"] = map_categorical(df1["line_id"], config.line_area_map, LINE_NAMES)
+    df1["area_name"] = map_categorical(df1["area_id"], config.station_name_map, AREA_NAMES)
+    df1['line_area_name'] = line_area_name(df1['line_name'], df1['area_name'])
+    return df1
+
+def clean_incidents(df1, start_date=None, end_date=None):
+    """
+    质量事件表清洗：排除调试数据与处理结果为空的记录，按日期窗口过滤，ID 转为分类类型并映射为名称
+    """
+    return _map_incidents(date_window(_valid_incidents(df1), start_date, end_date, INCIDENT_STATION_COLS).copy())
+
+def clean_rework(df2):
+    """
+    返工表清洗：返工总成本扣除检测成本
+    """
+    # 去除列名首尾空格，保证跨表字段匹配
+    df2.columns = df2.columns.astype(str).str.strip()
+
+    # 检查关键字段是否存在，缺失则直接中断
+    missing2 = [c for c in need_df2_cols if c not in df2.columns]
     if missing2:
         raise KeyError(f"df2 缺少列: {missing2}")
-    df1 = df1[need_df1_cols].copy()
     df2 = df2[need_df2_cols].copy() 
 
-    # 删除 process_result_id 为空的行（包括 NaN 和空字符串）
-    df1 = df1[df1["process_result_id"].notna() & (df1["process_result_id"].astype(str).str.strip() != "")]
-    # 根据map，替换id为对应的真实意义
-    df1["process_result_name"] = df1["process_result_id"].map(config.process_result_map)
-    df1["shift_name"] = df1["shift_id"].map(config.shift_name_map)
-    df1["line_name"] = df1["line_id"].map(config.line_area_map)
-    df1["area_name"] = df1["area_id"].map(config.station_name_map)
-    df1['line_area_name'] = df1['line_name'].str.cat(df1['area_name'], sep=' ')
-
     df2["返工总成本"] = df2["返工总成本"] - df2["返工检测成本"]
+    return df2
+
+# 返工表按质量事件预聚合后的列
+REWORK_COST_COLS = ["返工检测成本", "返工总成本"]
+REWORK_COUNT_COL = "返工记录数"
+
+def id_keys(ids):
+    """
+    ID 列 → (int64 键, 非空掩码)；雪花 ID 为纯数字且不超过 int64，按整数比较可省去字符串哈希。
+    存在无法按整数解析的 ID 时键返回 None（调用方退回字符串键）
+    """
+    valid = ids.notna().to_numpy()
+    if pa is not None:
+        try:
+            return pc.cast(pa.array(ids, type=pa.string(), from_pandas=True), pa.int64()).fill_null(0).to_numpy(), valid
+        except (pa.ArrowException, ValueError, TypeError):
+            pass    # 例如带空格的 ID，交给 int() 再试一次
+    values = ids.to_numpy(dtype=object)
+    keys = np.zeros(len(values), dtype=np.int64)
+    try:
+        keys[valid] = values[valid].astype(np.int64)
+    except (ValueError, OverflowError, TypeError):
+        return None, valid
+    return keys, valid
+
+def aggregate_rework(df2):
+    """
+    返工表按 quality_info_id 预聚合为每个质量事件一行：成本求和（全为空时保持为空）、返工记录数；
+    索引为 int64 键（ID 无法转为整数时为字符串键），合并时直接按索引哈希查找
+    """
+    keys, valid = id_keys(df2["quality_info_id"])
+    if keys is None:
+        keys = df2["quality_info_id"].astype(str).to_numpy()
+    costs = df2.loc[valid, REWORK_COST_COLS]
+    grouped = costs.groupby(keys[valid], sort=True)
+    rework = grouped.sum(min_count=1)
+    rework[REWORK_COUNT_COL] = grouped.size()
+    rework.index.name = "quality_info_id"
+    return rework
 
-    # 按列值匹配合并
-    merged_df = pd.merge(
-        df1, 
-        df2, 
-        left_on="id", 
-        right_on="quality_info_id", 
-        how="left"
-    )
+def _rework_positions(df1, rework):
+    # 质量事件 id → 预聚合返工表中的行号（无返工记录为 -1）
+    keys, valid = id_keys(df1["id"])
+    index = rework.index
+    if keys is None or index.dtype != np.int64:
+        # 任一侧存在非数字 ID 时统一按字符串比较
+        keys = df1["id"].astype(str).to_numpy()
+        index = index.astype(str)
+    positions = index.get_indexer(keys)
+    positions[~valid] = -1
+    return positions
 
+def _merge_rework(df1, rework):
+    """
+    质量事件左连接预聚合返工表：每个质量事件只保留一行，同一事件的多条返工记录已合并，
+    不再复制事件行（复制会重复计入 defect_number）
+    """
+    positions = _rework_positions(df1, rework)
+    matched = positions >= 0
+    merged = df1.reset_index(drop=True)
+    merged["quality_info_id"] = merged["id"].where(matched)
+    for col in REWORK_COST_COLS:
+        # 末尾追加 NaN，未匹配的行号 -1 直接取到 NaN（返工表为空时同样成立）
+        values = np.append(rework[col].to_numpy(dtype=np.float64), np.nan)
+        merged[col] = values[positions]
+
+    fanout = rework[REWORK_COUNT_COL].to_numpy()[positions[matched]]
+    Profiler.count("rework_matched", int(matched.sum()))
+    Profiler.count("rework_fanout", int((fanout > 1).sum()))
+    return merged
+
+def rework_fanout_stats(rework, merged_df=None):
+    """
+    返工表扇出统计：返工记录数、涉及质量事件数、多条返工记录的事件数及最大条数；
+    给出合并结果时同时统计匹配到的事件数与未匹配任何质量事件的返工记录
+    """
+    counts = rework[REWORK_COUNT_COL]
+    stats = {
+        "rework_rows": int(counts.sum()),
+        "rework_incidents": int(len(counts)),
+        "multi_rework_incidents": int((counts > 1).sum()),
+        "max_fanout": int(counts.max()) if len(counts) else 0,
+    }
+    if merged_df is not None:
+        matched = merged_df["quality_info_id"].dropna().unique()
+        stats["matched_incidents"] = int(len(matched))
+        stats["orphan_rework_incidents"] = stats["rework_incidents"] - int(len(matched))
+    return stats
+
+@Profiler.stage()
+def Combined_rework_costs(source, start_date=None, end_date=None):
+    """
+    合并质量事件与返工成本；给出 start_date / end_date 时只保留该日期窗口
+    （外加各工位最早一行，见 date_window），数据库来源的窗口过滤下推到 SQL
+    """
+    # 读取各业务表，分别包含质量事件、产出数据、返工信息和过程结果
+    tables = _resolve_tables(source, [SHEET_INCIDENT, SHEET_REWORK], start_date, end_date)
+    rework = aggregate_rework(clean_rework(tables[SHEET_REWORK]))
+    merged_df = _merge_rework(clean_incidents(tables[SHEET_INCIDENT], start_date, end_date), rework)
+    logger.info("返工合并：%s", rework_fanout_stats(rework, merged_df))
     return merged_df
+
+def iter_rework_costs(source, chunk_rows=None, start_date=None, end_date=None):
+    """
+    Combined_rework_costs 的分块版本：返工表读取一次并按质量事件预聚合（各块共用同一 int64 键索引），
+    质量事件表按 chunk_rows 行分块清洗、映射并合并返工成本，逐块产出合并结果，
+    内存只与单块大小及返工事件数有关；各工位早于 start_date 的最早一行在最后单独产出
+    """
+    chunk_rows = chunk_rows or config.stream_chunk_rows
+    rework = aggregate_rework(clean_rework(_resolve_tables(source, [SHEET_REWORK], start_date, end_date)[SHEET_REWORK]))
+    logger.info("返工合并：%s", rework_fanout_stats(rework))
+    earliest = None
+    for chunk in iter_table_chunks(source, SHEET_INCIDENT, chunk_rows, start_date, end_date):
+        Profiler.count("incident_chunks")
+        chunk = _valid_incidents(chunk)
+        if start_date is not None:
+            # 跨块保留各工位早于 start_date 的最早一行
+            first = chunk.loc[_first_rows_before(chunk, start_date, INCIDENT_STATION_COLS)]
+            earliest = first if earliest is None else pd.concat([earliest, first], ignore_index=True)
+            earliest = earliest.loc[_first_rows_before(earliest, start_date, INCIDENT_STATION_COLS)]
+        chunk = chunk[DataFilter.date_mask(chunk["date"], start_date, end_date)]
+        yield _merge_rework(_map_incidents(chunk), rework)
+    if earliest is not None and len(earliest):
+        yield _merge_rework(_map_incidents(earliest.copy()), rework)
     
-def Real_output(file_path):
+@Profiler.stage()
+def Real_output(source, start_date=None, end_date=None):
+    """
+    产量表清洗：ID 转为分类类型并映射为名称；给出 start_date / end_date 时只保留该日期窗口
+    （外加各工位最早一行，见 date_window）
+    """
     # 读取各业务表，分别包含质量事件、产出数据、返工信息和过程结果
-    df = pd.read_excel(file_path, sheet_name="oee_sun_shi_manager")
+    df = _resolve_tables(source, [SHEET_OUTPUT], start_date, end_date)[SHEET_OUTPUT]
 
     # 去除列名首尾空格，保证跨表字段匹配
     df.columns = df.columns.astype(str).str.strip()
 
     # 检查关键字段是否存在，缺失则直接中断
-    need_df_cols = ["date", "shift_id", "line_id", "regions_id", "real_out_put"]
     missing = [c for c in need_df_cols if c not in df.columns]
     if missing:
         raise KeyError(f"df 缺少列: {missing}")
-    df = df[need_df_cols].copy()
+    df = date_window(df[need_df_cols], start_date, end_date, OUTPUT_STATION_COLS).copy()
 
-    # 根据map，替换id为对应的真实意义
-    df["shift_name"] = df["shift_id"].map(config.shift_name_map)
-    df["line_name"] = df["line_id"].map(config.line_area_map)
-    df["area_name"] = df["regions_id"].map(config.station_name_map)
-    df['line_area_name'] = df['line_name'].str.cat(df['area_name'], sep=' ')
+    # 低基数 ID 转为分类类型，根据map，替换id为对应的真实意义（同为分类类型）
+    for col in ["shift_id", "line_id", "regions_id"]:
+        df[col] = categorize_ids(df[col])
+    df["shift_name"] = map_categorical(df["shift_id"], config.shift_name_map, SHIFT_NAMES)
+    df["line_name"] = map_categorical(df["line_id"], config.line_area_map, LINE_NAMES)
+    df["area_name"] = map_categorical(df["regions_id"], config.station_name_map, AREA_NAMES)
+    df['line_area_name'] = line_area_name(df['line_name'], df['area_name'])
 
-    return df  
+    return df
 
 if __name__ == "__main__":
-    merged_df = Combined_rework_costs('./data/质量数据929.xlsx')
+    tables = load_quality_tables('./data/质量数据929.xlsx')
+
+    merged_df = Combined_rework_costs(tables)
     merged_file = "./result/merged_929.xlsx"
-    merged_df.to_excel(merged_file, index=False)
+    FastExcel.write_frame(merged_file, merged_df)
 
-    output_df = Real_output('./data/质量数据929.xlsx')
+    output_df = Real_output(tables)
     output_file = "./result/output_929.xlsx"
-    output_df.to_excel(output_file, index=False)
\ No newline at end of file
+    FastExcel.write_frame(output_file, output_df)
\ No newline at end of file
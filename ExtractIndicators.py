@@ -1,116 +1,118 @@
+import logging
 import pandas as pd
 import ExtractData as ED
 import StationSegmentation as SS
 import config
-
-def merge_summary_data(summary_data, summary_output):
-    merged_result = {}
-
-    # 找出两个字典中共同的工位名称
-    common_stations = set(summary_data.keys()).intersection(set(summary_output.keys()))
-
-    for station in common_stations:
-        df1 = summary_data[station]      # 缺陷统计
-        df2 = summary_output[station]    # 实际产出统计
-
-        # 合并：根据 date 对齐
-        merged_df = pd.merge(
-            df1,
-            df2,
-            on='date',
-            how='outer'
-        )
-        # 按日期排序
-        merged_df = merged_df.sort_values(by='date').reset_index(drop=True)
-        merged_result[station] = merged_df
-
-    return merged_result
-
-def compute_quality_metrics(merged_result, window_days=90):
-    result_with_metrics = {}
-    for station, df in merged_result.items():
-        # 用最近有数据的值填充缺失（前向填充）
-        defect_cols = ['总缺陷数', '返工总数', '报废总数', '其他总数', '返工检测成本', '返工总成本']
-        # 如果仍有 NaN（比如开头没有数据），填 0
-        df[defect_cols] = df[defect_cols].fillna(0)
-        
-        # 计算过去 90 天滚动累计值
-        for col in defect_cols:
-            df[col] = df.set_index('date')[col].rolling(f'{window_days}D').sum().values
-
-        # 删除没有产量的记录
-        df = df[df['daily_total_output'].notna() & (df['daily_total_output'] != 0)].copy()
-
-        # 计算指标
-        df['检验成本'] = df['返工检测成本']
-        df['合格率'] = 1 - (df['总缺陷数'] / df['daily_total_output'])
-        df['返工成本'] = df['返工总成本']
-        df['报废成本'] = df['报废总数'] * 1    # 报废单价目前设为1
-
-        result_with_metrics[station] = df.reset_index(drop=True)
-
-    return result_with_metrics
-
-def consolidate_metrics(result_with_metrics):
-    # 收集每个工位的日期集合
-    station_dates = {station: set(df['date']) for station, df in result_with_metrics.items()}
-
-    # 找出所有工位的公共日期
-    common_dates = set.intersection(*station_dates.values())
-
-    # 按工位名称排序筛选，过滤掉不在公共日期中的数据
-    station_order = sorted(result_with_metrics.keys())  # fixed order
-    filtered_dfs = []
-    for station in station_order:
-        df = result_with_metrics[station]
-        df_filtered = df[df['date'].isin(common_dates)].copy()
-        df_filtered['station'] = station
-        filtered_dfs.append(df_filtered)
-
-    # 合并过滤后的数据
-    combined_df = pd.concat(filtered_dfs, ignore_index=True)
+import FastExcel
+import DataFilter
+from StationPool import StationPool
+import Profiler
+
+# 缺陷相关列
+DEFECT_COLS = ['总缺陷数', '返工总数', '报废总数', '其他总数', '返工检测成本', '返工总成本']
+
+@Profiler.stage()
+def merge_summary_frame(daily_summary_frame, daily_output_frame):
+    # 只保留两个长表中共同的工位
+    common_stations = daily_summary_frame.index.unique('station').intersection(daily_output_frame.index.unique('station'))
+    df1 = daily_summary_frame[daily_summary_frame.index.get_level_values('station').isin(common_stations)]  # 缺陷统计
+    df2 = daily_output_frame[daily_output_frame.index.get_level_values('station').isin(common_stations)]    # 实际产出统计
+
+    # 合并：根据（工位，日期）对齐，并按工位、日期排序
+    merged = pd.concat([df1, df2], axis=1, join='outer')
+    return merged.sort_index(level=SS.DAILY_INDEX, sort_remaining=False)
+
+@Profiler.stage()
+def compute_quality_metrics_frame(merged_frame, window_days=90):
+    df = merged_frame.copy()
+    # 缺失（比如开头没有数据）填 0
+    df[DEFECT_COLS] = df[DEFECT_COLS].fillna(0)
+
+    # 计算过去 90 天滚动累计值（所有缺陷列、所有工位一次计算）
+    df[DEFECT_COLS] = SS.rolling_sum(df, DEFECT_COLS, window_days)
+
+    # 删除没有产量的记录
+    df = df[df['daily_total_output'].notna() & (df['daily_total_output'] != 0)].copy()
+
+    # 计算指标
+    df['检验成本'] = df['返工检测成本']
+    df['合格率'] = 1 - (df['总缺陷数'] / df['daily_total_output'])
+    df['返工成本'] = df['返工总成本']
+    df['报废成本'] = df['报废总数'] * 1    # 报废单价目前设为1
+
+    return df
+
+@Profiler.stage()
+def consolidate_metrics_frame(metrics_frame):
+    # 找出所有工位的公共日期（该日期下每个工位都有数据）
+    stations = metrics_frame.index.get_level_values('station')
+    dates = metrics_frame.index.get_level_values('date')
+    n_stations = stations.nunique()
+    station_count = pd.Series(stations).groupby(dates).transform('nunique').to_numpy()
+    combined_df = metrics_frame[station_count == n_stations].reset_index()
 
     # 按日期和工位顺序排序
     combined_df['date'] = pd.to_datetime(combined_df['date'])
-    combined_df['station_order'] = combined_df['station'].map({name: i for i, name in enumerate(station_order)})
-    combined_df = combined_df.sort_values(by=['date', 'station_order']).drop(columns=['station_order']).reset_index(drop=True)
+    combined_df = combined_df.sort_values(by=['date', 'station'], kind='stable').reset_index(drop=True)
 
     # 选取需要的数据
     final_df = combined_df[['date', 'station', '检验成本', '合格率', '返工成本', '报废成本']]
-    
+
     final_df = final_df.copy()
     final_df.rename(columns={"station": "工位"}, inplace=True)
-    final_df["工位"] = final_df["工位"].map(config.station_map)
+    # 工位为分类类型时先转回普通对象列，保证映射结果为整数编号
+    final_df["工位"] = final_df["工位"].astype(object).map(config.station_map)
 
     return final_df
 
-if __name__ == "__main__":  
-    merged_df = ED.Combined_rework_costs("./data/质量数据929.xlsx")
-    station_data = SS.split_station(merged_df)
-    summary_data = SS.shift_summary(station_data) 
-    daily_summary_data = SS.daily_total(summary_data)
+# ---- {工位: DataFrame} 字典接口：基于长表实现的兼容视图 ----
+
+def merge_summary_data(summary_data, summary_output):
+    return SS.to_station_dict(merge_summary_frame(SS.from_station_dict(summary_data, ['date']),
+                                                  SS.from_station_dict(summary_output, ['date'])))
 
-    output_df = ED.Real_output("./data/质量数据929.xlsx")
-    station_output = SS.split_station_output(output_df)
-    summary_output = SS.shift_summary_output(station_output) 
-    daily_output = SS.daily_total_output(summary_output) 
+def compute_quality_metrics(merged_result, window_days=90):
+    return SS.to_station_dict(compute_quality_metrics_frame(SS.from_station_dict(merged_result, ['date']), window_days))
 
-    merged_result = merge_summary_data(daily_summary_data, daily_output)
+def consolidate_metrics(result_with_metrics):
+    return consolidate_metrics_frame(SS.from_station_dict(result_with_metrics, ['date']))
+
+if __name__ == "__main__":  
+    logging.basicConfig(level=config.log_level, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    Profiler.enable_from_config()
+    file_path = "./data/质量数据929.xlsx"
+    # 日期范围：多读入 90 天历史以填满 start_date 起的滚动窗口，最终结果再按日期范围与工位过滤
+    # （公共日期只在该范围内有数据的工位间比较）
+    history_start = DataFilter.history_start(config.start_date, 90)
+    # 流式模式下质量事件表分块汇总，不整表读入内存
+    tables = file_path if config.stream_incidents else ED.load_quality_tables(file_path)
+    output_df = ED.Real_output(tables, history_start, config.end_date)
+
+    # 各工位互不相关的阶段按工位并行执行（config.n_workers <= 1 时串行）
+    pool = StationPool(config.n_workers)
+    with pool:
+        if config.stream_incidents:
+            summary_frame = SS.stream_shift_summary_frame(file_path, None, history_start, config.end_date)
+        else:
+            merged_df = ED.Combined_rework_costs(tables, history_start, config.end_date)
+            station_frame = pool.map(SS.split_station_frame, merged_df, station_key='line_area_name')
+            summary_frame = pool.map(SS.shift_summary_frame, station_frame)
+        daily_summary_frame = pool.map(SS.daily_total_frame, summary_frame)
+
+        station_output_frame = pool.map(SS.split_station_output_frame, output_df, station_key='line_area_name')
+        summary_output_frame = pool.map(SS.shift_summary_output_frame, station_output_frame)
+        daily_output_frame = pool.map(SS.daily_total_output_frame, summary_output_frame)
+
+    merged_frame = merge_summary_frame(daily_summary_frame, daily_output_frame)
     output_file = "./result/Combined_Summary.xlsx"
-    
-    with pd.ExcelWriter(output_file, engine='openpyxl') as writer:
-        for station, df in merged_result.items():
-            df.to_excel(writer, sheet_name=station, index=False)
-            print(f"✅ 已合并工位: {station}, 行数: {len(df)}")
+    SS.write_station_workbook(output_file, merged_frame, "合并结果")
 
-    result_with_metrics = compute_quality_metrics(merged_result)
+    with pool:
+        metrics_frame = pool.map(compute_quality_metrics_frame, merged_frame)
     result = "./result/result.xlsx"
-    
-    with pd.ExcelWriter(result, engine='openpyxl') as writer:
-        for station, df in result_with_metrics.items():
-            df.to_excel(writer, sheet_name=station, index=False)
-            print(f"✅ 已生成结果: {station}, 行数: {len(df)}")
+    SS.write_station_workbook(result, metrics_frame, "指标结果")
 
-    final_df = consolidate_metrics(result_with_metrics)
+    final_df = consolidate_metrics_frame(metrics_frame)
+    final_df = DataFilter.select_rows(final_df, 'date', '工位', config.start_date, config.end_date, config.stations)
     final_result = "./result/final_result.xlsx"
-    final_df.to_excel(final_result, index=False)
+    FastExcel.write_frame(final_result, final_df)
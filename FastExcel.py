@@ -0,0 +1,116 @@
+import os
+import numpy as np
+import pandas as pd
+
+# xlsxwriter 的 constant_memory 模式逐行落盘，内存占用与行数无关；未安装时退回 openpyxl
+try:
+    import xlsxwriter
+    from xlsxwriter.utility import xl_rowcol_to_cell
+    _HAS_XLSXWRITER = True
+except ImportError:
+    _HAS_XLSXWRITER = False
+
+DATETIME_FORMAT = "yyyy-mm-dd hh:mm:ss"   # 与 pandas.to_excel 默认的日期时间格式一致
+
+# 单个工作表的行列上限（含表头行）
+MAX_ROWS = 1048576
+MAX_COLS = 16384
+
+
+def check_sheet_size(sheet_name, df):
+    """
+    数据（含表头）超出工作表行列上限时报错：xlsxwriter 对越界行只返回错误码、不会报错，会静默截断
+    """
+    n_rows, n_cols = len(df) + 1, len(df.columns)
+    if n_rows > MAX_ROWS or n_cols > MAX_COLS:
+        raise ValueError(f"工作表 {sheet_name} 过大: {n_rows} 行 × {n_cols} 列，上限为 {MAX_ROWS} 行 × {MAX_COLS} 列")
+
+
+def _column_values(series):
+    # 列 → Python 对象数组：缺失值为 None（写为空单元格），日期为 datetime，numpy 标量转为内置类型
+    if pd.api.types.is_datetime64_any_dtype(series):
+        values = np.array(series.dt.to_pydatetime(), dtype=object)
+    else:
+        values = np.array(series.to_numpy(dtype=object), dtype=object)
+    values[pd.isna(series).to_numpy()] = None
+    return values
+
+
+def _write_xlsxwriter(path, sheets, conditional_formats):
+    workbook = xlsxwriter.Workbook(path, {
+        "constant_memory": True,
+        "default_date_format": DATETIME_FORMAT,
+        # 按原样写入字符串，不把 "=..." 或网址解释为公式/超链接
+        "strings_to_formulas": False,
+        "strings_to_urls": False,
+    })
+    try:
+        header_format = workbook.add_format({"bold": True, "border": 1, "align": "center", "valign": "top"})
+        fill_formats = {}
+        for sheet_name, df in sheets.items():
+            ws = workbook.add_worksheet(sheet_name)
+            ws.write_row(0, 0, [str(c) for c in df.columns], header_format)
+            columns = [_column_values(df[c]) for c in df.columns]
+            # constant_memory 模式要求按行顺序写入
+            for row_idx, row in enumerate(zip(*columns), start=1):
+                ws.write_row(row_idx, 0, row)
+
+            # 条件格式与数据在同一次写入中完成
+            for column, value, color in conditional_formats.get(sheet_name, []):
+                if column not in df.columns or df.empty:
+                    continue
+                col_idx = df.columns.get_loc(column)
+                if color not in fill_formats:
+                    fill_formats[color] = workbook.add_format({"bg_color": color})
+                cell_range = f"{xl_rowcol_to_cell(1, col_idx)}:{xl_rowcol_to_cell(len(df), col_idx)}"
+                ws.conditional_format(cell_range, {"type": "cell", "criteria": "==", "value": f'"{value}"',
+                                                   "format": fill_formats[color]})
+    finally:
+        workbook.close()
+
+
+def _write_openpyxl(path, sheets, conditional_formats):
+    from openpyxl.styles import PatternFill
+    from openpyxl.formatting.rule import CellIsRule
+    from openpyxl.utils import get_column_letter
+
+    with pd.ExcelWriter(path, engine="openpyxl") as writer:
+        for sheet_name, df in sheets.items():
+            df.to_excel(writer, sheet_name=sheet_name, index=False)
+            ws = writer.sheets[sheet_name]
+            for column, value, color in conditional_formats.get(sheet_name, []):
+                if column not in df.columns or df.empty:
+                    continue
+                letter = get_column_letter(df.columns.get_loc(column) + 1)
+                color = color.lstrip("#")
+                fill = PatternFill(start_color=color, end_color=color, fill_type="solid")
+                ws.conditional_formatting.add(f"{letter}2:{letter}{len(df) + 1}",
+                                              CellIsRule(operator="equal", formula=[f'"{value}"'], fill=fill))
+
+
+def write_sheets(path, sheets, conditional_formats=None):
+    """
+    把 {sheet_name: DataFrame} 一次写成一个工作簿（不含索引）
+
+    conditional_formats 为 {sheet_name: [(列名, 单元格值, 底色), ...]}，单元格等于该值时填充底色，
+    与数据在同一次写入中完成，无需写完后再用 load_workbook 打开修改
+    """
+    conditional_formats = conditional_formats or {}
+    # 写出前检查，避免留下被截断的工作簿
+    for sheet_name, df in sheets.items():
+        check_sheet_size(sheet_name, df)
+    out_dir = os.path.dirname(path)
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+    if _HAS_XLSXWRITER:
+        _write_xlsxwriter(path, sheets, conditional_formats)
+    else:
+        _write_openpyxl(path, sheets, conditional_formats)
+    return path
+
+
+def write_frame(path, df, sheet_name="Sheet1", conditional_formats=None):
+    """
+    单表写出，conditional_formats 为 [(列名, 单元格值, 底色), ...]
+    """
+    return write_sheets(path, {sheet_name: df}, {sheet_name: conditional_formats or []})
@@ -0,0 +1,271 @@
+import os
+import sys
+import pickle
+import logging
+import warnings
+from collections import deque
+import numpy as np
+import pandas as pd
+import config
+import ExtractData as ED
+from SqlSource import SqlSource
+import DataFilter
+import StationSegmentation as SS
+import ExtractIndicators as EI
+import ScorePipeline
+import Profiler
+import dataStandard_v2
+import weight_v2
+import threshold_v2
+
+
+class StationBuffer:
+    """
+    单个工位的滚动窗口缓冲区：原始日产量（90 天产量滚动累计）与合并后的日缺陷（90 天缺陷滚动累计）
+    """
+
+    def __init__(self):
+        self.first_defect_date = None
+        self.first_output_date = None
+        self.output_buf = deque()   # (date, 当日产量)
+        self.defect_buf = deque()   # (date, 当日缺陷向量)
+
+
+class PipelineState:
+    """
+    增量运行的检查点状态
+
+    - 指标阶段：每个工位的滚动窗口缓冲区、出现过的工位
+    - 标准化阶段：每个工位 × 指标的原始EMA v 及已递推步数
+    - 权重阶段：CRITIC 累计统计量
+    - 分级阶段：历史“结果”的流式均值/标准差
+    """
+
+    def __init__(self, window_days=90):
+        self.window_days = window_days
+        self.buffers = {}
+        self.metric_stations = set()
+        self.last_date = None
+        self.reset_scores()
+
+    def reset_scores(self):
+        """
+        清空标准化、权重与分级阶段的状态，之后的日期从头打分
+        """
+        self.stations = []          # 标准化阶段的工位序号（从小到大）
+        self.ema_v = np.empty((0, len(ScorePipeline.INDICATORS)))
+        self.ema_t = 0
+        self.critic = weight_v2.CriticAccumulator(ScorePipeline.INDICATORS)
+        self.history = threshold_v2.RunningStats()
+
+
+def load_state(state_path):
+    with open(state_path, "rb") as f:
+        return pickle.load(f)
+
+
+def save_state(state, state_path):
+    # 先写临时文件再替换，避免中途中断留下损坏的检查点
+    tmp_path = state_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, state_path)
+
+
+def _daily_inputs(merged_df, output_df):
+    # 新数据 → {(工位, 日期): 当日缺陷向量} 与 {(工位, 日期): 当日产量}
+    summary = SS.shift_summary_frame(SS.split_station_frame(merged_df))
+    defects = summary[SS.SUMMARY_COLS].groupby(level=SS.DAILY_INDEX, observed=True).sum()
+    output_summary = SS.shift_summary_output_frame(SS.split_station_output_frame(output_df))
+    outputs = output_summary['total_real_output'].groupby(level=SS.DAILY_INDEX, observed=True).sum()
+
+    defect_map = {(station, pd.Timestamp(date)): row for (station, date), row in zip(defects.index, defects.to_numpy(dtype=np.float64))}
+    output_map = {(station, pd.Timestamp(date)): value for (station, date), value in outputs.items()}
+    return defect_map, output_map
+
+
+def update_metrics(state, merged_df, output_df):
+    """
+    按日期顺序处理新的质量事件与产量数据，返回新日期的 final_result 格式指标（只含所有工位都有数据的日期）；
+    出现新工位时清空打分状态（state.reset_scores）
+    """
+    window = pd.Timedelta(days=state.window_days)
+    one_day = pd.Timedelta(days=1)
+    defect_map, output_map = _daily_inputs(merged_df, output_df)
+    stations_by_date = {}
+    for station, date in list(defect_map) + list(output_map):
+        stations_by_date.setdefault(date, set()).add(station)
+    dates = sorted(stations_by_date)
+    if state.last_date is not None and dates and dates[0] <= state.last_date:
+        raise ValueError(f"增量数据日期 {dates[0]} 不晚于检查点日期 {state.last_date}")
+
+    rows = []
+    for date in dates:
+        day_rows = []
+        for station in sorted(stations_by_date[date]):
+            buf = state.buffers.setdefault(station, StationBuffer())
+            defect_vec = defect_map.get((station, date))
+            output_val = output_map.get((station, date))
+
+            # 日缺陷：1 天窗口，去掉每个工位的第一天
+            has_defect = False
+            if defect_vec is not None:
+                if buf.first_defect_date is None:
+                    buf.first_defect_date = date
+                has_defect = date >= buf.first_defect_date + one_day
+
+            # 日产量：90 天滚动累计，去掉每个工位前 90 天
+            has_output = False
+            if output_val is not None:
+                if buf.first_output_date is None:
+                    buf.first_output_date = date
+                buf.output_buf.append((date, output_val))
+                while buf.output_buf[0][0] <= date - window:
+                    buf.output_buf.popleft()
+                has_output = date >= buf.first_output_date + window
+
+            if not (has_defect or has_output):
+                continue
+
+            # 缺陷 90 天滚动累计（合并后缺失的缺陷记为 0）
+            if has_defect:
+                buf.defect_buf.append((date, defect_vec))
+            while buf.defect_buf and buf.defect_buf[0][0] <= date - window:
+                buf.defect_buf.popleft()
+            rolled = np.sum([vec for _, vec in buf.defect_buf], axis=0) if buf.defect_buf else np.zeros(len(SS.SUMMARY_COLS))
+
+            # 删除没有产量的记录
+            daily_output = sum(value for _, value in buf.output_buf) if has_output else np.nan
+            if not has_output or daily_output == 0:
+                continue
+            day_rows.append([station, date, *rolled, daily_output])
+
+        # 出现新工位时，全量计算（consolidate_metrics_frame 按全部工位取公共日期）会丢弃此前所有日期，
+        # 打分从这一天重新开始：清空打分状态和本批中更早的行
+        new_stations = {row[0] for row in day_rows} - state.metric_stations
+        if new_stations:
+            state.metric_stations.update(new_stations)
+            state.reset_scores()
+            rows = []
+        # 只保留所有工位都有数据的日期
+        if day_rows and len(day_rows) == len(state.metric_stations):
+            rows.extend(day_rows)
+        state.last_date = date
+
+    frame = pd.DataFrame(rows, columns=['station', 'date', *SS.SUMMARY_COLS, 'daily_total_output']).set_index(SS.DAILY_INDEX)
+    if frame.empty:
+        return pd.DataFrame(columns=['date', '工位', '检验成本', '合格率', '返工成本', '报废成本'])
+    frame['检验成本'] = frame['返工检测成本']
+    frame['合格率'] = 1 - (frame['总缺陷数'] / frame['daily_total_output'])
+    frame['返工成本'] = frame['返工总成本']
+    frame['报废成本'] = frame['报废总数'] * 1    # 报废单价目前设为1
+    return EI.consolidate_metrics_frame(frame)
+
+
+def update_scores(state, final_rows, config):
+    """
+    按时间顺序对新的 final_result 格式指标逐日打分，返回与 score_pipeline 相同格式的新增结果
+    """
+    df = ScorePipeline.prepare_input(final_rows)
+    indicators = ScorePipeline.INDICATORS
+    scored = []
+    for current_time, day in df.groupby("更新时间", sort=True):
+        # 新出现的工位：之前的时间点都缺失，EMA 为 NaN（与全量计算一致）
+        new_stations = sorted(set(day["工位"].dropna()) - set(state.stations))
+        if new_stations:
+            init = 0.0 if state.ema_t == 0 else np.nan
+            stations = sorted(state.stations + new_stations)
+            ema_v = np.full((len(stations), len(indicators)), init)
+            old_idx = [stations.index(s) for s in state.stations]
+            ema_v[old_idx] = state.ema_v
+            state.stations, state.ema_v = stations, ema_v
+
+        # 1. 标准化：EMA 单步递推 + 对数缩放归一化
+        theta = np.full((len(state.stations), len(indicators)), np.nan)
+        day_first = day[day["工位"].notna()].drop_duplicates(subset=["工位"], keep="first")
+        station_idx = {s: i for i, s in enumerate(state.stations)}
+        theta[[station_idx[s] for s in day_first["工位"]]] = day_first[indicators].to_numpy(dtype=np.float64)
+        state.ema_v, state.ema_t, mu = dataStandard_v2.ema_update(state.ema_v, state.ema_t, theta, config.beta)
+        standard_data = pd.DataFrame(dataStandard_v2.scale_cross_section(mu, config.log_c, config.log_d), columns=indicators)
+        standard_data.insert(0, "工位", state.stations)
+        standard_data.insert(0, "更新时间", current_time)
+
+        # 2. 组合权重：CRITIC 统计量累加当天数据
+        critic = pd.DataFrame([state.critic.update(day[indicators].to_numpy(dtype=np.float64))], columns=indicators)
+        weights = weight_v2.combine_weights(critic, config.expert_weights, config.expert_weights_percent).round(4)
+        weights.insert(0, "更新时间", current_time)
+
+        # 3. 加权结果与分级
+        result = ScorePipeline.weighted_result(standard_data, weights)
+        grades, T_high, T_low, _ = threshold_v2.grade_period(current_time, result["结果"].to_numpy(dtype=np.float64),
+                                                              state.history, config.CV_High, config.CV_Low)
+        result["等级"] = grades
+        result["T_high"] = T_high
+        result["T_low"] = T_low
+        result["结论"] = threshold_v2.generate_conclusion(result)
+        scored.append(result)
+
+    if not scored:
+        return pd.DataFrame()
+    return pd.concat(scored, ignore_index=True)
+
+
+def bootstrap_state(merged_df, output_df, config, window_days=90):
+    """
+    用全部历史数据建立检查点，返回 (state, 全量打分结果)
+    """
+    state = PipelineState(window_days)
+    # 回放历史以建立滚动窗口缓冲区（历史指标以全量计算为准）
+    update_metrics(state, merged_df, output_df)
+
+    daily_summary_frame = SS.daily_total_frame(SS.shift_summary_frame(SS.split_station_frame(merged_df)))
+    daily_output_frame = SS.daily_total_output_frame(SS.shift_summary_output_frame(SS.split_station_output_frame(output_df)), window_days)
+    metrics_frame = EI.compute_quality_metrics_frame(EI.merge_summary_frame(daily_summary_frame, daily_output_frame), window_days)
+    state.metric_stations = set(metrics_frame.index.unique('station'))
+    final_df = EI.consolidate_metrics_frame(metrics_frame)
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        scored = update_scores(state, final_df, config)
+    return state, scored
+
+
+def run_incremental(merged_df, output_df, config, state_path):
+    """
+    读取检查点，只处理新一天（或若干天）的数据并追加打分，随后保存检查点
+    """
+    state = load_state(state_path)
+    final_rows = update_metrics(state, merged_df, output_df)
+    scored = update_scores(state, final_rows, config)
+    save_state(state, state_path)
+    return scored
+
+
+if __name__ == "__main__":
+    # 用法：python IncrementalRun.py <质量数据.xlsx | 数据库 URL>
+    # 检查点不存在时用该来源的全部历史建立检查点，否则只把检查点日期之后的新日期追加打分；
+    # 数据库来源（参数或 config.source_url）只查询检查点日期之后的数据
+    logging.basicConfig(level=config.log_level, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    Profiler.enable_from_config()
+    file_path = sys.argv[1] if len(sys.argv) > 1 else (config.source_url or "./data/质量数据929.xlsx")
+    last_date = load_state(config.state_path).last_date if os.path.exists(config.state_path) else None
+    new_start = None if last_date is None else last_date + pd.Timedelta(days=1)
+    if "://" in file_path:
+        tables = SqlSource(file_path)
+        if new_start is not None:
+            tables = tables.between(start_date=new_start)
+    else:
+        tables = ED.load_quality_tables(file_path)
+    merged_df = ED.Combined_rework_costs(tables)
+    output_df = ED.Real_output(tables)
+    # 工作簿为累计导出，只保留检查点日期之后的新数据（数据库来源已在查询中过滤）
+    merged_df = DataFilter.select_rows(merged_df, "date", start_date=new_start)
+    output_df = DataFilter.select_rows(output_df, "date", start_date=new_start)
+
+    if not os.path.exists(config.state_path):
+        state, scored = bootstrap_state(merged_df, output_df, config)
+        save_state(state, config.state_path)
+        print(f"已建立检查点：{config.state_path}，历史打分 {len(scored)} 条")
+    else:
+        scored = run_incremental(merged_df, output_df, config, config.state_path)
+        print(f"增量打分完成，新增 {len(scored)} 条")
@@ -0,0 +1,238 @@
+import os
+import sys
+import csv
+import json
+import time
+import atexit
+import cProfile
+import functools
+import inspect
+import tracemalloc
+from datetime import datetime
+import pandas as pd
+import config
+
+# 进程峰值常驻内存（RSS）只在类 Unix 系统上可用，其他平台记为空
+try:
+    import resource
+except ImportError:
+    resource = None
+
+_MB = 1024 * 1024
+
+
+def _peak_rss_mb():
+    if resource is None:
+        return None
+    # Linux 上 ru_maxrss 单位为 KB，macOS 上为字节
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / _MB if sys.platform == "darwin" else rss / 1024
+
+
+def count_rows(obj):
+    """
+    统计阶段输入/输出的行数：DataFrame/Series 取行数，{工位: DataFrame} 取各表行数之和，
+    元组取第一个可统计的元素，其他返回 None
+    """
+    if isinstance(obj, (pd.DataFrame, pd.Series)):
+        return len(obj)
+    if isinstance(obj, dict) and obj and all(isinstance(v, (pd.DataFrame, pd.Series)) for v in obj.values()):
+        return sum(len(v) for v in obj.values())
+    if isinstance(obj, (tuple, list)):
+        for item in obj:
+            rows = count_rows(item)
+            if rows is not None:
+                return rows
+    return None
+
+
+class _Frame:
+    # 正在执行的阶段（支持嵌套）
+    def __init__(self, name):
+        self.name = name
+        self.counters = {}
+        self.child_py_peak = 0
+
+
+class StageProfiler:
+    """
+    流水线各阶段的耗时与内存记录器
+
+    每次调用被 stage 装饰的函数记录一条：墙钟时间、CPU 时间、Python 分配峰值（tracemalloc）、
+    进程峰值 RSS、输入/输出行数以及阶段内的计数（如缓存命中）。关闭时装饰器直接调用原函数。
+    StationPool 并行执行时子进程内的记录不回传，主进程以 StationPool.map[函数名] 记录整个并行调用。
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.trace_memory = False
+        self.cprofile_dir = None
+        self.records = []
+        self.totals = {}
+        self._stack = []
+        self._cprofile_active = False
+        self._started_tracemalloc = False
+
+    def enable(self, trace_memory=True, cprofile_dir=None):
+        self.enabled = True
+        self.trace_memory = trace_memory
+        self.cprofile_dir = cprofile_dir
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+        if cprofile_dir:
+            os.makedirs(cprofile_dir, exist_ok=True)
+
+    def disable(self):
+        self.enabled = False
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+
+    def reset(self):
+        self.records = []
+        self.totals = {}
+
+    def count(self, key, n=1):
+        """
+        对当前阶段（及全局合计）累加计数，例如 count("cache_hit")
+        """
+        if not self.enabled:
+            return
+        self.totals[key] = self.totals.get(key, 0) + n
+        if self._stack:
+            counters = self._stack[-1].counters
+            counters[key] = counters.get(key, 0) + n
+
+    def run(self, name, func, args, kwargs):
+        frame = _Frame(name)
+        self._stack.append(frame)
+        rss_before = _peak_rss_mb()
+        if self.trace_memory and tracemalloc.is_tracing():
+            if len(self._stack) > 1:
+                # 重置前把外层阶段到目前为止的峰值记入外层，否则外层在子阶段之前的峰值会丢失
+                parent = self._stack[-2]
+                parent.child_py_peak = max(parent.child_py_peak, tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+
+        # 只对最外层阶段启用 cProfile，避免嵌套的 profiler 互相覆盖
+        prof = None
+        if self.cprofile_dir and not self._cprofile_active:
+            prof = cProfile.Profile()
+            self._cprofile_active = True
+
+        start = datetime.now()
+        wall0, cpu0 = time.perf_counter(), time.process_time()
+        try:
+            result = prof.runcall(func, *args, **kwargs) if prof is not None else func(*args, **kwargs)
+        finally:
+            wall, cpu = time.perf_counter() - wall0, time.process_time() - cpu0
+            self._stack.pop()
+            if prof is not None:
+                self._cprofile_active = False
+
+        py_peak = None
+        if self.trace_memory and tracemalloc.is_tracing():
+            # 子阶段会重置峰值，本阶段峰值取自身（含子阶段开始前）与子阶段的较大者
+            py_peak = max(tracemalloc.get_traced_memory()[1], frame.child_py_peak)
+            if self._stack:
+                parent = self._stack[-1]
+                parent.child_py_peak = max(parent.child_py_peak, py_peak)
+        rss_after = _peak_rss_mb()
+
+        rows_in = next((r for r in map(count_rows, list(args) + list(kwargs.values())) if r is not None), None)
+        record = {
+            "stage": name,
+            "start": start.isoformat(timespec="milliseconds"),
+            "depth": len(self._stack),
+            "parent": self._stack[-1].name if self._stack else None,
+            "wall_s": round(wall, 6),
+            "cpu_s": round(cpu, 6),
+            "py_peak_mb": None if py_peak is None else round(py_peak / _MB, 3),
+            "rss_peak_mb": None if rss_after is None else round(rss_after, 3),
+            "rss_growth_mb": None if rss_after is None else round(rss_after - rss_before, 3),
+            "rows_in": rows_in,
+            "rows_out": count_rows(result),
+        }
+        record.update(frame.counters)
+        self.records.append(record)
+        if self._stack:
+            # 计数同时计入外层阶段
+            for key, n in frame.counters.items():
+                self._stack[-1].counters[key] = self._stack[-1].counters.get(key, 0) + n
+
+        if prof is not None:
+            prof.dump_stats(os.path.join(self.cprofile_dir, f"{len(self.records):03d}_{name}.prof"))
+        return result
+
+    def summary(self):
+        """
+        按阶段汇总：调用次数、总耗时、最大内存峰值、总行数
+        """
+        if not self.records:
+            return pd.DataFrame()
+        df = pd.DataFrame(self.records)
+        agg = {"wall_s": "sum", "cpu_s": "sum", "py_peak_mb": "max", "rss_peak_mb": "max",
+               "rows_in": "sum", "rows_out": "sum"}
+        summary = df.groupby("stage", sort=False).agg({k: v for k, v in agg.items() if k in df.columns})
+        summary.insert(0, "calls", df.groupby("stage", sort=False).size())
+        return summary.sort_values("wall_s", ascending=False)
+
+    def write_report(self, path_prefix):
+        """
+        写出 <path_prefix>.json（逐次记录 + 计数合计）与 <path_prefix>.csv（逐次记录），返回两个路径
+        """
+        out_dir = os.path.dirname(path_prefix)
+        if out_dir:
+            os.makedirs(out_dir, exist_ok=True)
+        json_path, csv_path = path_prefix + ".json", path_prefix + ".csv"
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump({"records": self.records, "totals": self.totals}, f, ensure_ascii=False, indent=2)
+
+        fields = []
+        for record in self.records:
+            fields.extend(k for k in record if k not in fields)
+        with open(csv_path, "w", encoding="utf-8-sig", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=fields)
+            writer.writeheader()
+            writer.writerows(self.records)
+        return json_path, csv_path
+
+
+profiler = StageProfiler()
+
+
+def stage(name=None):
+    """
+    阶段装饰器：@stage() 以“模块.函数名”记录，@stage("normalize") 以指定名称记录
+    """
+    def decorator(func):
+        # 以源文件名作为模块名，脚本直接运行（__main__）时名称保持一致；被其他装饰器（如结果缓存）包装时取原函数
+        module = os.path.splitext(os.path.basename(inspect.unwrap(func).__code__.co_filename))[0]
+        stage_name = name or f"{module}.{func.__name__}"
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not profiler.enabled:
+                return func(*args, **kwargs)
+            return profiler.run(stage_name, func, args, kwargs)
+        return wrapper
+    return decorator
+
+
+def count(key, n=1):
+    profiler.count(key, n)
+
+
+def enable_from_config(cfg=config):
+    """
+    按 config 开启记录，并在进程退出时写出报告（config.profile 为 False 时不做任何事）；由入口脚本调用
+    """
+    if not getattr(cfg, "profile", False) or profiler.enabled:
+        return profiler
+    report_dir = getattr(cfg, "profile_dir", "./result/profile")
+    prefix = os.path.join(report_dir, f"profile_{datetime.now():%Y%m%d_%H%M%S}")
+    cprofile_dir = prefix + "_cprofile" if getattr(cfg, "profile_cprofile", False) else None
+    profiler.enable(trace_memory=getattr(cfg, "profile_trace_memory", True), cprofile_dir=cprofile_dir)
+    atexit.register(lambda: profiler.records and profiler.write_report(prefix))
+    return profiler
@@ -0,0 +1,115 @@
+import os
+import json
+import hashlib
+import inspect
+import functools
+import pandas as pd
+import config
+import Profiler
+from ColumnarCache import write_frame, read_frame, _FRAME_EXT
+
+# 缓存键的格式版本：键的组成或结果文件格式变化时递增
+CACHE_VERSION = 1
+
+
+def frame_fingerprint(df):
+    """
+    DataFrame 的内容哈希（sha1）：列名、类型与按行顺序的逐行哈希，与索引无关
+    """
+    h = hashlib.sha1()
+    h.update(json.dumps([[str(c), str(t)] for c, t in df.dtypes.items()], ensure_ascii=False).encode("utf-8"))
+    h.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return h.hexdigest()
+
+
+class ResultCache:
+    """
+    计算结果的磁盘缓存（内容寻址）
+
+    以输入数据的内容哈希与参数为键，每个结果一个列式文件；命中时刷新文件修改时间，
+    目录总大小超过 max_bytes 时按修改时间淘汰最久未使用的结果（LRU）。
+    """
+
+    def __init__(self, cache_dir, max_bytes):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def key(self, name, params):
+        # params 中的 DataFrame 以内容哈希代替，其余参数按 JSON 序列化（日期等转为字符串）
+        params = {k: {"frame": frame_fingerprint(v)} if isinstance(v, pd.DataFrame) else v for k, v in params.items()}
+        payload = json.dumps({"name": name, "params": params}, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + _FRAME_EXT)
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            df = read_frame(path)
+        except (OSError, ValueError):
+            return None
+        # 刷新修改时间，作为最近使用时间
+        os.utime(path)
+        return df
+
+    def put(self, key, df):
+        write_frame(df, self._path(key))
+        self.evict()
+
+    def evict(self):
+        """
+        目录总大小超过 max_bytes 时，从最久未使用的结果开始删除
+        """
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.is_file() and entry.name.endswith(_FRAME_EXT):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            os.remove(path)
+            total -= size
+
+
+def _code_version(func):
+    # 函数所在模块的源码哈希（包含同模块中的辅助函数）：代码修改后旧结果自动失效
+    try:
+        source = inspect.getsource(inspect.getmodule(func))
+    except (OSError, TypeError):
+        source = inspect.getsource(func)
+    return hashlib.sha1(source.encode("utf-8")).hexdigest()
+
+
+def memoize(ignore=()):
+    """
+    结果缓存装饰器：返回 DataFrame 的函数按全部参数（DataFrame 参数取内容哈希，ignore 中的参数不参与）
+    及所在模块的源码版本缓存到 config.result_cache_dir；config.use_result_cache 为 False 时直接计算
+    """
+    def decorator(func):
+        module = os.path.splitext(os.path.basename(func.__code__.co_filename))[0]
+        name = f"{module}.{func.__name__}@{CACHE_VERSION}.{_code_version(func)}"
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not config.use_result_cache:
+                return func(*args, **kwargs)
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            params = {k: v for k, v in bound.arguments.items() if k not in ignore}
+
+            cache = ResultCache(config.result_cache_dir, config.result_cache_max_mb * 1024 * 1024)
+            key = cache.key(name, params)
+            result = cache.get(key)
+            if result is not None:
+                Profiler.count("result_cache_hit")
+                return result
+            result = func(*args, **kwargs)
+            cache.put(key, result)
+            return result
+        return wrapper
+    return decorator
@@ -0,0 +1,83 @@
+import warnings
+import pandas as pd
+import dataStandard_v2
+import weight_v2
+import threshold_v2
+import Profiler
+import DataFilter
+
+# 打分使用的指标列
+INDICATORS = ["检验成本", "不合格率", "返工成本", "报废成本"]
+need_df_cols = ["工位", "更新时间"] + INDICATORS
+
+def prepare_input(final_df):
+    """
+    将 ExtractIndicators 输出的 final_result 格式转换为打分输入
+    """
+    df = final_df.copy()
+    df["更新时间"] = df["date"]
+    df["不合格率"] = 1 - df["合格率"]
+    return df[need_df_cols].copy()
+
+def load_input(file_path="./data/final_result.xlsx", end_date=None):
+    # 加载Excel文件（end_date 之后的数据不参与打分，直接丢弃）
+    df = pd.read_excel(file_path, engine="openpyxl")
+    return prepare_input(DataFilter.select_rows(df, "date", end_date=end_date))
+
+@Profiler.stage()
+def weighted_result(standard_data, final_weights):
+    """
+    按更新时间合并标准化指标与权重，计算各指标加权值及最终结果
+    """
+    # 为权重的4个指标列添加“_权重”后缀，明确区分“指标值”和“权重”
+    final_weights_renamed = final_weights.rename(columns={col: f"{col}_权重" for col in INDICATORS})
+
+    # 左连接：以标准化数据的时间为准，确保所有工位的指标都能匹配到对应时间的权重
+    merged_data = pd.merge(
+        left=standard_data,
+        right=final_weights_renamed,
+        on="更新时间",
+        how="left"
+    )
+
+    # 检查是否存在权重缺失
+    missing_weight_rows = merged_data[merged_data["检验成本_权重"].isna()]
+    if not missing_weight_rows.empty:
+        missing_times = missing_weight_rows["更新时间"].unique()
+        warnings.warn(f"以下时间无对应权重,加权值会显示NaN:{missing_times}")
+
+    # 计算每个指标的“标准化值 × 权重”（加权值）
+    for col in INDICATORS:
+        merged_data[f"{col}_加权值"] = merged_data[col] * merged_data[f"{col}_权重"]
+    merged_data["结果"] = 100-(merged_data["检验成本_加权值"] + merged_data["不合格率_加权值"] + merged_data["返工成本_加权值"] + merged_data["报废成本_加权值"])*100
+
+    # 按时间+工位排序
+    return merged_data.sort_values(by=["更新时间", "工位"]).reset_index(drop=True)
+
+@Profiler.stage()
+def score_pipeline(df, config, excel_save_path=None, start_date=None, end_date=None, stations=None):
+    """
+    端到端打分：标准化 → 组合权重 → 加权结果 → 分级阈值打分
+
+    df 为 prepare_input 格式的数据；config 提供 beta、log_c、log_d、expert_weights、
+    expert_weights_percent、CV_High、CV_Low（可直接传入 config 模块）。
+    只在指定 excel_save_path 时写出 Excel，返回内存中的打分结果。
+
+    EMA、CRITIC 权重与历史阈值都依赖此前全部时间点、标准化依赖同一时间点的全部工位，
+    因此只丢弃 end_date 之后的数据，start_date / stations 只过滤输出的打分结果。
+    """
+    df = DataFilter.select_rows(df, "更新时间", end_date=end_date)
+
+    # 获取标准化指标值（包含时间维度）
+    standard_data = dataStandard_v2.Normaliz(df, config.beta, config.log_c, config.log_d,
+                                             n_workers=getattr(config, "n_workers", 1))
+
+    # 获取最终权重（包含时间维度）
+    final_weights = weight_v2.CombinedWeight(df, config.expert_weights, config.expert_weights_percent)
+
+    final_result = weighted_result(standard_data, final_weights)
+
+    # 根据阈值，打分
+    score, _ = threshold_v2.GradeThreshold(final_result, config.CV_High, config.CV_Low, excel_save_path,
+                                           start_date, end_date, stations)
+    return score
@@ -0,0 +1,131 @@
+import pandas as pd
+
+# 数据库来源依赖 SQLAlchemy，未安装时只能使用 Excel 来源
+try:
+    import sqlalchemy as sa
+except ImportError:
+    sa = None
+
+# 同一数据库 URL 的引擎（含连接池）在进程内复用
+_ENGINES = {}
+
+
+def get_engine(url, **engine_kwargs):
+    """
+    按 URL 返回带连接池的引擎（进程内缓存）；pool_pre_ping 保证长时间空闲后取到的连接仍然可用
+    """
+    if sa is None:
+        raise ImportError("数据库来源需要安装 SQLAlchemy")
+    key = (url, tuple(sorted(engine_kwargs.items())))
+    if key not in _ENGINES:
+        engine_kwargs.setdefault("pool_pre_ping", True)
+        _ENGINES[key] = sa.create_engine(url, **engine_kwargs)
+    return _ENGINES[key]
+
+
+def dispose_engines():
+    """
+    关闭所有缓存的引擎及其连接池
+    """
+    for engine in _ENGINES.values():
+        engine.dispose()
+    _ENGINES.clear()
+
+
+class SqlSource:
+    """
+    业务表的数据库来源（SQLAlchemy，本地以 SQLite 测试）
+
+    与质量数据工作簿中的工作表同名的表按需查询：只选择需要的列，过滤条件与日期范围下推到 SQL，
+    结果按 chunk_rows 行分批取回。start_date / end_date 为闭区间，None 表示不限；
+    between() 返回共用同一连接池、只是日期范围不同的来源。
+    """
+
+    def __init__(self, url, start_date=None, end_date=None, **engine_kwargs):
+        self.url = url
+        self.engine_kwargs = engine_kwargs
+        self.engine = get_engine(url, **engine_kwargs)
+        self.start_date = None if start_date is None else pd.Timestamp(start_date)
+        self.end_date = None if end_date is None else pd.Timestamp(end_date)
+        self._tables = {}
+
+    def between(self, start_date=None, end_date=None):
+        return SqlSource(self.url, start_date, end_date, **self.engine_kwargs)
+
+    def table(self, name):
+        """
+        反射表结构（每个来源只反射一次）
+        """
+        if name not in self._tables:
+            try:
+                self._tables[name] = sa.Table(name, sa.MetaData(), autoload_with=self.engine)
+            except sa.exc.NoSuchTableError:
+                raise KeyError(f"数据库缺少表: {name}") from None
+        return self._tables[name]
+
+    def has_column(self, table, column):
+        return column in self.table(table).c
+
+    def date_range(self, table, start_date=None, end_date=None, date_col="date"):
+        # 日期范围谓词：[start_date, end_date] 按天比较，end_date 当天全部包含
+        column = self.table(table).c[date_col]
+        conditions = []
+        if start_date is not None:
+            conditions.append(column >= pd.Timestamp(start_date).to_pydatetime())
+        if end_date is not None:
+            conditions.append(column < (pd.Timestamp(end_date).normalize() + pd.Timedelta(days=1)).to_pydatetime())
+        return conditions
+
+    def date_filter(self, table, date_col="date"):
+        # 来源自身的日期范围
+        return self.date_range(table, self.start_date, self.end_date, date_col)
+
+    def window(self, table, key_cols, start_date=None, end_date=None, where=(), date_col="date"):
+        """
+        日期窗口谓词：[start_date, end_date] 内的行，外加每组 key_cols 在满足 where 的行中最早日期的行
+        （用于保持各工位的预热截断与全量数据一致）
+        """
+        t = self.table(table)
+        conditions = self.date_range(table, None, end_date, date_col)
+        if start_date is not None:
+            keys = [t.c[c] for c in key_cols]
+            first = sa.select(*keys, sa.func.min(t.c[date_col])).where(*where).group_by(*keys)
+            conditions.append(sa.or_(*self.date_range(table, start_date, None, date_col),
+                                     sa.tuple_(*keys, t.c[date_col]).in_(first)))
+        return conditions
+
+    def not_blank(self, table, column):
+        # column 非空且去除首尾空格后不是空字符串
+        c = self.table(table).c[column]
+        return sa.and_(c.is_not(None), sa.func.trim(c) != "")
+
+    def exclude_value(self, table, column, value):
+        # column 为空或不等于 value（与 pandas 中 NaN != value 为真的语义一致）
+        c = self.table(table).c[column]
+        return sa.or_(c.is_(None), c != value)
+
+    def in_subquery(self, table, column, sub_table, sub_column, where=()):
+        # 半连接：column 取值出现在 sub_table 满足 where 的 sub_column 中
+        sub = self.table(sub_table)
+        return self.table(table).c[column].in_(sa.select(sub.c[sub_column]).where(*where))
+
+    def select(self, table, columns, where=()):
+        """
+        构造只含 columns 中存在的列的查询，返回 (查询, 实际列名)
+        """
+        t = self.table(table)
+        present = [c for c in columns if c in t.c]
+        return sa.select(*(t.c[c] for c in present)).where(*where), present
+
+    def iter_batches(self, query, chunk_rows):
+        """
+        服务端游标分批取回结果，每批为一个记录列表（不超过 chunk_rows 行）
+        """
+        with self.engine.connect() as conn:
+            result = conn.execution_options(stream_results=True, yield_per=chunk_rows).execute(query)
+            for rows in result.partitions():
+                yield rows
+
+    def read(self, query):
+        with self.engine.connect() as conn:
+            return conn.execute(query).all()
@@ -0,0 +1,155 @@
+import os
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory, resource_tracker
+import numpy as np
+import pandas as pd
+import dataStandard_v2
+import Profiler
+
+
+def _station_keys(frame, station_key):
+    # 工位可以是索引层（长表）也可以是普通列（ExtractData 输出）
+    if station_key in (frame.index.names or []):
+        return frame.index.get_level_values(station_key)
+    return frame[station_key]
+
+
+def partition_stations(frame, n_parts, station_key="station"):
+    """
+    按工位把行划分为 n_parts 份：每份包含按名称排序后连续的若干完整工位，并按行数大致均衡，
+    返回每份的行号（保持原始行顺序）
+    """
+    codes, _ = pd.factorize(_station_keys(frame, station_key), sort=True)
+    valid = codes >= 0
+    counts = np.bincount(codes[valid]) if valid.any() else np.zeros(0, dtype=np.intp)
+    if len(counts) == 0:
+        return [np.arange(len(frame))]
+    n_parts = max(1, min(n_parts, len(counts)))
+
+    # 按累计行数切分工位区间
+    cum = np.cumsum(counts)
+    cuts = np.searchsorted(cum, np.linspace(0, cum[-1], n_parts + 1)[1:-1], side="left") + 1
+    bounds = np.unique(np.concatenate([[0], cuts, [len(counts)]]))
+    return [np.flatnonzero((codes >= lo) & (codes < hi)) for lo, hi in zip(bounds[:-1], bounds[1:])]
+
+
+class _SharedArray:
+    """
+    共享内存中的 NumPy 数组：主进程创建，子进程按 (name, shape, dtype) 挂载，避免序列化整块数据
+    """
+
+    def __init__(self, shape, dtype=np.float64, name=None):
+        dtype = np.dtype(dtype)
+        if name is None:
+            size = max(int(np.prod(shape)) * dtype.itemsize, 1)
+            self.shm = shared_memory.SharedMemory(create=True, size=size)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.spec = (self.shm.name, tuple(shape), dtype.str)
+        self.array = np.ndarray(shape, dtype=dtype, buffer=self.shm.buf)
+
+    @classmethod
+    def attach(cls, spec):
+        name, shape, dtype = spec
+        return cls(shape, dtype, name=name)
+
+    def close(self):
+        self.array = None
+        self.shm.close()
+
+    def unlink(self):
+        self.close()
+        self.shm.unlink()
+
+
+def _run_chunk(func, frame, kwargs):
+    return func(frame, **kwargs)
+
+
+def _ema_chunk(in_spec, out_spec, lo, hi, beta):
+    # 子进程：挂载共享内存，对工位区间 [lo, hi) 沿时间轴计算偏差修正后的EMA
+    src = _SharedArray.attach(in_spec)
+    dst = _SharedArray.attach(out_spec)
+    try:
+        _, dst.array[lo:hi] = dataStandard_v2.calculate_ema(src.array[lo:hi], beta, axis=-1)
+    finally:
+        src.close()
+        dst.close()
+
+
+class StationPool:
+    """
+    按工位并行执行的进程池
+
+    map 按工位切分长表后在各进程中执行同一阶段函数，再按工位顺序拼接，结果顺序与串行执行一致；
+    ema 通过共享内存传递 (工位, 指标, 时间) 立方体，按工位区间并行计算EMA。
+    n_workers <= 1 时不创建进程，直接串行执行；为 None 时使用全部 CPU。
+    """
+
+    def __init__(self, n_workers=None):
+        # 只有 None 表示全部 CPU，0 与负数同样按串行处理
+        self.n_workers = (os.cpu_count() or 1) if n_workers is None else max(int(n_workers), 1)
+        self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _pool(self):
+        if self._executor is None:
+            # 先启动共享内存登记进程，子进程继承同一个，避免各自退出时把共享内存误报为泄漏
+            resource_tracker.ensure_running()
+            self._executor = ProcessPoolExecutor(max_workers=self.n_workers)
+        return self._executor
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def map(self, func, frame, station_key="station", **kwargs):
+        if self.n_workers <= 1:
+            return func(frame, **kwargs)
+        parts = partition_stations(frame, self.n_workers, station_key)
+        if len(parts) <= 1:
+            return func(frame, **kwargs)
+        if Profiler.profiler.enabled:
+            # 子进程中的阶段记录不回传，在主进程按整个并行调用记录一次
+            name = f"StationPool.map[{getattr(func, '__name__', func)}]"
+            return Profiler.profiler.run(name, self._map_parts, (func, frame, parts, kwargs), {})
+        return self._map_parts(func, frame, parts, kwargs)
+
+    def _map_parts(self, func, frame, parts, kwargs):
+        chunks = [frame.iloc[rows] for rows in parts]
+        results = list(self._pool().map(partial(_run_chunk, func, kwargs=kwargs), chunks))
+        return pd.concat(results)
+
+    def ema(self, array_3d, beta):
+        n_stations = array_3d.shape[0]
+        if self.n_workers <= 1 or n_stations < 2:
+            return dataStandard_v2.calculate_ema(array_3d, beta, axis=-1)[1]
+
+        src = _SharedArray(array_3d.shape)
+        dst = _SharedArray(array_3d.shape)
+        try:
+            src.array[...] = array_3d
+            bounds = np.linspace(0, n_stations, min(self.n_workers, n_stations) + 1).astype(int)
+            futures = [self._pool().submit(_ema_chunk, src.spec, dst.spec, lo, hi, beta)
+                       for lo, hi in zip(bounds[:-1], bounds[1:])]
+            for future in futures:
+                future.result()
+            return dst.array.copy()
+        finally:
+            src.unlink()
+            dst.unlink()
+
+
+def map_stations(func, frame, n_workers=1, station_key="station", **kwargs):
+    """
+    单次调用的便捷接口：在临时进程池中按工位并行执行 func
+    """
+    with StationPool(n_workers) as pool:
+        return pool.map(func, frame, station_key=station_key, **kwargs)
@@ -1,215 +1,267 @@
+import logging
+import numpy as np
 import pandas as pd
+import config
 import ExtractData as ED
+import FastExcel
+import Profiler
 
-def split_station(merged_df):    
-    # 定义班次排序优先级（白班→中班→夜班）
-    shift_priority = {'白班': 0, '中班': 1, '夜班': 2}
+# 班次排序优先级（白班→中班→夜班）
+SHIFT_PRIORITY = {'白班': 0, '中班': 1, '夜班': 2}
 
-    # 创建一个字典用于存储每个工位的DataFrame
-    station_data = {}
-    
-    # 遍历每个工位的分组数据
-    for station, group in merged_df.groupby('line_area_name'):
-        # 排序：先按“时间”升序，时间相同则按“班次”优先级排序
-        group['班次优先级'] = group['shift_name'].map(shift_priority)
-        # 按“时间”和“班次优先级”排序（排序后删除临时列）
-        sorted_group = group.sort_values(
-            by=['date', '班次优先级'],  # 排序依据：先时间，后班次优先级
-            ascending=[True, True]      # 均为升序（时间从小到大，班次按白→中→夜）
-        ).drop(columns=['班次优先级'])  # 删除临时列
-        
-        # 只保留指定的列
-        selected_columns = ['date', 'shift_name', 'process_result_name', 'defect_number', '返工检测成本', '返工总成本']
-        filtered_group = sorted_group[selected_columns].reset_index(drop=True)
-                    
-        # 保存到字典中
-        station_data[station] = filtered_group
-
-    return station_data
+# 长表索引：班次级数据按（工位，日期，班次），日级数据按（工位，日期）
+SHIFT_INDEX = ['station', 'date', 'shift_name']
+DAILY_INDEX = ['station', 'date']
+
+# 班次缺陷汇总的输出列
+SUMMARY_COLS = ['总缺陷数', '返工总数', '报废总数', '其他总数', '返工检测成本', '返工总成本']
+
+logger = logging.getLogger(__name__)
+
+def _shift_priority(shift_name):
+    # 班次 → 数值优先级（不在优先级表中的为 NaN）；分类列只对类别查表一次再按编码展开
+    if isinstance(shift_name.dtype, pd.CategoricalDtype):
+        lookup = np.array([SHIFT_PRIORITY.get(c, np.nan) for c in shift_name.cat.categories] + [np.nan], dtype='float64')
+        return lookup[shift_name.cat.codes.to_numpy()]   # 编码 -1（缺失）取到末尾的 NaN
+    return shift_name.map(SHIFT_PRIORITY).astype('float64').to_numpy()
+
+def _sort_by_date_shift(df):
+    # 按工位、日期、班次优先级排序，班次不在优先级表中的排在最后
+    df = df.assign(班次优先级=_shift_priority(df['shift_name']))
+    return df.sort_values(by=['station', 'date', '班次优先级'], kind='stable').drop(columns=['班次优先级'])
+
+def _station_days(frame):
+    # （工位，日期）长表 → (工位编码, 日序号, 各工位首日)；直接使用 MultiIndex 的工位编码，无需重新分解
+    level = frame.index.names.index('station')
+    codes = np.asarray(frame.index.codes[level], dtype=np.int64)
+    days = frame.index.get_level_values('date').to_numpy().astype('datetime64[D]').astype(np.int64)
+    first_day = np.full(len(frame.index.levels[level]), np.iinfo(np.int64).max)
+    np.minimum.at(first_day, codes, days)
+    return codes, days, first_day
+
+def rolling_sum(frame, cols, window_days, min_periods=1):
+    """
+    按工位的时间窗口滚动求和：所有列、所有工位一次计算，结果与 frame 按索引对齐
+
+    frame 为（工位，日期）日级长表，窗口为 (date - window_days, date]，与 rolling('ND') 一致；
+    窗口内非空值个数少于 min_periods 时记为 NaN。每个工位在稠密日历上做累计和，
+    窗口和 = 当天累计和 - window_days 天前累计和，无需排序，也不逐列、逐工位重建索引。
+    """
+    values = frame[cols].to_numpy(dtype='float64')
+    if len(values) == 0:
+        return pd.DataFrame(values, index=frame.index, columns=cols)
+    codes, days, first_day = _station_days(frame)
+    n_stations = len(first_day)
+
+    # 稠密日历：每个工位占一段，依次为 window_days 个空日 + 该工位首日起的每一天（同一天多行时求和），
+    # 前置空日保证累计和之差不会跨到上一个工位
+    offset = days - first_day[codes]
+    n_slots = int(offset.max()) + window_days + 1
+    cell = codes * n_slots + offset + window_days
+    size = n_stations * n_slots
+
+    present = ~np.isnan(values)
+    filled = np.where(present, values, 0.0)
+    sums = np.cumsum(np.stack([np.bincount(cell, weights=filled[:, j], minlength=size) for j in range(len(cols))], axis=1), axis=0)
+    window_sum = sums[cell] - sums[cell - window_days]
+
+    # 窗口内非空值个数：没有缺失值时各列相同，只需按行计数一次
+    if present.all():
+        counts = np.cumsum(np.bincount(cell, minlength=size))
+        window_count = (counts[cell] - counts[cell - window_days])[:, None]
+    else:
+        counts = np.cumsum(np.stack([np.bincount(cell, weights=present[:, j], minlength=size) for j in range(len(cols))], axis=1), axis=0)
+        window_count = counts[cell] - counts[cell - window_days]
+    window_sum[np.broadcast_to(window_count < min_periods, window_sum.shape)] = np.nan
+    return pd.DataFrame(window_sum, index=frame.index, columns=cols)
+
+def _drop_warmup(frame, window_days):
+    # 去掉每个工位前 window_days 天不足窗口长度的数据
+    codes, days, first_day = _station_days(frame)
+    return frame[days >= first_day[codes] + window_days]
+
+def _daily_frame(frame, cols):
+    # 将班次级长表按（工位，日期）求和，并确保 date 是 datetime 类型
+    daily = frame[cols].groupby(level=['station', 'date'], sort=True, observed=True).sum().reset_index()
+    daily['date'] = pd.to_datetime(daily['date'])
+    return daily.sort_values(by=DAILY_INDEX, kind='stable').set_index(DAILY_INDEX)
+
+def to_station_dict(frame):
+    """
+    长表 → {工位: DataFrame} 兼容视图，索引中的日期/班次还原为普通列
+    """
+    return {station: group.droplevel('station').reset_index()
+            for station, group in frame.groupby(level='station', sort=False, observed=True)}
+
+def from_station_dict(station_data, index_cols):
+    """
+    {工位: DataFrame} → 以 ['station'] + index_cols 为索引的长表
+    """
+    frames = [df.assign(station=station) for station, df in station_data.items()]
+    return pd.concat(frames, ignore_index=True).set_index(['station'] + index_cols)
+
+def _station_rows(merged_df):
+    # 只保留指定的列，工位为空的记录无法归属，直接丢弃
+    selected_columns = ['line_area_name', 'date', 'shift_name', 'process_result_name', 'defect_number', '返工检测成本', '返工总成本']
+    frame = merged_df[selected_columns].rename(columns={'line_area_name': 'station'})
+    return frame[frame['station'].notna()]
+
+@Profiler.stage()
+def split_station_frame(merged_df):
+    # 一次排序：工位 → 时间 → 班次优先级（白→中→夜），同一班次内保持原始顺序
+    return _sort_by_date_shift(_station_rows(merged_df)).set_index(SHIFT_INDEX)
+
+def _shift_totals(df):
+    # 先按处理结果把各指标拆成列（不满足条件的记为 0），再做一次 groupby 求和；返回未排序的普通列
+    result_name = df['process_result_name']
+    is_rework = result_name == '返工'
+    is_scrap = result_name == '报废'
+    is_other = ~result_name.isin(['返工', '报废'])
+    defects = df['defect_number']
+
+    work = pd.DataFrame({
+        'station': df['station'],
+        'date': df['date'],
+        'shift_name': df['shift_name'],
+        '总缺陷数': defects,
+        '返工总数': defects.where(is_rework, 0),
+        '报废总数': defects.where(is_scrap, 0),
+        '其他总数': defects.where(is_other, 0),
+        '返工检测成本': df['返工检测成本'].where(is_rework, 0),
+        '返工总成本': df['返工总成本'].where(is_rework, 0),
+    })
+    return work.groupby(SHIFT_INDEX, sort=True, observed=True).sum().reset_index()
+
+@Profiler.stage()
+def shift_summary_frame(station_frame):
+    """
+    一次分组汇总所有工位每个班次的缺陷数据
+    """
+    summary = _shift_totals(station_frame.reset_index())
+    return _sort_by_date_shift(summary).set_index(SHIFT_INDEX)
+
+@Profiler.stage()
+def stream_shift_summary_frame(source, chunk_rows=None, start_date=None, end_date=None):
+    """
+    分块流式版本的 shift_summary_frame(split_station_frame(ED.Combined_rework_costs(source, start_date, end_date)))：
+    质量事件表逐块清洗、合并返工成本后直接累加到（工位，日期，班次）汇总，
+    内存上限由汇总组数与单块大小决定，而不随事件数增长
+    """
+    totals = None
+    for chunk in ED.iter_rework_costs(source, chunk_rows, start_date, end_date):
+        part = _shift_totals(_station_rows(chunk))
+        if totals is not None:
+            part = pd.concat([totals, part], ignore_index=True)
+            part = part.groupby(SHIFT_INDEX, sort=False, observed=True).sum().reset_index()
+        totals = part
+    return _sort_by_date_shift(totals).set_index(SHIFT_INDEX)
+
+@Profiler.stage()
+def daily_total_frame(summary_frame, window_days=1):
+    # 按日期汇总各项指标
+    daily_df = _daily_frame(summary_frame, SUMMARY_COLS)
+
+    # 基于时间窗口滚动累计
+    daily_df[SUMMARY_COLS] = rolling_sum(daily_df, SUMMARY_COLS, window_days)
+
+    # 去掉不足 window_days 的数据
+    return _drop_warmup(daily_df, window_days)
+
+@Profiler.stage()
+def split_station_output_frame(output_df):
+    # 只保留指定的列，工位为空的记录无法归属，直接丢弃
+    selected_columns = ['line_area_name', 'date', 'shift_name', 'real_out_put']
+    frame = output_df[selected_columns].rename(columns={'line_area_name': 'station'})
+    frame = frame[frame['station'].notna()]
+
+    # 一次排序：工位 → 时间 → 班次优先级（白→中→夜）
+    return _sort_by_date_shift(frame).set_index(SHIFT_INDEX)
+
+@Profiler.stage()
+def shift_summary_output_frame(station_output_frame):
+    # 一次分组汇总所有工位每个班次的产量
+    summary = station_output_frame['real_out_put'].groupby(level=SHIFT_INDEX, sort=True, observed=True).sum()
+    summary = summary.rename('total_real_output').reset_index()
+    return _sort_by_date_shift(summary).set_index(SHIFT_INDEX)
+
+@Profiler.stage()
+def daily_total_output_frame(summary_output_frame, window_days=90):
+    # 按日期汇总所有班次的产量
+    daily_totals = _daily_frame(summary_output_frame, ['total_real_output'])
+    daily_totals = daily_totals.rename(columns={'total_real_output': 'daily_total_output'})
+
+    # 基于时间窗口滚动累计
+    daily_totals[['daily_total_output']] = rolling_sum(daily_totals, ['daily_total_output'], window_days)
+
+    # 去掉不足 window_days 的数据
+    return _drop_warmup(daily_totals, window_days)
+
+# ---- {工位: DataFrame} 字典接口：基于长表实现的兼容视图 ----
+
+def split_station(merged_df):
+    return to_station_dict(split_station_frame(merged_df))
 
 def shift_summary(station_data):
-    summary_data = {}
-    for station, df in station_data.items():
-        grouped = df.groupby(['date', 'shift_name'])
-        result = []
-        for (date, shift), group in grouped:
-            total_defects = group['defect_number'].sum()
-            rework_total = group[group['process_result_name'] == '返工']['defect_number'].sum()
-            scrap_total = group[group['process_result_name'] == '报废']['defect_number'].sum()
-            other_total = group[~group['process_result_name'].isin(['返工', '报废'])]['defect_number'].sum()
-            check_cost_total = group[group['process_result_name'] == '返工']['返工检测成本'].sum()
-            rework_cost_total = group[group['process_result_name'] == '返工']['返工总成本'].sum()
-            result.append({
-                'date': date,
-                'shift_name': shift,
-                '总缺陷数': total_defects,
-                '返工总数': rework_total,
-                '报废总数': scrap_total,
-                '其他总数': other_total,
-                '返工检测成本': check_cost_total,
-                '返工总成本': rework_cost_total
-            })
-        summary_df = pd.DataFrame(result)
-
-        shift_priority = {'白班': 0, '中班': 1, '夜班': 2}
-        summary_df['班次优先级'] = summary_df['shift_name'].map(shift_priority)
-        summary_df = summary_df.sort_values(by=['date', '班次优先级']).drop(columns=['班次优先级']).reset_index(drop=True)
-
-        summary_data[station] = summary_df
-    return summary_data
-
-def daily_total(summary_data, window_days=1):  
-    daily_summary_data = {}
-    for station, df in summary_data.items():
-        # 按日期汇总各项指标
-        daily_df = df.groupby('date').agg({
-            '总缺陷数': 'sum',
-            '返工总数': 'sum',
-            '报废总数': 'sum',
-            '其他总数': 'sum',
-            '返工检测成本': 'sum',
-            '返工总成本': 'sum'
-        }).reset_index()
-
-        
-        # 确保 date 是 datetime 类型
-        daily_df['date'] = pd.to_datetime(daily_df['date'])
-        daily_df = daily_df.sort_values(by='date').set_index('date')
-
-        # 基于时间窗口滚动累计
-        daily_df = daily_df.rolling(f'{window_days}D', min_periods=1).sum()
-
-        # 重置索引
-        daily_df = daily_df.reset_index()
-
-        # 去掉不足 window_days 的数据
-        start_date = daily_df['date'].min()
-        daily_df = daily_df[daily_df['date'] >= start_date + pd.Timedelta(days=window_days)]
-
-        daily_summary_data[station] = daily_df
-    return daily_summary_data
+    return to_station_dict(shift_summary_frame(from_station_dict(station_data, ['date', 'shift_name'])))
 
+def daily_total(summary_data, window_days=1):
+    return to_station_dict(daily_total_frame(from_station_dict(summary_data, ['date', 'shift_name']), window_days))
 
 def split_station_output(output_df):
-    # 定义班次排序优先级（白班→中班→夜班）
-    shift_priority = {'白班': 0, '中班': 1, '夜班': 2}
-
-    # 创建一个字典用于存储每个工位的DataFrame
-    station_output = {}
-    
-    # 遍历每个工位的分组数据
-    for station, group in output_df.groupby('line_area_name'):
-        # 排序：先按“时间”升序，时间相同则按“班次”优先级排序
-        group['班次优先级'] = group['shift_name'].map(shift_priority)
-        # 按“时间”和“班次优先级”排序（排序后删除临时列）
-        sorted_group = group.sort_values(
-            by=['date', '班次优先级'],  # 排序依据：先时间，后班次优先级
-            ascending=[True, True]      # 均为升序（时间从小到大，班次按白→中→夜）
-        ).drop(columns=['班次优先级'])  # 删除临时列
-        
-        # 只保留指定的列
-        selected_columns = ['date', 'shift_name', 'real_out_put']
-        filtered_group = sorted_group[selected_columns].reset_index(drop=True)
-                    
-        # 保存到字典中
-        station_output[station] = filtered_group
-
-    return station_output
+    return to_station_dict(split_station_output_frame(output_df))
 
 def shift_summary_output(station_output):
-    summary_output = {}
-    for station, df in station_output.items():
-        grouped = df.groupby(['date', 'shift_name'])
-        result = []
-        for (date, shift), group in grouped:
-            total_defects = group['real_out_put'].sum()
-            result.append({
-                'date': date,
-                'shift_name': shift,
-                'total_real_output': total_defects,
-            })
-        real_output_df = pd.DataFrame(result)
-
-        shift_priority = {'白班': 0, '中班': 1, '夜班': 2}
-        real_output_df['班次优先级'] = real_output_df['shift_name'].map(shift_priority)
-        real_output_df = real_output_df.sort_values(by=['date', '班次优先级']).drop(columns=['班次优先级']).reset_index(drop=True)
-
-        summary_output[station] = real_output_df
-    return summary_output
+    return to_station_dict(shift_summary_output_frame(from_station_dict(station_output, ['date', 'shift_name'])))
 
 def daily_total_output(summary_output, window_days=90):
-    daily_output = {}
-    for station, df in summary_output.items():
-        # 按日期汇总所有班次的产量
-        daily_totals = df.groupby('date')['total_real_output'].sum().reset_index()
-        daily_totals = daily_totals.rename(columns={'total_real_output': 'daily_total_output'})
-        
-        # 确保 date 是 datetime 类型
-        daily_totals['date'] = pd.to_datetime(daily_totals['date'])
-        daily_totals = daily_totals.sort_values(by='date').set_index('date')
-
-        # 基于时间窗口滚动累计
-        daily_totals['daily_total_output'] = daily_totals['daily_total_output'].rolling(f'{window_days}D', min_periods=1).sum()
-
-        # 重置索引
-        daily_totals = daily_totals.reset_index()
-   
-        # 去掉不足 window_days 的数据
-        start_date = daily_totals['date'].min()
-        daily_totals = daily_totals[daily_totals['date'] >= start_date + pd.Timedelta(days=window_days)]
-
-        daily_output[station] = daily_totals
-    return daily_output
+    return to_station_dict(daily_total_output_frame(from_station_dict(summary_output, ['date', 'shift_name']), window_days))
+
+def write_station_workbook(path, frame, label="子表"):
+    """
+    长表按工位拆成多个 sheet 一次写出（调试用中间结果，config.write_debug_excel 关闭时跳过）
+    """
+    if not getattr(config, "write_debug_excel", True):
+        return None
+    sheets = to_station_dict(frame)
+    FastExcel.write_sheets(path, sheets)
+    for station, df in sheets.items():
+        logger.debug("已生成工位「%s」的%s，共%d条记录", station, label, len(df))
+    logger.info("已写出%s %s：%d 个工位，共 %d 条记录", label, path, len(sheets), len(frame))
+    return path
 
 if __name__ == "__main__":
-    merged_df = ED.Combined_rework_costs("./data/质量数据929.xlsx")
+    logging.basicConfig(level=config.log_level, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    tables = ED.load_quality_tables("./data/质量数据929.xlsx")
+    merged_df = ED.Combined_rework_costs(tables)
     merged_1 = "./result/Station_1.xlsx"
     merged_2 = "./result/Station_2.xlsx"
     merged_3 = "./result/Station_3.xlsx"
     
-    output_df = ED.Real_output("./data/质量数据929.xlsx")
+    output_df = ED.Real_output(tables)
     output_1 = "./result/output_1.xlsx"
     output_2 = "./result/output_2.xlsx"
     output_3 = "./result/output_3.xlsx"
 
     # Step 1: 获取每个工位的已排序数据
-    station_data = split_station(merged_df)
-    with pd.ExcelWriter(merged_1, engine='openpyxl') as writer:
-        for station, df in station_data.items():
-            df.to_excel(writer, sheet_name=station, index=False)
-            print(f"已生成工位「{station}」的子表，共{len(df)}条数据")
+    station_frame = split_station_frame(merged_df)
+    write_station_workbook(merged_1, station_frame, "子表")
 
     # Step 2: 聚合每个工位每个班次的缺陷数据
-    summary_data = shift_summary(station_data) 
-    with pd.ExcelWriter(merged_2, engine='openpyxl') as writer:
-            for station, df in summary_data.items():
-                df.to_excel(writer, sheet_name=station, index=False)
-                print(f"已生成工位「{station}」的统计子表，共{len(df)}条记录")
+    summary_frame = shift_summary_frame(station_frame)
+    write_station_workbook(merged_2, summary_frame, "统计子表")
 
     # Step 3: 聚合每个工位每天的缺陷数据
-    daily_summary_data = daily_total(summary_data)
-    with pd.ExcelWriter(merged_3, engine='openpyxl') as writer:
-            for station, df in daily_summary_data.items():
-                df.to_excel(writer, sheet_name=station, index=False)
-                print(f"已生成工位「{station}」的统计子表，共{len(df)}条记录")
+    daily_summary_frame = daily_total_frame(summary_frame)
+    write_station_workbook(merged_3, daily_summary_frame, "统计子表")
 
     # Step 4: 获取每个工位的已排序产量
-    station_output = split_station_output(output_df)
-    with pd.ExcelWriter(output_1, engine='openpyxl') as writer:
-        for station, df in station_output.items():
-            df.to_excel(writer, sheet_name=station, index=False)
-            print(f"已生成工位「{station}」的子表，共{len(df)}条数据")
+    station_output_frame = split_station_output_frame(output_df)
+    write_station_workbook(output_1, station_output_frame, "子表")
 
     # Step 5: 聚合每个工位每个班次的产量
-    summary_output = shift_summary_output(station_output) 
-    with pd.ExcelWriter(output_2, engine='openpyxl') as writer:
-            for station, df in summary_output.items():
-                df.to_excel(writer, sheet_name=station, index=False)
-                print(f"已生成工位「{station}」的统计子表，共{len(df)}条记录")
+    summary_output_frame = shift_summary_output_frame(station_output_frame)
+    write_station_workbook(output_2, summary_output_frame, "统计子表")
 
     # Step 6: 聚合每个工位每天的产量
-    daily_output = daily_total_output(summary_output) 
-    with pd.ExcelWriter(output_3, engine='openpyxl') as writer:
-            for station, df in daily_output.items():
-                df.to_excel(writer, sheet_name=station, index=False)
-                print(f"已生成工位「{station}」的统计子表，共{len(df)}条记录")
\ No newline at end of file
+    daily_output_frame = daily_total_output_frame(summary_output_frame)
+    write_station_workbook(output_3, daily_output_frame, "统计子表")
@@ -0,0 +1,82 @@
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import config
+import StationSegmentation as SS
+import ExtractIndicators as EI
+from StationPool import StationPool
+
+# ================== 可配置区 ==================
+N_STATIONS = 200             # 工位数
+N_DAYS = 730                 # 天数
+INCIDENTS_PER_SHIFT = 4      # 每个工位每个班次的质量事件数
+MAX_WORKERS = os.cpu_count() or 1
+REPEAT = 3                   # 每个进程数重复次数，取最短时间
+# ============================================
+
+def make_frames(seed=0):
+    # 生成长表格式的质量事件与产量数据（与 ExtractData 输出列一致）
+    rng = np.random.default_rng(seed)
+    stations = [f"Line {i // 10} Station {i:03d}" for i in range(N_STATIONS)]
+    shifts = list(SS.SHIFT_PRIORITY)
+    dates = pd.date_range("2022-01-01", periods=N_DAYS, freq="D")
+    keys = pd.MultiIndex.from_product([stations, dates, shifts], names=["line_area_name", "date", "shift_name"]).to_frame(index=False)
+
+    incidents = keys.loc[keys.index.repeat(INCIDENTS_PER_SHIFT)].reset_index(drop=True)
+    incidents["process_result_name"] = rng.choice(["返工", "报废", "挑选"], size=len(incidents), p=[0.6, 0.1, 0.3])
+    incidents["defect_number"] = rng.integers(1, 5, size=len(incidents))
+    incidents["返工检测成本"] = rng.random(len(incidents)) * 10
+    incidents["返工总成本"] = rng.random(len(incidents)) * 100
+
+    output = keys.copy()
+    output["real_out_put"] = rng.integers(100, 500, size=len(output))
+    return incidents, output
+
+def station_stages(pool, incidents, output):
+    station_frame = pool.map(SS.split_station_frame, incidents, station_key="line_area_name")
+    daily_summary = pool.map(SS.daily_total_frame, pool.map(SS.shift_summary_frame, station_frame))
+    station_output = pool.map(SS.split_station_output_frame, output, station_key="line_area_name")
+    daily_output = pool.map(SS.daily_total_output_frame, pool.map(SS.shift_summary_output_frame, station_output))
+    merged = EI.merge_summary_frame(daily_summary, daily_output)
+    return pool.map(EI.compute_quality_metrics_frame, merged)
+
+def main():
+    incidents, output = make_frames()
+    cube = np.random.default_rng(1).random((N_STATIONS, 4, N_DAYS))
+    print(f"工位 {N_STATIONS} × 天数 {N_DAYS}：质量事件 {len(incidents)} 行，产量 {len(output)} 行")
+
+    reference = None
+    rows = []
+    for n_workers in range(1, MAX_WORKERS + 1):
+        with StationPool(n_workers) as pool:
+            # 预热进程池，避免把进程启动时间计入
+            pool.ema(cube[:2], config.beta)
+            stage_times, ema_times = [], []
+            for _ in range(REPEAT):
+                t0 = time.perf_counter()
+                metrics = station_stages(pool, incidents, output)
+                stage_times.append(time.perf_counter() - t0)
+                t0 = time.perf_counter()
+                ema = pool.ema(cube, config.beta)
+                ema_times.append(time.perf_counter() - t0)
+
+        # 并行结果必须与串行完全一致（包括行顺序）
+        if reference is None:
+            reference = (metrics, ema)
+        else:
+            pd.testing.assert_frame_equal(reference[0], metrics)
+            np.testing.assert_array_equal(reference[1], ema)
+
+        rows.append({"进程数": n_workers, "工位阶段(s)": min(stage_times), "EMA(s)": min(ema_times)})
+
+    result = pd.DataFrame(rows)
+    result["工位阶段加速比"] = result["工位阶段(s)"].iloc[0] / result["工位阶段(s)"]
+    result["EMA加速比"] = result["EMA(s)"].iloc[0] / result["EMA(s)"]
+    print(result.to_string(index=False, float_format="{:.3f}".format))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import platform
+import warnings
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+import config
+import Profiler
+import ExtractData as ED
+import StationSegmentation as SS
+import ExtractIndicators as EI
+import ScorePipeline
+import FastExcel
+from synthetic_data import generate_tables, write_workbook
+
+# 规模倍数 → 生成参数：1× 为 config.station_map 全部工位 × 120 天 × 每班次 3 个事件，
+# 更大规模同时放大天数与每班次事件数（10× ≈ 3.33 × 3.33，100× = 10 × 10）
+SCALES = {
+    1: {"n_days": 120, "incidents_per_shift": 3.0},
+    10: {"n_days": 400, "incidents_per_shift": 9.0},
+    100: {"n_days": 1200, "incidents_per_shift": 30.0},
+}
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, "baseline.json")
+
+
+def expected_incident_rows(scale):
+    """
+    质量事件表的预期行数（最大的一张表）：工位数 × 天数 × 3 个班次 × 每班次事件数 × 0.98（约 2% 班次缺失）
+    """
+    params = SCALES[scale]
+    return int(len(config.station_map) * params["n_days"] * 3 * params["incidents_per_shift"] * 0.98)
+
+
+def run_pipeline(tables, excel_path=None, stream=False):
+    """
+    完整流水线：提取 → 工位拆分 → 日汇总 → 合并 → 指标 → 标准化 → 权重 → 分级；
+    excel_path 不为空时从 Excel 读取（含解析阶段），否则直接使用内存中的业务表；
+    stream 为 True 时质量事件表分块流式汇总
+    """
+    if stream:
+        source = excel_path or tables
+        summary = SS.stream_shift_summary_frame(source)
+    else:
+        source = ED.load_quality_tables(excel_path) if excel_path else tables
+        summary = SS.shift_summary_frame(SS.split_station_frame(ED.Combined_rework_costs(source)))
+    output_df = ED.Real_output(source)
+
+    daily_summary = SS.daily_total_frame(summary)
+    daily_output = SS.daily_total_output_frame(SS.shift_summary_output_frame(SS.split_station_output_frame(output_df)))
+    metrics = EI.compute_quality_metrics_frame(EI.merge_summary_frame(daily_summary, daily_output))
+    final_df = EI.consolidate_metrics_frame(metrics)
+    return ScorePipeline.score_pipeline(ScorePipeline.prepare_input(final_df), config)
+
+
+def bench_scale(scale, repeat=1, with_excel=False, workdir=None, stream=False):
+    """
+    在给定规模下运行 repeat 次，返回各阶段耗时（多次取最短）及全流程耗时
+    """
+    tables = generate_tables(**SCALES[scale])
+    rows = {name: len(df) for name, df in tables.items()}
+    excel_path = None
+    if with_excel:
+        excel_path = os.path.join(workdir or tempfile.gettempdir(), f"synthetic_{scale}x.xlsx")
+        write_workbook(tables, excel_path)
+
+    best = None
+    for _ in range(repeat):
+        Profiler.profiler.reset()
+        start = time.perf_counter()
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            run_pipeline(tables, excel_path, stream)
+        total = time.perf_counter() - start
+
+        stages = {}
+        for record in Profiler.profiler.records:
+            stages[record["stage"]] = stages.get(record["stage"], 0.0) + record["wall_s"]
+        stages["total"] = total
+        best = stages if best is None else {k: min(v, best.get(k, v)) for k, v in stages.items()}
+    return {"rows": rows, "seconds": {k: round(v, 6) for k, v in best.items()}}
+
+
+def compare(results, baseline, tolerance, min_seconds):
+    """
+    与基线比较：耗时超过基线 (1 + tolerance) 倍且绝对增加超过 min_seconds 的阶段记为回归
+    """
+    regressions = []
+    for scale, result in results.items():
+        base = baseline.get("results", {}).get(str(scale))
+        if base is None:
+            continue
+        for stage, seconds in result["seconds"].items():
+            old = base["seconds"].get(stage)
+            if old is None:
+                continue
+            if seconds > old * (1 + tolerance) and seconds - old > min_seconds:
+                regressions.append((scale, stage, old, seconds))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="流水线分阶段基准测试（合成数据）")
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10, 100], choices=sorted(SCALES))
+    parser.add_argument("--repeat", type=int, default=1, help="每个规模重复次数，取最短耗时")
+    parser.add_argument("--excel", action="store_true",
+                        help="先写出 Excel 再读取，包含解析阶段（重复运行时后几次命中列式缓存；"
+                             "只支持不超出工作表行数上限的规模）")
+    parser.add_argument("--stream", action="store_true", help="质量事件表分块流式汇总（config.stream_incidents）")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="基线文件路径")
+    parser.add_argument("--save-baseline", action="store_true", help="把本次结果写为基线")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="允许的相对变慢比例")
+    parser.add_argument("--min-seconds", type=float, default=0.05, help="忽略小于该值的绝对变慢")
+    parser.add_argument("--output", default=None, help="本次结果 JSON 输出路径")
+    args = parser.parse_args(argv)
+    if args.excel:
+        # 超出工作表行数上限的规模无法写成同一份数据的 Excel，直接拒绝，避免测量被截断的数据
+        too_large = [s for s in args.scales if expected_incident_rows(s) + 1 > FastExcel.MAX_ROWS]
+        if too_large:
+            parser.error(f"--excel 不支持规模 {too_large}：质量事件表约 "
+                         f"{', '.join(str(expected_incident_rows(s)) for s in too_large)} 行，"
+                         f"超出 Excel 工作表上限 {FastExcel.MAX_ROWS} 行，请用 --scales 选择较小规模")
+
+    # 重复运行会命中标准化 / 权重结果缓存，基准测试始终重新计算
+    config.use_result_cache = False
+    # 只记录耗时，不开启 tracemalloc（开销会扭曲耗时）
+    Profiler.profiler.enable(trace_memory=False)
+    results = {}
+    for scale in args.scales:
+        results[scale] = bench_scale(scale, args.repeat, args.excel, stream=args.stream)
+        seconds = results[scale]["seconds"]
+        print(f"\n===== {scale}× 规模：" + "，".join(f"{k} {v} 行" for k, v in results[scale]["rows"].items()) + " =====")
+        for stage, value in sorted(seconds.items(), key=lambda kv: -kv[1]):
+            print(f"{stage:<55s}{value:>10.3f} s")
+
+    report = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "machine": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+        "results": {str(k): v for k, v in results.items()},
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    if args.save_baseline:
+        # 只更新本次运行的规模，保留基线中其他规模
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, encoding="utf-8") as f:
+                baseline = json.load(f)
+        baseline.update({k: v for k, v in report.items() if k != "results"})
+        baseline.setdefault("results", {}).update(report["results"])
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(baseline, f, ensure_ascii=False, indent=2)
+        print(f"\n基线已保存：{args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"\n未找到基线 {args.baseline}，使用 --save-baseline 生成")
+        return 0
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, args.tolerance, args.min_seconds)
+    if not regressions:
+        print("\n✅ 未发现性能回归")
+        return 0
+    print("\n❌ 性能回归：")
+    for scale, stage, old, new in regressions:
+        print(f"{scale}× {stage}: {old:.3f} s → {new:.3f} s（{new / old:.2f} 倍）")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
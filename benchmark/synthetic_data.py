@@ -0,0 +1,113 @@
+import os
+import sys
+import argparse
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import config
+import ExtractData as ED
+import FastExcel
+
+# 处理结果的抽样权重（返工/挑选/报废为主，其余少量出现）
+RESULT_WEIGHTS = {"返工": 0.45, "挑选": 0.2, "报废": 0.12, "待返工": 0.06, "正常接收": 0.05, "偏差": 0.04}
+
+
+def station_ids():
+    """
+    由 config.station_map 中的工位名反查 (line_id, area_id)，保证生成的数据能映射回工位编号
+    """
+    line_ids = {name: key for key, name in config.line_area_map.items()}
+    area_ids = {name: key for key, name in config.station_name_map.items()}
+    pairs = []
+    for station in config.station_map:
+        # 线体名可能包含空格（如 Big Roller），按最长前缀匹配
+        for line in sorted(line_ids, key=len, reverse=True):
+            if station.startswith(line + " ") and station[len(line) + 1:] in area_ids:
+                pairs.append((line_ids[line], area_ids[station[len(line) + 1:]]))
+                break
+    return pairs
+
+
+def generate_tables(n_stations=None, n_days=120, incidents_per_shift=3.0, start="2024-01-01", seed=0):
+    """
+    生成与质量工作簿同结构的三张业务表 {sheet_name: DataFrame}
+
+    规模为 工位数 × 天数 × 班次数(3) × 每班次平均质量事件数；工位超过 config.station_map 的数量时
+    循环复用（复用的工位映射到同一工位名）。
+    """
+    rng = np.random.default_rng(seed)
+    pairs = station_ids()
+    n_stations = len(pairs) if n_stations is None else n_stations
+    pairs = [pairs[i % len(pairs)] for i in range(n_stations)]
+    shifts = list(config.shift_name_map)
+    dates = pd.date_range(start, periods=n_days, freq="D")
+
+    # 产量表：每个 (日期, 班次, 工位) 一行，少量班次停产（产量为 0）或缺失
+    grid = pd.MultiIndex.from_product([dates, shifts, range(n_stations)], names=["date", "shift_id", "station"]).to_frame(index=False)
+    grid = grid[rng.random(len(grid)) > 0.02].reset_index(drop=True)
+    line_ids = np.array([p[0] for p in pairs], dtype=object)
+    area_ids = np.array([p[1] for p in pairs], dtype=object)
+    station_scale = rng.uniform(0.5, 1.5, n_stations)   # 各工位产量与事件率不同
+    output = pd.DataFrame({
+        "date": grid["date"],
+        "shift_id": grid["shift_id"],
+        "line_id": line_ids[grid["station"]],
+        "regions_id": area_ids[grid["station"]],
+        "real_out_put": np.where(rng.random(len(grid)) < 0.03, 0,
+                                 rng.poisson(300 * station_scale[grid["station"]])),
+    })
+
+    # 质量事件表：每个班次的事件数服从泊松分布
+    counts = rng.poisson(incidents_per_shift * station_scale[grid["station"]])
+    events = grid.loc[grid.index.repeat(counts)].reset_index(drop=True)
+    n_events = len(events)
+    result_ids = {name: key for key, name in config.process_result_map.items()}
+    names = list(RESULT_WEIGHTS)
+    probs = np.array(list(RESULT_WEIGHTS.values()))
+    process_result = np.array([result_ids[n] for n in names], dtype=object)[rng.choice(len(names), n_events, p=probs / probs.sum())]
+    process_result[rng.random(n_events) < 0.02] = None   # 少量缺失处理结果
+    event_ids = (10 ** 18 + np.arange(n_events)).astype(str)
+    incident = pd.DataFrame({
+        "id": event_ids,
+        "defect_number": rng.integers(1, 6, n_events),
+        "process_result_id": process_result,
+        "date": events["date"],
+        "shift_id": events["shift_id"],
+        "line_id": line_ids[events["station"]],
+        "area_id": area_ids[events["station"]],
+        "debug_status": np.where(rng.random(n_events) < 0.03, 1, np.where(rng.random(n_events) < 0.5, 0, np.nan)),
+    })
+
+    # 返工表：约一半事件有返工记录，少量事件有多条返工记录
+    reworked = event_ids[rng.random(n_events) < 0.5]
+    repeated = reworked[rng.random(len(reworked)) < 0.05]
+    quality_info_id = np.concatenate([reworked, repeated])
+    check_cost = rng.gamma(2.0, 5.0, len(quality_info_id))
+    rework = pd.DataFrame({
+        "quality_info_id": quality_info_id,
+        "返工检测成本": check_cost,
+        "返工总成本": check_cost + rng.gamma(2.0, 40.0, len(quality_info_id)),
+    })
+    return {ED.SHEET_INCIDENT: incident, ED.SHEET_REWORK: rework, ED.SHEET_OUTPUT: output}
+
+
+def write_workbook(tables, path):
+    """
+    写出与原始质量工作簿相同工作表名的 Excel
+    """
+    return FastExcel.write_sheets(path, tables)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="生成合成质量数据工作簿")
+    parser.add_argument("path", help="输出 Excel 路径")
+    parser.add_argument("--stations", type=int, default=None, help="工位数（默认 config.station_map 中全部工位）")
+    parser.add_argument("--days", type=int, default=120)
+    parser.add_argument("--incidents", type=float, default=3.0, help="每工位每班次平均质量事件数")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    tables = generate_tables(args.stations, args.days, args.incidents, seed=args.seed)
+    write_workbook(tables, args.path)
+    print(f"已生成 {args.path}：" + "，".join(f"{k} {len(v)} 行" for k, v in tables.items()))
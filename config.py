@@ -108,4 +108,46 @@ station_map = {
     "Line 5 履带装配":      24,
     "Paint 履带涂漆工位":   25,
     "Roller 小轮装配":      26,
-}
\ No newline at end of file
+}
+# 列式缓存配置（缓存 Excel 源表，源文件变化时自动重建）
+use_cache = True
+cache_dir = "./cache"
+
+# 标准化 / 组合权重结果的磁盘缓存：以输入数据的内容哈希、参数及所在模块的源码版本为键，
+# 超出容量时淘汰最久未使用的结果（只改分级阈值等下游参数时直接命中，修改 dataStandard_v2 / weight_v2 后自动失效）
+use_result_cache = True
+result_cache_dir = "./cache/results"
+result_cache_max_mb = 256
+
+# 数据库来源（SQLAlchemy URL，如 "sqlite:///./data/quality.db"），为 None 时使用 Excel 工作簿
+source_url = None
+
+# 质量事件表分块流式汇总（开启后按块直接累加到（工位，日期，班次）汇总，不在内存中保留完整事件表）
+stream_incidents = False
+stream_chunk_rows = 100_000
+
+# 日期范围与工位过滤（None 表示不限）：日期为闭区间，如 "2024-04-01"；
+# stations 为列表，每项可以是工位编号、station_map 中的工位名或线体名（如 "Line 2"）
+# 指标会多读入 90 天历史，打分（CRITIC 权重与分级阈值为累计统计）使用 end_date 之前的全部历史，只输出范围内的结果
+start_date = None
+end_date = None
+stations = None
+
+# 增量运行的检查点文件（滚动窗口缓冲区、EMA、CRITIC 及历史阈值统计量）
+state_path = "./result/pipeline_state.pkl"
+
+# 按工位并行的进程数（<= 1 时串行执行）
+n_workers = 1
+
+# 是否写出中间调试工作簿（Station_* / output_* / Combined_Summary / result.xlsx）
+# 关闭后只写交付结果（final_result.xlsx、打分结果）
+write_debug_excel = True
+
+# 阶段耗时/内存记录（入口脚本 ExtractIndicators、test_v2、IncrementalRun 开启后，退出时写出 profile_dir 下的 JSON/CSV 报告）
+profile = False
+profile_dir = "./result/profile"
+profile_trace_memory = True     # 记录 Python 分配峰值（tracemalloc，开销较大）
+profile_cprofile = False        # 每个最外层阶段额外写出 cProfile 文件
+
+# 日志级别（DEBUG 时输出分级阈值的逐时间段诊断信息）
+log_level = "INFO"
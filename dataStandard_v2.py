@@ -1,53 +1,93 @@
+import logging
 import pandas as pd
 import numpy as np
 import config
+import Profiler
+import DataFilter
+import ResultCache
 
-def calculate_ema(theta, beta, bias_correction=True):
+logger = logging.getLogger(__name__)
+
+# 有 scipy 时用 lfilter 作为一阶递推滤波内核，否则退回沿时间轴的 numpy 递推
+try:
+    from scipy.signal import lfilter
+except ImportError:
+    lfilter = None
+
+def _ema_filter(theta, beta, axis=-1):
+    """
+    原始EMA递推 v[t] = beta * v[t-1] + (1 - beta) * theta[t]，v0=0，沿 axis 对整个数组一次计算
     """
-    计算指数加权移动平均(EMA)，支持偏差修正
+    if lfilter is not None:
+        return lfilter([1 - beta], [1, -beta], theta, axis=axis)
+    theta = np.moveaxis(theta, axis, -1)
+    v = np.empty_like(theta)
+    prev = np.zeros(theta.shape[:-1])
+    for t in range(theta.shape[-1]):
+        prev = beta * prev + (1 - beta) * theta[..., t]
+        v[..., t] = prev
+    return np.moveaxis(v, -1, axis)
+
+def _bias_correction(v, beta, axis=-1):
+    # 偏差修正：v_corrected = v[t] / (1 - beta ^ t)，t从1到n，因为v[t]数组其实是从1开始的
+    n = v.shape[axis]
+    shape = [1] * v.ndim
+    shape[axis] = n
+    t_array = np.arange(1, n + 1).reshape(shape)
+    return v / (1 - np.power(beta, t_array))
+
+def calculate_ema(theta, beta, bias_correction=True, axis=-1):
+    """
+    计算指数加权移动平均(EMA)，支持偏差修正，可沿 axis 对多维数组一次计算
     """
     theta = np.array(theta, dtype=np.float64)
-    n = len(theta)
-    v = np.zeros(n)  # 初始化EMA序列，v0=0（冷启动初始值）
-    # 计算原始EMA
-    for t in range(n):
-        if t == 0:
-            v[t] = (1 - beta) * theta[t]  # 算出来的v[0]其实是v1，因为v0=0，其实是 beta * 0 + (1 - beta) * theta[t]
-        else:
-            v[t] = beta * v[t-1] + (1 - beta) * theta[t]
-    # 偏差修正：v_corrected = v[t] / (1 - beta ^ t)
+    v = _ema_filter(theta, beta, axis=axis)
     if bias_correction:
-        t_array = np.arange(1, n+1)  # t从1到n，因为v[t]数组其实是从1开始的
-        v_corrected = v / (1 - np.power(beta, t_array))
-        return v, v_corrected
+        return v, _bias_correction(v, beta, axis=axis)
     else:
         return v, None
- 
-def calculate_ema_std(theta, beta, bias_correction=True):
+
+def ema_update(v, t, theta, beta, bias_correction=True):
     """
-    计算指数加权标准差(EMA标准差)
+    EMA单步递推（增量计算）：v 为上一时刻的原始EMA，t 为已递推的步数，
+    返回 (新的原始EMA, 新的步数, 偏差修正后的EMA)，与 calculate_ema 逐点结果一致
+    """
+    v = beta * v + (1 - beta) * np.asarray(theta, dtype=np.float64)
+    t = t + 1
+    corrected = v / (1 - np.power(beta, t)) if bias_correction else v
+    return v, t, corrected
+
+def ema_moments(theta, beta, bias_correction=True, axis=-1):
+    """
+    一次递推同时计算EMA均值和EMA方差（数据与数据平方堆叠后共用一次滤波）
     """
     theta = np.array(theta, dtype=np.float64)
-    # 计算数据的EMA均值和数据平方的EMA均值
-    _, mu = calculate_ema(theta, beta, bias_correction)
-    _, nu = calculate_ema(theta**2, beta, bias_correction)
-    # 计算方差并开方得到标准差
-    variance = nu - mu**2
+    axis = axis % theta.ndim
+    v = _ema_filter(np.stack([theta, theta**2]), beta, axis=axis + 1)
+    if bias_correction:
+        v = _bias_correction(v, beta, axis=axis + 1)
+    mu, nu = v[0], v[1]
     # 确保方差非负（避免数值计算误差导致的微小负值）
-    variance = np.maximum(variance, 0)
+    variance = np.maximum(nu - mu**2, 0)
+    return mu, variance
+ 
+def calculate_ema_std(theta, beta, bias_correction=True, axis=-1):
+    """
+    计算指数加权标准差(EMA标准差)
+    """
+    _, variance = ema_moments(theta, beta, bias_correction, axis=axis)
     std_values = np.sqrt(variance)
     return std_values
  
-def ema_based_normalization(theta, beta, bias_correction=True):
+def ema_based_normalization(theta, beta, bias_correction=True, axis=-1):
     """
     使用EMA均值和EMA标准差进行数据标准化
     标准化公式: z_t = (theta_t - mu_t) / sigma_t
     """
     theta = np.array(theta, dtype=np.float64)
-    # 计算EMA均值
-    _, mu = calculate_ema(theta, beta, bias_correction)
-    # 计算EMA标准差
-    sigma = calculate_ema_std(theta, beta, bias_correction)
+    # 计算EMA均值和EMA标准差
+    mu, variance = ema_moments(theta, beta, bias_correction, axis=axis)
+    sigma = np.sqrt(variance)
     # 避免除以零（添加微小值）
     sigma = np.maximum(sigma, 1e-6)
     data = (theta - mu)
@@ -79,72 +119,71 @@ def norma(theta, log_c, log_d):
         scaled_data = (log_theta - global_min) / (global_max - global_min) * (norm_max - norm_min) + norm_min
     return scaled_data
 
-def Normaliz(df, beta, log_c, log_d):
+def scale_cross_section(values, log_c, log_d):
+    """
+    对同一时间点所有工位的指标值（形状 (工位, 指标)）逐指标做对数缩放 + 归一化
+    """
+    return np.column_stack([norma(values[:, i], log_c, log_d) for i in range(values.shape[1])])
+
+@Profiler.stage()
+@ResultCache.memoize(ignore=("n_workers",))
+def Normaliz(df, beta, log_c, log_d, n_workers=1, start_date=None, end_date=None, stations=None):
+    # EMA 沿时间递推、归一化依赖同一时间点的全部工位：只丢弃 end_date 之后的数据，
+    # start_date / stations 只过滤输出
+    df = DataFilter.select_rows(df, "更新时间", end_date=end_date)
+
     # Sort by 更新时间
     df = df.sort_values(by="更新时间")
 
-    # Initialize dimensions
-    x_values = sorted(df["工位"].unique())  # 工位序号从小到大
-    z_values = sorted(df["更新时间"].unique())  # 时间从小到大
-
     # 指标列
     indicators = ["检验成本", "不合格率", "返工成本", "报废成本"]
 
-    # Create empty array with shape (x=9, y=4, z=n)
-    array_3d = np.empty((len(x_values), len(indicators), len(z_values)),dtype=np.float64)
-    norm_array_3d = np.empty((len(x_values), len(indicators), len(z_values)),dtype=np.float64)
-    scaled_array_3d = np.empty((len(x_values), len(indicators), len(z_values)),dtype=np.float64)
-    print("3D array shape:", array_3d.shape)
-
-    # Fill the array
-    for z_idx, time in enumerate(z_values):
-        df_time = df[df["更新时间"] == time]
-        for x_idx, station in enumerate(x_values):
-            df_entry = df_time[df_time["工位"] == station]
-            if not df_entry.empty:
-                array_3d[x_idx, :, z_idx] = df_entry[indicators].values[0]
-            else:
-                array_3d[x_idx, :, z_idx] = np.nan  # Fill with NaN if missing
+    # 同一「工位+时间」有多条记录时只取第一条
+    df = df[df["工位"].notna() & df["更新时间"].notna()]
+    df = df[~df.duplicated(subset=["工位", "更新时间"], keep="first")]
+
+    # Initialize dimensions：用排序后的分类编码作为立方体下标
+    x_codes, x_values = pd.factorize(df["工位"], sort=True)  # 工位序号从小到大
+    z_codes, z_values = pd.factorize(df["更新时间"], sort=True)  # 时间从小到大
+
+    # Create array with shape (x=工位, y=4, z=时间)，缺失的单元为 NaN
+    array_3d = np.full((len(x_values), len(indicators), len(z_values)), np.nan, dtype=np.float64)
+    array_3d[x_codes, :, z_codes] = df[indicators].to_numpy(dtype=np.float64)
+    scaled_array_3d = np.empty_like(array_3d)
+    logger.debug("3D array shape: %s", array_3d.shape)
     
-    for x_idx, station in enumerate(x_values):
-            for i, indicator in enumerate(indicators):
-                normalized_data, mu, sigma = ema_based_normalization(array_3d[x_idx, i, :], beta)
-                norm_array_3d[x_idx, i, :] = mu
-
-    for i, indicator in enumerate(indicators):
-        for z_idx, time in enumerate(z_values):
-            # scaled_data = norm_array_3d[:, i, z_idx]
-            scaled_data = norma(norm_array_3d[:, i, z_idx], log_c, log_d)
-            scaled_array_3d[:, i, z_idx] = scaled_data
+    # 沿时间轴对所有工位 × 指标一次计算EMA均值（偏差修正后），n_workers > 1 时按工位区间多进程计算
+    if n_workers > 1:
+        from StationPool import StationPool
+        with StationPool(n_workers) as pool:
+            norm_array_3d = pool.ema(array_3d, beta)
+    else:
+        _, norm_array_3d = calculate_ema(array_3d, beta, axis=-1)
+
+    for z_idx in range(len(z_values)):
+        scaled_array_3d[:, :, z_idx] = scale_cross_section(norm_array_3d[:, :, z_idx], log_c, log_d)
     
     # np.set_printoptions(suppress=True, threshold=np.inf, precision=6)
     # print(array_3d[:,1,0])
     # print(norm_array_3d[:,1,0])
     # print(scaled_array_3d[:,1,0])   
      
-    rows = []
-    # 遍历所有「工位+时间」组合，提取对应指标值
-    for z_idx, time in enumerate(z_values):
-        for x_idx, station in enumerate(x_values):
-            # 当前工位+时间的所有指标值（第二维度）
-            indicator_vals = scaled_array_3d[x_idx, :, z_idx]
-            # 构建一行数据（键：列名，值：对应数据）
-            row = {
-                "更新时间": time,
-                "工位": station,
-                **dict(zip(indicators, indicator_vals))  # 指标与值一一对应
-            }
-            rows.append(row)
+    # 立方体 (工位, 指标, 时间) → (时间, 工位, 指标)，一次 reshape 展平为「时间+工位」行
+    n_x, n_z = len(x_values), len(z_values)
+    flat = scaled_array_3d.transpose(2, 0, 1).reshape(n_z * n_x, len(indicators))
 
     # 转换为DataFrame并设置多索引（方便按工位/时间筛选）
-    scaled_df = pd.DataFrame(rows)
+    scaled_df = pd.DataFrame(flat, columns=indicators)
+    scaled_df.insert(0, "工位", np.tile(np.asarray(x_values), n_z))
+    scaled_df.insert(0, "更新时间", np.repeat(np.asarray(z_values), n_x))
     # scaled_df = scaled_df.set_index(["工位", "更新时间"])
 
-    return scaled_df 
+    return DataFilter.select_rows(scaled_df, "更新时间", "工位", start_date, end_date, stations).reset_index(drop=True)
 
 def main():
     # Load the Excel file
     df = pd.read_excel("./data/final_result.xlsx", engine="openpyxl")
+    df = DataFilter.select_rows(df, "date", end_date=config.end_date)
     
     df["更新时间"] = df["date"]
     df["不合格率"] = 1 - df["合格率"]
@@ -152,7 +191,8 @@ def main():
     need_df_cols = ["工位", "更新时间", "检验成本", "不合格率", "返工成本", "报废成本"]
     df = df[need_df_cols].copy()
 
-    results_df = Normaliz(df, config.beta, config.log_c, config.log_d)
+    results_df = Normaliz(df, config.beta, config.log_c, config.log_d,
+                          start_date=config.start_date, end_date=config.end_date, stations=config.stations)
 
     results_df.to_excel("./result/datastandard.xlsx", index=False)
 
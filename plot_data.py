@@ -4,6 +4,8 @@ import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 import matplotlib
+import config
+import DataFilter
 
 # ----------------- 可配置区 -----------------
 EXCEL_PATH = "./data/final_result.xlsx"
@@ -11,7 +13,7 @@ DATE_COL   = "date"
 STATION_COL = "工位"
 METRICS = ["检验成本", "合格率", "返工成本", "报废成本"]  # 4 个指标
 OUTPUT_DIR = "./charts_data"
-STATION_RANGE = list(range(1, 27))  # 固定显示工位 1~26
+STATION_RANGE = list(range(1, 27))  # 固定显示工位 1~26（config.stations 不为空时只显示其中的工位）
 # ------------------------------------------
 
 def setup_chinese_font():
@@ -56,9 +58,11 @@ def pick_two_dates(df):
     d2 = ask("第二个日期：")
     return d1, d2
 
-def plot_metric(wide1, wide2, d1, d2, metric):
-    # 柱状对比：两个日期并列展示 1..26 工位
-    x = np.arange(len(STATION_RANGE))
+def plot_metric(wide1, wide2, d1, d2, metric, station_range=STATION_RANGE):
+    # 柱状对比：两个日期并列展示 station_range 中的工位（缺失的工位柱高为空）
+    wide1 = wide1.reindex(station_range)
+    wide2 = wide2.reindex(station_range)
+    x = np.arange(len(station_range))
     width = 0.38
 
     fig, ax = plt.subplots(figsize=(12, 5))
@@ -68,10 +72,10 @@ def plot_metric(wide1, wide2, d1, d2, metric):
            color="#ff7f0e")
 
     ax.set_xticks(x)
-    ax.set_xticklabels(STATION_RANGE, rotation=0)
+    ax.set_xticklabels(station_range, rotation=0)
     ax.set_xlabel("stations")
     ax.set_ylabel(metric)
-    title = f"{metric} (station 1~26)"
+    title = f"{metric} (station {station_range[0]}~{station_range[-1]})"
     ax.set_title(title)
     ax.grid(axis="y", linestyle="--", alpha=0.3)
     ax.legend()
@@ -86,8 +90,8 @@ def plot_metric(wide1, wide2, d1, d2, metric):
                         ha="center", va="bottom", fontsize=5.5)
 
     # 重新获取 patch（两拨柱子）
-    bars1 = [p for p in ax.patches[:len(STATION_RANGE)]]
-    bars2 = [p for p in ax.patches[len(STATION_RANGE):]]
+    bars1 = [p for p in ax.patches[:len(station_range)]]
+    bars2 = [p for p in ax.patches[len(station_range):]]
     annotate_bars(bars1)
     annotate_bars(bars2)
 
@@ -104,6 +108,11 @@ def main():
     for m in METRICS:
         df[m] = pd.to_numeric(df[m], errors="coerce")
 
+    # 只保留 config 中的日期范围与工位，可选日期也只在范围内
+    df = DataFilter.select_rows(df, DATE_COL, STATION_COL, config.start_date, config.end_date, config.stations)
+    selected = DataFilter.normalize_stations(config.stations)
+    station_range = STATION_RANGE if selected is None else [s for s in STATION_RANGE if s in selected]
+
     d1, d2 = pick_two_dates(df)
 
     print(f"将对比的日期：{pd.to_datetime(d1).strftime('%Y-%m-%d')}  vs  {pd.to_datetime(d2).strftime('%Y-%m-%d')}")
@@ -116,7 +125,7 @@ def main():
             wide1 = np.log(wide1 + 1) / np.log(10)
             wide2 = np.log(wide2 + 1) / np.log(10)
 
-        fig, ax = plot_metric(wide1, wide2, d1, d2, metric)
+        fig, ax = plot_metric(wide1, wide2, d1, d2, metric, station_range)
 
         fname = f"{safe_name(metric)}_{pd.to_datetime(d1).strftime('%Y%m%d')}_VS_{pd.to_datetime(d2).strftime('%Y%m%d')}.png"
         out_path = os.path.join(OUTPUT_DIR, fname)
@@ -1,121 +1,189 @@
 import os
 import re
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
 import pandas as pd
+import matplotlib
+matplotlib.use("Agg")
 import matplotlib.pyplot as plt
+from matplotlib.layout_engine import TightLayoutEngine
+import Profiler
 
 # ================== 可配置区 ==================
 file_path = "./result/test_result.xlsx"   # 输入Excel 文件路径
 output_dir = "./charts_result"                  # 图片输出目录
-os.makedirs(output_dir, exist_ok=True)
 save_recalc_excel = True                 # 是否导出带映射结果与新等级的Excel
 recalc_excel_path = "./result/test_result_mapped.xlsx"
+clip_to_new_range = False                # 是否把新结果裁剪到 [0, 100]
+n_workers = os.cpu_count() or 1          # 绘图进程数（1 为串行）
 # ============================================
 
-# ---- 读表 ----
-df = pd.read_excel(file_path, engine="openpyxl")
-
 # ---- 列名 ----
-time_col = "更新时间" 
+time_col = "更新时间"
 station_col = "工位"
 result_col = "结果"
 t_high_col = "T_high"
 t_low_col  = "T_low"
+mapped_col = "结果_统一口径"
 
-# ---- 类型转换 ----
-df[time_col] = pd.to_datetime(df[time_col], errors="coerce")
-df[result_col] = pd.to_numeric(df[result_col], errors="coerce")
-df[t_high_col] = pd.to_numeric(df[t_high_col], errors="coerce")
-df[t_low_col]  = pd.to_numeric(df[t_low_col], errors="coerce")
-
-# ---- 统一阈值：中位数 ----
-T_HIGH = df[t_high_col].median(skipna=True)
-T_LOW  = df[t_low_col].median(skipna=True)
-
-if T_LOW >= T_HIGH:
-    raise ValueError(f"阈值不合理: T_LOW({T_LOW}) 应小于 T_HIGH({T_HIGH})。")
-
-df["T_high_unified"] = float(T_HIGH)
-df["T_low_unified"]  = float(T_LOW)
-
-# 基于旧阈值的相对位置，映射到统一阈值下的新“结果”
-# r_new = T_LOW + (结果 - T_low_old) * ((T_HIGH - T_LOW) / (T_high_old - T_low_old))
-vals     = pd.to_numeric(df[result_col], errors="coerce")
-low_old  = pd.to_numeric(df[t_low_col],  errors="coerce")
-high_old = pd.to_numeric(df[t_high_col], errors="coerce")
-
-new_range = float(T_HIGH - T_LOW)
-old_range = (high_old - low_old).astype(float)
-
-# 缩放比例（保护 old_range<=0 或 NaN）
-scale = np.where((~old_range.isna()) & (old_range > 0), new_range / old_range, np.nan)
-
-# 线性映射
-result_mapped = T_LOW + (vals - low_old) * scale
-
-# 缺失/异常保护
-result_mapped = np.where(vals.isna() | np.isnan(scale), np.nan, result_mapped)
-
-# 可选：裁剪到统一阈值范围
-clip_to_new_range = False  # 是否把新结果裁剪到 [0, 100]
-if clip_to_new_range:
-    result_mapped = np.clip(result_mapped, 0, 100)
-
-# 写入新列
-df["结果_统一口径"] = result_mapped
+COLOR_MAP = {"中": "red", "优": "green", "良": "gold"}
 
-# ---- （可选）导出 ----
-if save_recalc_excel:
-    # 确保目录存在
-    os.makedirs(os.path.dirname(recalc_excel_path), exist_ok=True)
-    df.to_excel(recalc_excel_path, index=False, engine="openpyxl")
-    print(f"📄 已导出（含 T_low_unified / T_high_unified / 结果_统一口径）：{recalc_excel_path}")
 
-# ---- 按工位绘图（Y 轴使用“结果_统一映射”）----
-COLOR_MAP = {"中": "red", "优": "green", "良": "gold"}
-stations = df[station_col].dropna().unique()
-
-for station in stations:
-    station_data = df[df[station_col] == station].copy().sort_values(by=time_col)
-    colors = station_data["等级"].map(COLOR_MAP).fillna("gray")
-
-    plt.figure(figsize=(11, 6.5))
-    ax = plt.gca()
-
-    # 浅灰线连点看趋势（基于映射后的结果）
-    ax.plot(station_data[time_col], station_data["结果_统一口径"], color="#CFCFCF", linewidth=1, zorder=1)
-
-    # 彩色散点
-    ax.scatter(station_data[time_col], station_data["结果_统一口径"], c=colors, edgecolor="k", s=50, zorder=2)
-
-    # 统一阈值参考线
-    ax.axhline(T_LOW,  color="red",   linestyle="--", linewidth=1.2, label=f"T_low={T_LOW:.3f}")
-    ax.axhline(T_HIGH, color="green", linestyle="--", linewidth=1.2, label=f"T_high={T_HIGH:.3f}")
-
-    ax.set_title(f"station {station} result", fontsize=13)
-    ax.set_xlabel("date")
-    ax.set_ylabel("result (mapped)")
-    plt.xticks(rotation=45)
-    ax.grid(True, linestyle="--", alpha=0.4)
-    ax.legend()
-    plt.tight_layout()
-
-    # 保存图表
-    # 清洗工位名，避免 Windows 非法字符
-    def safe_name(s):
-        s = str(s)
-        # 替换 Windows 不允许的字符： \ / : * ? " < > |
-        s = re.sub(r'[\\\\/:*?"<>|]+', "_", s)
-        # 可选：去掉首尾空格，限制长度
-        s = s.strip()
-        return s[:150]  # 防止过长路径问题
-
-    safe_station = safe_name(station)
-
-    # 生成安全文件名并保存
-    fname = f"工位_{safe_station}.png"
-    plt.savefig(os.path.join(output_dir, fname), dpi=150)
-    plt.close()
-
-print(f"✅ 图表已生成，保存在 {output_dir} 文件夹中")
-print(f"👉 统一阈值：T_low={T_LOW:.3f}, T_high={T_HIGH:.3f}")
\ No newline at end of file
+def safe_name(s):
+    s = str(s)
+    # 替换 Windows 不允许的字符： \ / : * ? " < > |
+    s = re.sub(r'[\\/:*?"<>|]+', "_", s)
+    # 去掉首尾空格，限制长度，防止过长路径问题
+    return s.strip()[:150]
+
+
+def load_result(file_path):
+    """
+    读取打分结果并做类型转换
+    """
+    df = pd.read_excel(file_path, engine="openpyxl")
+    df[time_col] = pd.to_datetime(df[time_col], errors="coerce")
+    for col in (result_col, t_high_col, t_low_col):
+        df[col] = pd.to_numeric(df[col], errors="coerce")
+    return df
+
+
+def unify_thresholds(df, clip_to_new_range=False):
+    """
+    以 T_high / T_low 的中位数作为统一阈值，把各时间点的“结果”按其在旧阈值中的相对位置映射到统一阈值下，
+    返回 (df, T_LOW, T_HIGH)
+    """
+    T_HIGH = df[t_high_col].median(skipna=True)
+    T_LOW  = df[t_low_col].median(skipna=True)
+    if T_LOW >= T_HIGH:
+        raise ValueError(f"阈值不合理: T_LOW({T_LOW}) 应小于 T_HIGH({T_HIGH})。")
+
+    df["T_high_unified"] = float(T_HIGH)
+    df["T_low_unified"]  = float(T_LOW)
+
+    # r_new = T_LOW + (结果 - T_low_old) * ((T_HIGH - T_LOW) / (T_high_old - T_low_old))
+    vals = df[result_col]
+    low_old = df[t_low_col]
+    new_range = float(T_HIGH - T_LOW)
+    old_range = (df[t_high_col] - low_old).astype(float)
+
+    # 缩放比例（保护 old_range<=0 或 NaN）
+    scale = np.where((~old_range.isna()) & (old_range > 0), new_range / old_range, np.nan)
+    result_mapped = T_LOW + (vals - low_old) * scale
+    # 缺失/异常保护
+    result_mapped = np.where(vals.isna() | np.isnan(scale), np.nan, result_mapped)
+    if clip_to_new_range:
+        result_mapped = np.clip(result_mapped, 0, 100)
+
+    df[mapped_col] = result_mapped
+    return df, T_LOW, T_HIGH
+
+
+def split_stations(df):
+    """
+    按工位拆分为 [(工位, 按时间排序的子表)]，只保留绘图需要的列
+    """
+    cols = [time_col, mapped_col] + (["等级"] if "等级" in df.columns else [])
+    data = df.loc[df[station_col].notna(), [station_col] + cols]
+    data = data.sort_values(by=time_col, kind="stable")
+    return [(station, group[cols]) for station, group in data.groupby(station_col, sort=False)]
+
+
+def _chunks(items, n_parts):
+    # 连续切分为 n_parts 份，每个进程处理一份
+    bounds = np.linspace(0, len(items), n_parts + 1).astype(int)
+    return [items[lo:hi] for lo, hi in zip(bounds[:-1], bounds[1:]) if hi > lo]
+
+
+class StationPlotter:
+    """
+    复用同一个 figure/axes 的工位结果图绘制器：每个工位只更新折线、散点与标题后保存，
+    避免逐工位新建 figure
+    """
+
+    def __init__(self, T_LOW, T_HIGH, dpi=150):
+        self.dpi = dpi
+        self.fig, self.ax = plt.subplots(figsize=(11, 6.5))
+        ax = self.ax
+        # 浅灰线连点看趋势（基于映射后的结果）
+        (self.line,) = ax.plot([], [], color="#CFCFCF", linewidth=1, zorder=1)
+        # 彩色散点
+        self.points = ax.scatter([], [], edgecolor="k", s=50, zorder=2)
+        # 统一阈值参考线
+        ax.axhline(T_LOW,  color="red",   linestyle="--", linewidth=1.2, label=f"T_low={T_LOW:.3f}")
+        ax.axhline(T_HIGH, color="green", linestyle="--", linewidth=1.2, label=f"T_high={T_HIGH:.3f}")
+
+        self.title = ax.set_title("", fontsize=13)
+        ax.set_xlabel("date")
+        ax.set_ylabel("result (mapped)")
+        ax.xaxis_date()
+        ax.tick_params(axis="x", labelrotation=45)
+        ax.grid(True, linestyle="--", alpha=0.4)
+        ax.legend()
+
+    def render(self, station, station_data, path):
+        times = matplotlib.dates.date2num(station_data[time_col])
+        values = station_data[mapped_col].to_numpy(dtype=np.float64)
+        grades = station_data["等级"] if "等级" in station_data.columns else pd.Series(index=station_data.index, dtype=object)
+        colors = grades.map(COLOR_MAP).fillna("gray").tolist()
+
+        self.line.set_data(times, values)
+        self.points.set_offsets(np.column_stack([times, values]))
+        self.points.set_facecolors(colors)
+        self.title.set_text(f"station {station} result")
+
+        ax = self.ax
+        ax.relim()
+        ax.update_datalim(self.points.get_offsets()[np.isfinite(values)])
+        ax.autoscale_view()
+        # 各工位的刻度标签宽度不同，每张图从默认边距重新计算紧凑布局（与新建 figure 的结果相同）；
+        # 只执行一次布局而不挂载布局引擎，savefig 不再为布局额外渲染一遍
+        self.fig.subplots_adjust(**{k: matplotlib.rcParams[f"figure.subplot.{k}"] for k in ("left", "right", "bottom", "top")})
+        TightLayoutEngine().execute(self.fig)
+        self.fig.savefig(path, dpi=self.dpi)
+
+    def close(self):
+        plt.close(self.fig)
+
+
+def _render_chunk(chunk, T_LOW, T_HIGH, output_dir):
+    # 子进程：建一个绘图器，依次绘制分到的工位
+    plotter = StationPlotter(T_LOW, T_HIGH)
+    try:
+        for station, station_data in chunk:
+            plotter.render(station, station_data, os.path.join(output_dir, f"工位_{safe_name(station)}.png"))
+    finally:
+        plotter.close()
+    return len(chunk)
+
+
+@Profiler.stage()
+def render_stations(df, T_LOW, T_HIGH, output_dir, n_workers=1):
+    """
+    批量绘制各工位结果图，n_workers > 1 时按工位分块在多个进程中绘制，返回绘制的工位数
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    stations = split_stations(df)
+    n_workers = max(1, min(n_workers, len(stations)))
+    if n_workers == 1:
+        return _render_chunk(stations, T_LOW, T_HIGH, output_dir)
+    with ProcessPoolExecutor(max_workers=n_workers) as pool:
+        futures = [pool.submit(_render_chunk, chunk, T_LOW, T_HIGH, output_dir) for chunk in _chunks(stations, n_workers)]
+        return sum(f.result() for f in futures)
+
+
+if __name__ == "__main__":
+    df = load_result(file_path)
+    df, T_LOW, T_HIGH = unify_thresholds(df, clip_to_new_range)
+
+    # ---- （可选）导出 ----
+    if save_recalc_excel:
+        os.makedirs(os.path.dirname(recalc_excel_path), exist_ok=True)
+        df.to_excel(recalc_excel_path, index=False, engine="openpyxl")
+        print(f"📄 已导出（含 T_low_unified / T_high_unified / 结果_统一口径）：{recalc_excel_path}")
+
+    # ---- 按工位绘图（Y 轴使用“结果_统一映射”）----
+    render_stations(df, T_LOW, T_HIGH, output_dir, n_workers)
+
+    print(f"✅ 图表已生成，保存在 {output_dir} 文件夹中")
+    print(f"👉 统一阈值：T_low={T_LOW:.3f}, T_high={T_HIGH:.3f}")
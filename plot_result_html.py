@@ -1,103 +1,254 @@
 import os
-import re
+import json
+import base64
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
-import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
+import plotly.offline
+import Profiler
+from plot_result import (time_col, mapped_col, safe_name, load_result, unify_thresholds,
+                         split_stations, _chunks)
 
 # ================== 可配置区 ==================
 file_path = "./result/test_result.xlsx"   # 输入Excel 文件路径
 output_dir = "./charts_result_html"            # HTML 输出目录
-os.makedirs(output_dir, exist_ok=True)
 save_recalc_excel = False                  # 是否导出带映射结果与新等级的Excel
 recalc_excel_path = "./result/test_result_mapped.xlsx"
+n_workers = os.cpu_count() or 1            # 生成进程数（1 为串行）
+write_station_files = True                 # 是否逐工位生成 HTML
+dashboard_path = "./charts_result_html/dashboard.html"   # 多工位看板（None 为不生成）
 # ============================================
 
-# ---- 读表 ----
-df = pd.read_excel(file_path, engine="openpyxl")
-
-# ---- 列名 ----
-time_col = "更新时间"
-station_col = "工位"
-result_col = "结果"
-t_high_col = "T_high"
-t_low_col  = "T_low"
-
-# ---- 类型转换 ----
-df[time_col] = pd.to_datetime(df[time_col], errors="coerce")
-df[result_col] = pd.to_numeric(df[result_col], errors="coerce")
-df[t_high_col] = pd.to_numeric(df[t_high_col], errors="coerce")
-df[t_low_col]  = pd.to_numeric(df[t_low_col], errors="coerce")
-
-# ---- 统一阈值：中位数 ----
-T_HIGH = df[t_high_col].median(skipna=True)
-T_LOW  = df[t_low_col].median(skipna=True)
-
-if T_LOW >= T_HIGH:
-    raise ValueError(f"阈值不合理: T_LOW({T_LOW}) 应小于 T_HIGH({T_HIGH})。")
-
-df["T_high_unified"] = float(T_HIGH)
-df["T_low_unified"]  = float(T_LOW)
-
-# 基于旧阈值的相对位置，映射到统一阈值下的新“结果”
-vals     = pd.to_numeric(df[result_col], errors="coerce")
-low_old  = pd.to_numeric(df[t_low_col],  errors="coerce")
-high_old = pd.to_numeric(df[t_high_col], errors="coerce")
-
-new_range = float(T_HIGH - T_LOW)
-old_range = (high_old - low_old).astype(float)
-
-# 缩放比例（保护 old_range<=0 或 NaN）
-scale = np.where((~old_range.isna()) & (old_range > 0), new_range / old_range, np.nan)
-
-# 线性映射
-result_mapped = T_LOW + (vals - low_old) * scale
-
-# 缺失/异常保护
-result_mapped = np.where(vals.isna() | np.isnan(scale), np.nan, result_mapped)
-
-# 写入新列
-df["结果_统一口径"] = result_mapped
-
-# ---- （可选）导出 ----
-if save_recalc_excel:
-    os.makedirs(os.path.dirname(recalc_excel_path), exist_ok=True)
-    df.to_excel(recalc_excel_path, index=False, engine="openpyxl")
-    print(f"📄 已导出（含 T_low_unified / T_high_unified / 结果_统一口径）：{recalc_excel_path}")
-
-# ---- 按工位生成交互式 HTML 图表 ----
-stations = df[station_col].dropna().unique()
-
-for station in stations:
-    station_data = df[df[station_col] == station].copy().sort_values(by=time_col)
-
-    # 创建 Plotly 散点图
-    fig = px.scatter(
-        station_data,
-        x=time_col,
-        y="结果_统一口径",
-        color="等级" if "等级" in station_data.columns else None,
-        hover_data={time_col: True, "结果_统一口径": ':.2f', "等级": True},
-        title=f"station {station} result"
-    )
-
-    # 添加趋势线（灰色）
-    fig.add_trace(go.Scatter(
-        x=station_data[time_col],
-        y=station_data["结果_统一口径"],
-        mode='lines',
-        line=dict(color='lightgray', width=1),
-        showlegend=False
-    ))
-
-    # 添加阈值线
-    fig.add_hline(y=T_LOW, line_dash="dash", line_color="red", annotation_text=f"T_low={T_LOW:.3f}")
-    fig.add_hline(y=T_HIGH, line_dash="dash", line_color="green", annotation_text=f"T_high={T_HIGH:.3f}")
-
-    # 保存 HTML 文件
-    safe_station = re.sub(r'[\\/:*?"<>|]+', "_", str(station)).strip()[:150]
-    fname = f"工位_{safe_station}.html"
-    fig.write_html(os.path.join(output_dir, fname))
-
-print(f"✅ 交互式图表已生成，保存在 {output_dir} 文件夹中（HTML 格式）")
-print(f"👉 统一阈值：T_low={T_LOW:.3f}, T_high={T_HIGH:.3f}")
\ No newline at end of file
+PLOTLY_JS = "plotly.min.js"   # 输出目录中所有工位共享的 plotly.js
+
+
+def write_plotly_js(output_dir):
+    """
+    在输出目录写入一份共享的 plotly.min.js（已存在则跳过），各工位 HTML 只引用它
+    """
+    path = os.path.join(output_dir, PLOTLY_JS)
+    if not os.path.exists(path):
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(plotly.offline.get_plotlyjs())
+        os.replace(tmp_path, path)
+    return path
+
+
+class StationFigure:
+    """
+    复用同一个 Plotly figure 的工位结果图：每个等级一条散点轨迹 + 灰色趋势线 + 统一阈值线，
+    每个工位只替换轨迹数据与标题后写出 HTML
+    """
+
+    def __init__(self, T_LOW, T_HIGH, grades):
+        self.grades = list(grades)
+        palette = px.colors.qualitative.Plotly
+        fig = go.Figure()
+        for i, grade in enumerate(self.grades):
+            fig.add_trace(go.Scatter(
+                x=[], y=[], mode="markers", name=str(grade), legendgroup=str(grade),
+                marker=dict(color=palette[i % len(palette)]),
+                hovertemplate=f"等级={grade}<br>{time_col}=%{{x}}<br>{mapped_col}=%{{y:.2f}}<extra></extra>",
+            ))
+        # 添加趋势线（灰色）
+        fig.add_trace(go.Scatter(x=[], y=[], mode="lines", line=dict(color="lightgray", width=1), showlegend=False))
+
+        # 添加阈值线
+        fig.add_hline(y=T_LOW, line_dash="dash", line_color="red", annotation_text=f"T_low={T_LOW:.3f}")
+        fig.add_hline(y=T_HIGH, line_dash="dash", line_color="green", annotation_text=f"T_high={T_HIGH:.3f}")
+        fig.update_layout(xaxis_title=time_col, yaxis_title=mapped_col, legend_title_text="等级")
+        self.fig = fig
+
+    def render(self, station, station_data, path):
+        times = station_data[time_col].to_numpy()
+        values = station_data[mapped_col].to_numpy(dtype=np.float64)
+        grades = station_data["等级"].to_numpy() if "等级" in station_data.columns else None
+
+        with self.fig.batch_update():
+            for trace, grade in zip(self.fig.data, self.grades):
+                mask = grades == grade
+                trace.x, trace.y = times[mask], values[mask]
+                trace.visible = bool(mask.any())
+            self.fig.data[-1].x, self.fig.data[-1].y = times, values
+            self.fig.layout.title.text = f"station {station} result"
+        # 只引用输出目录中的共享 plotly.min.js，不再逐个文件内嵌完整的 plotly.js
+        self.fig.write_html(path, include_plotlyjs="directory")
+
+
+_DASHBOARD_TEMPLATE = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>工位结果看板</title>
+__PLOTLYJS__
+<style>
+body { font-family: sans-serif; margin: 12px; }
+#plot { width: 100%; height: 640px; }
+</style>
+</head>
+<body>
+<label for="station">工位：</label>
+<select id="station"></select>
+<div id="plot"></div>
+<script type="text/javascript">
+(function () {
+  var DATA = __DATA__;
+  var LAYOUT = __LAYOUT__;
+
+  // base64 → 类型化数组
+  function decode(b64, Type) {
+    var bin = atob(b64), bytes = new Uint8Array(bin.length);
+    for (var i = 0; i < bin.length; i++) bytes[i] = bin.charCodeAt(i);
+    return new Type(bytes.buffer);
+  }
+
+  var palette = DATA.palette, grades = DATA.grades, cache = {};
+  function traces(k) {
+    if (cache[k]) return cache[k];
+    var st = DATA.stations[k];
+    var sec = decode(st.t, Int32Array), y = decode(st.y, Float32Array), g = decode(st.g, Uint8Array);
+    var x = new Array(sec.length);
+    for (var i = 0; i < sec.length; i++) x[i] = new Date((DATA.t0 + sec[i]) * 1000).toISOString().slice(0, 19);
+    var out = grades.map(function (grade, j) {
+      var gx = [], gy = [];
+      for (var i = 0; i < g.length; i++) if (g[i] === j) { gx.push(x[i]); gy.push(y[i]); }
+      return {x: gx, y: gy, mode: "markers", type: "scatter", name: grade, legendgroup: grade,
+              visible: gx.length > 0, marker: {color: palette[j % palette.length]},
+              hovertemplate: "等级=" + grade + "<br>" + DATA.timeCol + "=%{x}<br>" + DATA.valueCol + "=%{y:.2f}<extra></extra>"};
+    });
+    out.push({x: x, y: Array.from(y), mode: "lines", type: "scatter", showlegend: false,
+              line: {color: "lightgray", width: 1}});
+    return (cache[k] = out);
+  }
+
+  var select = document.getElementById("station");
+  DATA.stations.forEach(function (st, k) {
+    var opt = document.createElement("option");
+    opt.value = k; opt.textContent = st.name; select.appendChild(opt);
+  });
+  function show(k) {
+    var layout = Object.assign({}, LAYOUT, {title: {text: "station " + DATA.stations[k].name + " result"}});
+    Plotly.react("plot", traces(k), layout, {responsive: true});
+  }
+  select.addEventListener("change", function () { show(+select.value); });
+  if (DATA.stations.length) show(0);
+})();
+</script>
+</body>
+</html>
+"""
+
+
+def _b64(array):
+    return base64.b64encode(np.ascontiguousarray(array).tobytes()).decode("ascii")
+
+
+def dashboard_payload(df, grades):
+    """
+    各工位序列编码为紧凑的类型化数组：时间为相对最早时间的 int32 秒，结果为 float32，等级为 uint8 编号（255 为缺失）
+    """
+    stations = split_stations(df)
+    times = df[time_col].dropna()
+    t0 = int(times.min().timestamp()) if len(times) else 0
+    grade_index = {g: i for i, g in enumerate(grades)}
+
+    payload = []
+    for station, station_data in stations:
+        station_data = station_data[station_data[time_col].notna()]
+        seconds = station_data[time_col].to_numpy("datetime64[s]").astype(np.int64) - t0
+        if "等级" in station_data.columns:
+            codes = station_data["等级"].map(grade_index).fillna(255).to_numpy(dtype=np.uint8)
+        else:
+            codes = np.full(len(station_data), 255, dtype=np.uint8)
+        payload.append({
+            "name": str(station),
+            "t": _b64(seconds.astype(np.int32)),
+            "y": _b64(station_data[mapped_col].to_numpy(dtype=np.float32)),
+            "g": _b64(codes),
+        })
+    return {"t0": t0, "grades": [str(g) for g in grades], "palette": list(px.colors.qualitative.Plotly),
+            "timeCol": time_col, "valueCol": mapped_col, "stations": payload}
+
+
+@Profiler.stage()
+def write_dashboard(df, T_LOW, T_HIGH, path, include_plotlyjs="directory"):
+    """
+    生成单文件多工位看板：所有工位的数据只嵌入一次，页面内通过下拉框切换工位
+
+    include_plotlyjs 为 "directory" 时引用同目录下共享的 plotly.min.js，为 True 时内嵌（单文件可离线打开），
+    为 "cdn" 时引用 CDN
+    """
+    out_dir = os.path.dirname(path) or "."
+    os.makedirs(out_dir, exist_ok=True)
+    if include_plotlyjs == "directory":
+        write_plotly_js(out_dir)
+        script = f'<script charset="utf-8" src="{PLOTLY_JS}"></script>'
+    elif include_plotlyjs == "cdn":
+        script = f'<script charset="utf-8" src="https://cdn.plot.ly/plotly-{plotly.offline.get_plotlyjs_version()}.min.js"></script>'
+    else:
+        script = f'<script type="text/javascript">{plotly.offline.get_plotlyjs()}</script>'
+
+    grades = df["等级"].dropna().unique().tolist() if "等级" in df.columns else []
+    # 版式（模板、阈值线、坐标轴标题）与单工位图一致
+    layout = json.loads(StationFigure(T_LOW, T_HIGH, grades).fig.to_json())["layout"]
+    data = json.dumps(dashboard_payload(df, grades), ensure_ascii=False, separators=(",", ":"))
+
+    html = (_DASHBOARD_TEMPLATE.replace("__PLOTLYJS__", script)
+            .replace("__LAYOUT__", json.dumps(layout, ensure_ascii=False, separators=(",", ":")))
+            .replace("__DATA__", data.replace("</", "<\\/")))
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(html)
+    os.replace(tmp_path, path)
+    return path
+
+
+def _render_chunk(chunk, T_LOW, T_HIGH, grades, output_dir):
+    # 子进程：建一个 figure，依次写出分到的工位
+    figure = StationFigure(T_LOW, T_HIGH, grades)
+    for station, station_data in chunk:
+        figure.render(station, station_data, os.path.join(output_dir, f"工位_{safe_name(station)}.html"))
+    return len(chunk)
+
+
+@Profiler.stage()
+def render_stations(df, T_LOW, T_HIGH, output_dir, n_workers=1):
+    """
+    批量生成各工位交互式 HTML 图表，n_workers > 1 时按工位分块在多个进程中生成，返回生成的工位数
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    write_plotly_js(output_dir)
+    # 等级按首次出现顺序固定配色，各工位颜色一致
+    grades = df["等级"].dropna().unique().tolist() if "等级" in df.columns else []
+    stations = split_stations(df)
+    n_workers = max(1, min(n_workers, len(stations)))
+    if n_workers == 1:
+        return _render_chunk(stations, T_LOW, T_HIGH, grades, output_dir)
+    with ProcessPoolExecutor(max_workers=n_workers) as pool:
+        futures = [pool.submit(_render_chunk, chunk, T_LOW, T_HIGH, grades, output_dir)
+                   for chunk in _chunks(stations, n_workers)]
+        return sum(f.result() for f in futures)
+
+
+if __name__ == "__main__":
+    df = load_result(file_path)
+    df, T_LOW, T_HIGH = unify_thresholds(df)
+
+    # ---- （可选）导出 ----
+    if save_recalc_excel:
+        os.makedirs(os.path.dirname(recalc_excel_path), exist_ok=True)
+        df.to_excel(recalc_excel_path, index=False, engine="openpyxl")
+        print(f"📄 已导出（含 T_low_unified / T_high_unified / 结果_统一口径）：{recalc_excel_path}")
+
+    # ---- 按工位生成交互式 HTML 图表 ----
+    if write_station_files:
+        render_stations(df, T_LOW, T_HIGH, output_dir, n_workers)
+        print(f"✅ 交互式图表已生成，保存在 {output_dir} 文件夹中（HTML 格式）")
+
+    # ---- 多工位看板 ----
+    if dashboard_path:
+        write_dashboard(df, T_LOW, T_HIGH, dashboard_path)
+        print(f"📊 多工位看板已生成：{dashboard_path}")
+    print(f"👉 统一阈值：T_low={T_LOW:.3f}, T_high={T_HIGH:.3f}")
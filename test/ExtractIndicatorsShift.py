@@ -81,11 +81,12 @@ def consolidate_metrics(result_with_metrics):
     return final_df
 
 if __name__ == "__main__":  
-    merged_df = ED.Combined_rework_costs("./data/质量数据929.xlsx")
+    tables = ED.load_quality_tables("./data/质量数据929.xlsx")
+    merged_df = ED.Combined_rework_costs(tables)
     station_data = SS.split_station(merged_df)
     summary_data = SS.shift_summary(station_data) 
 
-    output_df = ED.Real_output("./data/质量数据929.xlsx")
+    output_df = ED.Real_output(tables)
     station_output = SS.split_station_output(output_df)
     summary_output = SS.shift_summary_output(station_output) 
 
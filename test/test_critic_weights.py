@@ -0,0 +1,130 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import config
+import weight_v2
+
+config.use_result_cache = False
+
+COLS = ['检验成本', '不合格率', '返工成本', '报废成本']
+
+
+# ---- 增量统计之前的逐时间点循环实现（保留原样，作为回归基准） ----
+
+def legacy_combined_weight(df, expert_weights, expert_weights_percent):
+    df = df.sort_values(by="更新时间")
+    z_values = sorted(df["更新时间"].unique())
+    expert_df = pd.DataFrame(expert_weights)
+    expert_mean_weights = expert_df.mean()
+    combined_weights_list = []
+    for current_time in z_values:
+        current_data = df[df['更新时间'] <= current_time].copy()
+        cols = ['检验成本', '不合格率', '返工成本', '报废成本']
+        max_vals = current_data[cols].max()
+        min_vals = current_data[cols].min()
+        ranges = max_vals - min_vals
+        normalized_df = (current_data[cols] - min_vals) / ranges.where(ranges != 0, 1)
+        std_dev = normalized_df.std()
+        std_dev = std_dev.fillna(0)
+        if len(current_data) < 2:
+            conflict_sum = pd.Series([0]*len(cols), index=cols)
+        else:
+            correlation_matrix = normalized_df.corr()
+            conflict_matrix = 1 - correlation_matrix
+            conflict_sum = conflict_matrix.sum()
+        critic_score = std_dev * conflict_sum
+        if critic_score.sum() == 0:
+            critic_weights = pd.Series([1/len(critic_score)]*len(critic_score), index=critic_score.index)
+        else:
+            critic_weights = critic_score / critic_score.sum()
+        combined = expert_weights_percent * expert_mean_weights + (1 - expert_weights_percent) * critic_weights
+        combined = combined / combined.sum()
+        weight_dict = {"更新时间": current_time}
+        weight_dict.update(combined.round(4).to_dict())
+        combined_weights_list.append(weight_dict)
+    return pd.DataFrame(combined_weights_list)
+
+
+def make_input(seed, factor=None, nan_rate=0.0, constant_cols=()):
+    """
+    随机打分输入：可选返工成本 = factor × 检验成本（完全相关）、随机缺失及常数列
+    """
+    rng = np.random.default_rng(seed)
+    n_times, n_stations = int(rng.integers(1, 8)), int(rng.integers(1, 6))
+    times = pd.date_range("2024-01-01", periods=n_times, freq="D")
+    df = pd.DataFrame({
+        "工位": np.tile(np.arange(1, n_stations + 1), n_times),
+        "更新时间": np.repeat(times, n_stations),
+    })
+    values = rng.gamma(2.0, 3.0, size=(len(df), len(COLS)))
+    if factor is not None:
+        values[:, 2] = factor * values[:, 0]
+    for col in constant_cols:
+        values[:, COLS.index(col)] = 1.5
+    values[rng.random(values.shape) < nan_rate] = np.nan
+    df[COLS] = values
+    return df
+
+
+def well_determined_times(df):
+    """
+    各列两两共同非空行数都不为 2 的时间点：只有 2 个共同点时相关系数在数学上恒为 ±1，
+    旧实现的结果取决于 pandas 的舍入误差（1 - 1e-16 还是 1），不作比较
+    """
+    times = []
+    for current_time in sorted(df["更新时间"].unique()):
+        present = df.loc[df["更新时间"] <= current_time, COLS].notna().to_numpy().astype(int)
+        if not (present.T @ present == 2).any():
+            times.append(current_time)
+    return times
+
+
+# 完全相关且其余列为常数时分数全为 0：只有 factor 为 2 的幂时标准化后两列逐位相同，
+# 旧实现的相关系数恰为 1 并平均分配权重，可作为基准；其他倍数下旧实现取决于舍入误差
+CASES = [dict(seed=s) for s in range(40)]
+CASES += [dict(seed=s, factor=3) for s in range(40)]
+CASES += [dict(seed=s, factor=-0.7, nan_rate=0.4) for s in range(40)]
+CASES += [dict(seed=s, factor=2, constant_cols=("不合格率", "报废成本")) for s in range(40)]
+CASES += [dict(seed=s, nan_rate=0.6, constant_cols=("报废成本",)) for s in range(40)]
+
+
+@pytest.mark.parametrize("case", CASES, ids=lambda c: "-".join(f"{k}={v}" for k, v in c.items()))
+def test_combined_weight_matches_legacy(case):
+    df = make_input(**case)
+    expected = legacy_combined_weight(df, config.expert_weights, config.expert_weights_percent)
+    result = weight_v2.CombinedWeight(df, config.expert_weights, config.expert_weights_percent)
+    times = well_determined_times(df)
+    expected = expected[expected["更新时间"].isin(times)].reset_index(drop=True)
+    result = result[result["更新时间"].isin(times)].reset_index(drop=True)
+    pd.testing.assert_frame_equal(result, expected, check_dtype=False, check_exact=False, rtol=0, atol=1e-9)
+
+
+@pytest.mark.parametrize("factor", [3, 0.7, 1.3])
+@pytest.mark.parametrize("seed", range(20))
+def test_proportional_columns_fall_back_to_equal_weights(seed, factor):
+    # 两列完全相关、其余列为常数时分数全为 0，每个时间点的 CRITIC 权重都应平均分配
+    df = make_input(seed, factor=factor, constant_cols=("不合格率", "报废成本"))
+    codes, _ = pd.factorize(df["更新时间"], sort=True)
+    starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+    weights = weight_v2.CriticAccumulator(COLS).update_many(df[COLS].to_numpy(), starts)
+    np.testing.assert_array_equal(weights, np.full((len(starts), len(COLS)), 0.25))
+
+
+def test_accumulator_batches_match_single_update():
+    # 分多次 update 与一次 update_many 得到相同的逐时间点权重
+    df = make_input(7, nan_rate=0.3).sort_values("更新时间", kind="stable")
+    codes, _ = pd.factorize(df["更新时间"], sort=True)
+    starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+    values = df[COLS].to_numpy()
+    batch = weight_v2.CriticAccumulator(COLS).update_many(values, starts)
+    acc = weight_v2.CriticAccumulator(COLS)
+    stepwise = [acc.update(values[lo:hi]) for lo, hi in zip(starts, np.append(starts[1:], len(values)))]
+    np.testing.assert_allclose(np.vstack(stepwise), batch, rtol=0, atol=1e-12)
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
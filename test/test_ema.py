@@ -0,0 +1,94 @@
+import os
+import sys
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import dataStandard_v2
+
+
+# ---- 向量化之前的逐点循环实现（保留原样，作为回归基准） ----
+
+def legacy_calculate_ema(theta, beta, bias_correction=True):
+    theta = np.array(theta, dtype=np.float64)
+    n = len(theta)
+    v = np.zeros(n)  # 初始化EMA序列，v0=0（冷启动初始值）
+    # 计算原始EMA
+    for t in range(n):
+        if t == 0:
+            v[t] = (1 - beta) * theta[t]  # 算出来的v[0]其实是v1，因为v0=0，其实是 beta * 0 + (1 - beta) * theta[t]
+        else:
+            v[t] = beta * v[t-1] + (1 - beta) * theta[t]
+    # 偏差修正：v_corrected = v[t] / (1 - beta ^ t)
+    if bias_correction:
+        t_array = np.arange(1, n+1)  # t从1到n，因为v[t]数组其实是从1开始的
+        v_corrected = v / (1 - np.power(beta, t_array))
+        return v, v_corrected
+    else:
+        return v, None
+
+def legacy_calculate_ema_std(theta, beta, bias_correction=True):
+    theta = np.array(theta, dtype=np.float64)
+    # 计算数据的EMA均值和数据平方的EMA均值
+    _, mu = legacy_calculate_ema(theta, beta, bias_correction)
+    _, nu = legacy_calculate_ema(theta**2, beta, bias_correction)
+    # 计算方差并开方得到标准差
+    variance = nu - mu**2
+    # 确保方差非负（避免数值计算误差导致的微小负值）
+    variance = np.maximum(variance, 0)
+    std_values = np.sqrt(variance)
+    return std_values
+
+
+def make_cube(seed=0):
+    """
+    (工位, 指标, 时间) 随机数据：部分序列开头缺失（工位晚出现），部分序列中间缺失
+    """
+    rng = np.random.default_rng(seed)
+    cube = rng.gamma(2.0, 3.0, size=(6, 4, 120))
+    cube[1, :, :15] = np.nan
+    cube[3, 2, :40] = np.nan
+    cube[4, 0, 70] = np.nan
+    cube[5] = np.nan
+    return cube
+
+
+@pytest.fixture(params=["lfilter", "numpy"])
+def ema_kernel(request, monkeypatch):
+    # numpy：模拟没有安装 scipy 时的退回实现
+    if request.param == "numpy":
+        monkeypatch.setattr(dataStandard_v2, "lfilter", None)
+    elif dataStandard_v2.lfilter is None:
+        pytest.skip("scipy 未安装")
+    return request.param
+
+
+@pytest.mark.parametrize("beta", [0.5, 0.9])
+def test_calculate_ema_matches_legacy(ema_kernel, beta):
+    cube = make_cube()
+    v, corrected = dataStandard_v2.calculate_ema(cube, beta, axis=-1)
+    for i in range(cube.shape[0]):
+        for j in range(cube.shape[1]):
+            expected_v, expected_corrected = legacy_calculate_ema(cube[i, j], beta)
+            np.testing.assert_allclose(v[i, j], expected_v, rtol=0, atol=1e-12)
+            np.testing.assert_allclose(corrected[i, j], expected_corrected, rtol=0, atol=1e-12)
+
+
+def test_ema_along_other_axis(ema_kernel):
+    # 时间轴不在最后一维时结果相同
+    cube = make_cube(1)
+    _, expected = dataStandard_v2.calculate_ema(cube, 0.9, axis=-1)
+    _, result = dataStandard_v2.calculate_ema(np.moveaxis(cube, -1, 0), 0.9, axis=0)
+    np.testing.assert_allclose(np.moveaxis(result, 0, -1), expected, rtol=0, atol=1e-12)
+
+
+def test_calculate_ema_std_matches_legacy(ema_kernel):
+    cube = make_cube(2)
+    std = dataStandard_v2.calculate_ema_std(cube, 0.9, axis=-1)
+    for i in range(cube.shape[0]):
+        for j in range(cube.shape[1]):
+            np.testing.assert_allclose(std[i, j], legacy_calculate_ema_std(cube[i, j], 0.9), rtol=0, atol=1e-12)
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
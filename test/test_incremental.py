@@ -0,0 +1,90 @@
+import os
+import sys
+import warnings
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmark"))
+import config
+import ExtractData as ED
+import StationSegmentation as SS
+import ExtractIndicators as EI
+import ScorePipeline
+import DataFilter
+import IncrementalRun as IR
+from synthetic_data import generate_tables
+
+config.use_result_cache = False
+
+START = pd.Timestamp("2024-01-01")
+N_DAYS = 200
+BOOTSTRAP_DAYS = 110
+
+
+def make_frames(late_start=None):
+    """
+    合成数据的合并质量事件与产量；late_start 不为 None 时最后一个工位从第 late_start 天才开始有数据
+    """
+    tables = generate_tables(n_stations=4, n_days=N_DAYS, incidents_per_shift=2)
+    if late_start is not None:
+        incident, output = tables[ED.SHEET_INCIDENT], tables[ED.SHEET_OUTPUT]
+        line_id, area_id = output[["line_id", "regions_id"]].iloc[-1]
+        cut = START + pd.Timedelta(days=late_start)
+        tables[ED.SHEET_INCIDENT] = incident[~((incident["line_id"] == line_id) & (incident["area_id"] == area_id) & (incident["date"] < cut))]
+        tables[ED.SHEET_OUTPUT] = output[~((output["line_id"] == line_id) & (output["regions_id"] == area_id) & (output["date"] < cut))]
+    return ED.Combined_rework_costs(tables), ED.Real_output(tables)
+
+
+def full_run(merged_df, output_df):
+    daily_summary_frame = SS.daily_total_frame(SS.shift_summary_frame(SS.split_station_frame(merged_df)))
+    daily_output_frame = SS.daily_total_output_frame(SS.shift_summary_output_frame(SS.split_station_output_frame(output_df)))
+    metrics_frame = EI.compute_quality_metrics_frame(EI.merge_summary_frame(daily_summary_frame, daily_output_frame))
+    final_df = EI.consolidate_metrics_frame(metrics_frame)
+    return ScorePipeline.score_pipeline(ScorePipeline.prepare_input(final_df), config)
+
+
+def incremental_run(merged_df, output_df):
+    # 用前 BOOTSTRAP_DAYS 天建立检查点，之后逐日追加
+    boot_end = START + pd.Timedelta(days=BOOTSTRAP_DAYS - 1)
+    state, scored = IR.bootstrap_state(DataFilter.select_rows(merged_df, "date", end_date=boot_end),
+                                       DataFilter.select_rows(output_df, "date", end_date=boot_end), config)
+    parts = [scored]
+    for date in pd.date_range(boot_end + pd.Timedelta(days=1), START + pd.Timedelta(days=N_DAYS - 1)):
+        final_rows = IR.update_metrics(state, DataFilter.select_rows(merged_df, "date", start_date=date, end_date=date),
+                                       DataFilter.select_rows(output_df, "date", start_date=date, end_date=date))
+        parts.append(IR.update_scores(state, final_rows, config))
+    return pd.concat(parts, ignore_index=True)
+
+
+@pytest.mark.parametrize("late_start", [None, 60])
+def test_incremental_matches_full_run(late_start):
+    # late_start=60：新工位在检查点之后才有指标，全量计算丢弃此前所有日期，增量从该日起重新打分
+    merged_df, output_df = make_frames(late_start)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        expected = full_run(merged_df, output_df)
+        result = incremental_run(merged_df, output_df)
+    result = result[result["更新时间"] >= expected["更新时间"].min()].reset_index(drop=True)
+    assert expected["工位"].nunique() == 4
+    pd.testing.assert_frame_equal(result, expected, check_dtype=False, check_exact=False, rtol=0, atol=1e-9)
+
+
+def test_new_station_resets_scores():
+    merged_df, output_df = make_frames(late_start=60)
+    state = IR.PipelineState()
+    IR.update_metrics(state, merged_df[merged_df["date"] < START + pd.Timedelta(days=140)],
+                      output_df[output_df["date"] < START + pd.Timedelta(days=140)])
+    assert len(state.metric_stations) == 3
+    state.ema_t = 5     # 模拟此前已打分
+    final_rows = IR.update_metrics(state, merged_df[merged_df["date"] >= START + pd.Timedelta(days=140)],
+                                   output_df[output_df["date"] >= START + pd.Timedelta(days=140)])
+    # 新工位从第 150 天（90 天产量窗口之后）起有指标，之前的日期不再返回
+    assert len(state.metric_stations) == 4
+    assert state.ema_t == 0 and state.stations == []
+    assert final_rows["date"].min() == START + pd.Timedelta(days=150)
+    assert final_rows.groupby("date")["工位"].nunique().eq(4).all()
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
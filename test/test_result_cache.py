@@ -0,0 +1,116 @@
+import os
+import sys
+import importlib.util
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import config
+import ResultCache
+
+# 被缓存的函数放在临时模块中：源码版本按模块源码计算，改写源码即可模拟代码修改
+MODULE_SOURCE = '''
+import ResultCache
+
+CALLS = []
+
+@ResultCache.memoize(ignore=("n_workers",))
+def scale(df, factor, n_workers=1):
+    CALLS.append(factor)
+    return df * factor{suffix}
+'''
+
+
+def load_module(directory, suffix=""):
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, "cached_calc.py")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(MODULE_SOURCE.format(suffix=suffix))
+    spec = importlib.util.spec_from_file_location(f"cached_calc_{abs(hash(directory))}", path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    cache_dir = str(tmp_path / "results")
+    monkeypatch.setattr(config, "use_result_cache", True)
+    monkeypatch.setattr(config, "result_cache_dir", cache_dir)
+    monkeypatch.setattr(config, "result_cache_max_mb", 256)
+    return cache_dir
+
+
+def make_frame(seed=0, n_rows=50):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({"工位": np.arange(n_rows), "结果": rng.random(n_rows)})
+
+
+def test_hit_returns_equal_result(cache_dir, tmp_path):
+    calc = load_module(str(tmp_path / "v1"))
+    df = make_frame()
+    first = calc.scale(df, 2.0)
+    second = calc.scale(df.copy(), 2.0)
+    assert calc.CALLS == [2.0]
+    pd.testing.assert_frame_equal(second, first)
+
+
+def test_changed_input_misses(cache_dir, tmp_path):
+    calc = load_module(str(tmp_path / "v1"))
+    df = make_frame()
+    calc.scale(df, 2.0)
+    changed = df.copy()
+    changed.loc[3, "结果"] += 1e-9
+    calc.scale(changed, 2.0)
+    calc.scale(df, 3.0)
+    assert calc.CALLS == [2.0, 2.0, 3.0]
+
+
+def test_changed_source_misses(cache_dir, tmp_path):
+    # 两个目录下的同名模块：函数名与参数相同，只有源码不同
+    df = make_frame()
+    v1 = load_module(str(tmp_path / "v1"))
+    v1.scale(df, 2.0)
+    v2 = load_module(str(tmp_path / "v2"), suffix=" + 0")
+    v2.scale(df, 2.0)
+    assert v1.CALLS == [2.0] and v2.CALLS == [2.0]
+    # 源码不变时仍然命中
+    load_module(str(tmp_path / "v1")).scale(df, 2.0)
+    assert v1.CALLS == [2.0]
+
+
+def test_ignored_argument_does_not_change_key(cache_dir, tmp_path):
+    calc = load_module(str(tmp_path / "v1"))
+    df = make_frame()
+    calc.scale(df, 2.0, n_workers=1)
+    calc.scale(df, 2.0, n_workers=4)
+    assert calc.CALLS == [2.0]
+
+
+def test_evicts_least_recently_used(cache_dir, tmp_path):
+    calc = load_module(str(tmp_path / "v1"))
+    frames = [make_frame(seed, n_rows=2000) for seed in range(3)]
+    calc.scale(frames[0], 2.0)
+    entry_size = sum(entry.stat().st_size for entry in os.scandir(cache_dir))
+    # 只容得下两个结果
+    config.result_cache_max_mb = 2.5 * entry_size / (1024 * 1024)
+    calc.scale(frames[1], 2.0)
+    # 把已有结果的修改时间调早，避免文件系统时间精度影响顺序
+    for entry in os.scandir(cache_dir):
+        os.utime(entry.path, (1, 1))
+    # 再次使用第一个结果（命中时刷新修改时间），第二个成为最久未使用
+    calc.scale(frames[0], 2.0)
+    calc.scale(frames[2], 2.0)
+    assert len(os.listdir(cache_dir)) == 2
+    calc.CALLS.clear()
+    calc.scale(frames[0], 2.0)
+    calc.scale(frames[2], 2.0)
+    assert calc.CALLS == []
+    calc.scale(frames[1], 2.0)
+    assert calc.CALLS == [2.0]
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
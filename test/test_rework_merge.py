@@ -0,0 +1,41 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import ExtractData as ED
+
+
+def make_incidents():
+    return pd.DataFrame({
+        "id": ["101", "102", "103", None],
+        "defect_number": [1, 2, 3, 4],
+    })
+
+
+def make_rework(rows):
+    return pd.DataFrame(rows, columns=["quality_info_id", "返工检测成本", "返工总成本"])
+
+
+def test_merge_empty_rework():
+    # 返工表为空（如增量窗口内没有返工记录）时，成本列全部为空，不报错
+    merged = ED._merge_rework(make_incidents(), ED.aggregate_rework(make_rework([])))
+    assert len(merged) == 4
+    assert merged["quality_info_id"].isna().all()
+    assert merged[ED.REWORK_COST_COLS].isna().all().all()
+
+
+def test_merge_sums_rework_per_incident():
+    rework = make_rework([["101", 1.0, 10.0], ["101", 2.0, 20.0], ["103", np.nan, np.nan], ["999", 5.0, 50.0]])
+    merged = ED._merge_rework(make_incidents(), ED.aggregate_rework(rework))
+    assert len(merged) == 4
+    assert merged["quality_info_id"].isna().tolist() == [False, True, False, True]
+    np.testing.assert_array_equal(merged["返工检测成本"].to_numpy(), [3.0, np.nan, np.nan, np.nan])
+    np.testing.assert_array_equal(merged["返工总成本"].to_numpy(), [30.0, np.nan, np.nan, np.nan])
+
+
+if __name__ == "__main__":
+    test_merge_empty_rework()
+    test_merge_sums_rework_per_incident()
+    print("ok")
@@ -0,0 +1,107 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import StationSegmentation as SS
+
+
+# ---- 向量化之前的逐组循环实现（保留原样，作为回归基准） ----
+
+def legacy_split_station(merged_df):
+    shift_priority = {'白班': 0, '中班': 1, '夜班': 2}
+    station_data = {}
+    for station, group in merged_df.groupby('line_area_name'):
+        group['班次优先级'] = group['shift_name'].map(shift_priority)
+        sorted_group = group.sort_values(by=['date', '班次优先级'], ascending=[True, True]).drop(columns=['班次优先级'])
+        selected_columns = ['date', 'shift_name', 'process_result_name', 'defect_number', '返工检测成本', '返工总成本']
+        station_data[station] = sorted_group[selected_columns].reset_index(drop=True)
+    return station_data
+
+def legacy_shift_summary(station_data):
+    summary_data = {}
+    for station, df in station_data.items():
+        grouped = df.groupby(['date', 'shift_name'])
+        result = []
+        for (date, shift), group in grouped:
+            total_defects = group['defect_number'].sum()
+            rework_total = group[group['process_result_name'] == '返工']['defect_number'].sum()
+            scrap_total = group[group['process_result_name'] == '报废']['defect_number'].sum()
+            other_total = group[~group['process_result_name'].isin(['返工', '报废'])]['defect_number'].sum()
+            check_cost_total = group[group['process_result_name'] == '返工']['返工检测成本'].sum()
+            rework_cost_total = group[group['process_result_name'] == '返工']['返工总成本'].sum()
+            result.append({
+                'date': date,
+                'shift_name': shift,
+                '总缺陷数': total_defects,
+                '返工总数': rework_total,
+                '报废总数': scrap_total,
+                '其他总数': other_total,
+                '返工检测成本': check_cost_total,
+                '返工总成本': rework_cost_total
+            })
+        summary_df = pd.DataFrame(result)
+
+        shift_priority = {'白班': 0, '中班': 1, '夜班': 2}
+        summary_df['班次优先级'] = summary_df['shift_name'].map(shift_priority)
+        summary_df = summary_df.sort_values(by=['date', '班次优先级']).drop(columns=['班次优先级']).reset_index(drop=True)
+
+        summary_data[station] = summary_df
+    return summary_data
+
+
+def make_merged_df(n_rows=400, seed=0):
+    """
+    小规模合并结果：处理结果含返工/报废/其他/空值，返工成本含空值
+    """
+    rng = np.random.default_rng(seed)
+    results = np.array(['返工', '报废', '挑选', '偏差', None], dtype=object)
+    costs = rng.integers(0, 500, size=(n_rows, 2)).astype(np.float64)
+    costs[rng.random((n_rows, 2)) < 0.3] = np.nan
+    return pd.DataFrame({
+        'line_area_name': rng.choice(['Line 2 Link热处理', 'Line 3 履带装配', 'Paint 履带涂漆工位'], n_rows),
+        'date': pd.Timestamp('2024-03-01') + pd.to_timedelta(rng.integers(0, 10, n_rows), unit='D'),
+        'shift_name': rng.choice(['白班', '中班', '夜班'], n_rows),
+        'process_result_name': rng.choice(results, n_rows),
+        'defect_number': rng.integers(1, 6, n_rows),
+        '返工检测成本': costs[:, 0],
+        '返工总成本': costs[:, 1],
+    })
+
+
+def _plain(df):
+    # 分类列还原为其类别的类型，其余保持不变
+    return df.astype({c: df[c].cat.categories.dtype for c in df.columns if isinstance(df[c].dtype, pd.CategoricalDtype)})
+
+
+def test_shift_summary_matches_legacy():
+    merged_df = make_merged_df()
+    expected = legacy_shift_summary(legacy_split_station(merged_df))
+    result = SS.shift_summary(SS.split_station(merged_df))
+    assert sorted(result) == sorted(expected)
+    for station, df in expected.items():
+        pd.testing.assert_frame_equal(_plain(result[station]), df)
+
+
+def test_shift_summary_frame_matches_legacy():
+    merged_df = make_merged_df(seed=1)
+    expected = SS.from_station_dict(legacy_shift_summary(legacy_split_station(merged_df)), ['date', 'shift_name'])
+    result = SS.shift_summary_frame(SS.split_station_frame(merged_df))
+    pd.testing.assert_frame_equal(_plain(result.reset_index()), _plain(expected.reset_index()))
+
+
+def test_shift_summary_frame_categorical_input():
+    # 流水线中工位、班次、处理结果均为分类类型，结果应与普通列输入一致
+    merged_df = make_merged_df(seed=2)
+    expected = SS.from_station_dict(legacy_shift_summary(legacy_split_station(merged_df)), ['date', 'shift_name'])
+    categorical = merged_df.astype({c: "category" for c in ['line_area_name', 'shift_name', 'process_result_name']})
+    result = SS.shift_summary_frame(SS.split_station_frame(categorical))
+    pd.testing.assert_frame_equal(_plain(result.reset_index()), _plain(expected.reset_index()))
+
+
+if __name__ == "__main__":
+    test_shift_summary_matches_legacy()
+    test_shift_summary_frame_matches_legacy()
+    test_shift_summary_frame_categorical_input()
+    print("ok")
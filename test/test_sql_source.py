@@ -0,0 +1,76 @@
+import os
+import sys
+import warnings
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmark"))
+import config
+import ExtractData as ED
+import SqlSource as SQ
+from synthetic_data import generate_tables
+
+sa = pytest.importorskip("sqlalchemy")
+
+config.use_result_cache = False
+
+SORT_KEYS = {
+    "Combined_rework_costs": ["date", "line_id", "area_id", "id"],
+    "Real_output": ["date", "line_id", "regions_id", "shift_id"],
+}
+
+
+@pytest.fixture(scope="module")
+def tables():
+    return generate_tables(n_stations=6, n_days=200, incidents_per_shift=2)
+
+
+@pytest.fixture(scope="module")
+def source(tables):
+    # 内存 SQLite：StaticPool 让所有查询共用同一个连接（同一个内存数据库）
+    src = SQ.SqlSource("sqlite://", poolclass=sa.pool.StaticPool)
+    for name, df in tables.items():
+        df.to_sql(name, src.engine, index=False)
+    yield src
+    SQ.dispose_engines()
+
+
+def _sorted(df, keys):
+    return df.sort_values(keys, kind="stable").reset_index(drop=True)
+
+
+WINDOWS = [
+    (None, None),
+    ("2024-04-15", None),
+    (None, "2024-05-20"),
+    ("2024-04-15", "2024-05-20"),
+]
+
+
+@pytest.mark.parametrize("start_date,end_date", WINDOWS)
+@pytest.mark.parametrize("func", ["Combined_rework_costs", "Real_output"])
+def test_sql_window_matches_dict(tables, source, func, start_date, end_date):
+    # 数据库来源把日期窗口下推到 SQL，结果与已读取的业务表在内存中按 date_window 过滤一致
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        expected = getattr(ED, func)(tables, start_date, end_date)
+        result = getattr(ED, func)(source, start_date, end_date)
+    assert len(expected) > 0
+    pd.testing.assert_frame_equal(_sorted(result, SORT_KEYS[func]), _sorted(expected, SORT_KEYS[func]),
+                                  check_dtype=False, check_categorical=False)
+
+
+def test_source_date_range_matches_dict(tables, source):
+    # between() 给定的来源日期范围与按同一范围过滤后的业务表一致
+    start, end = pd.Timestamp("2024-03-01"), pd.Timestamp("2024-03-31")
+    # 返工表没有日期列，只取范围内质量事件对应的返工记录
+    in_range = {name: df[df["date"].between(start, end)] if "date" in df else df for name, df in tables.items()}
+    for func, keys in SORT_KEYS.items():
+        expected = getattr(ED, func)(in_range)
+        result = getattr(ED, func)(source.between(start, end))
+        pd.testing.assert_frame_equal(_sorted(result, keys), _sorted(expected, keys), check_dtype=False, check_categorical=False)
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -1,11 +1,134 @@
 import pandas as pd
 import numpy as np
+import logging
 import warnings
-from openpyxl import load_workbook
-from openpyxl.styles import PatternFill
-from openpyxl.formatting.rule import CellIsRule
-
-def GradeThreshold(summary_df, CV_High, CV_Low, excel_save_path):
+import FastExcel
+import DataFilter
+import Profiler
+
+logger = logging.getLogger(__name__)
+
+class RunningStats:
+    """
+    历史“结果”的流式均值/标准差（Welford 分批合并），等价于对全部历史数据做 np.mean / np.std
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.has_nan = False
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        if len(values) == 0:
+            return
+        # 与 np.mean 一致：历史数据中只要有 NaN，均值和标准差都为 NaN
+        if np.isnan(values).any():
+            self.has_nan = True
+        batch_count = len(values)
+        batch_mean = values.mean()
+        batch_m2 = ((values - batch_mean) ** 2).sum()
+        total = self.count + batch_count
+        delta = batch_mean - self.mean
+        self.mean += delta * batch_count / total
+        self.m2 += batch_m2 + delta ** 2 * self.count * batch_count / total
+        self.count = total
+
+    def mean_value(self):
+        return np.nan if self.has_nan else self.mean
+
+    def std_value(self):
+        return np.nan if self.has_nan else np.sqrt(self.m2 / self.count)
+
+def generate_conclusion(summary_df):
+    """
+    根据等级和各指标加权值生成结论：优为空，良给出加权值最大的指标，中给出最大的两个指标
+    """
+    weighted_cols = ['检验成本_加权值', '不合格率_加权值', '返工成本_加权值', '报废成本_加权值']
+    values = summary_df[weighted_cols].to_numpy(dtype=np.float64)
+    valid = ~np.isnan(values)
+
+    # 加权值从大到小排序（空值排在最后，数值相同时保持列顺序）
+    order = np.argsort(np.where(valid, -values, np.inf), axis=1, kind="stable")
+    sorted_values = np.take_along_axis(values, order, axis=1)
+    n_valid = valid.sum(axis=1)
+
+    # 加权值保留 4 位小数，避免舍入误差（如增量与全量计算）导致结论文本不同
+    names = np.asarray(weighted_cols, dtype=object)
+    top1 = names[order[:, 0]] + "=" + np.char.mod("%.4f", sorted_values[:, 0]).astype(object)
+    top2 = names[order[:, 1]] + "=" + np.char.mod("%.4f", sorted_values[:, 1]).astype(object)
+
+    grade = summary_df['等级'].to_numpy(dtype=object)
+    is_good = grade == '良'
+    is_bad = grade == '中'
+    conditions = [is_good & (n_valid >= 1), is_bad & (n_valid >= 2), is_bad & (n_valid >= 1)]
+    choices = [top1, top1 + "，" + top2, top1]
+    return pd.Series(np.select(conditions, choices, default=""), index=summary_df.index, dtype=object)
+
+def grade_period(current_time, time_values, history, CV_High, CV_Low):
+    """
+    计算一个时间段的分级阈值并分级，随后将本时间段数据并入历史统计量 history
+    返回 (各工位等级, T_high, T_low, 本时间段阈值信息)
+    """
+    n_stations = len(time_values)
+    mu_time = np.mean(time_values)
+    sigma_time = np.std(time_values)
+    cv_time = sigma_time / abs(mu_time) if mu_time != 0 else 0
+
+    if history.count > 0:
+        mu_historical = history.mean_value()
+        sigma_historical = history.std_value()
+        has_history = True
+    else:
+        mu_historical = mu_time
+        sigma_historical = sigma_time
+        has_history = False
+
+    if cv_time < CV_Low:
+        threshold_type = "历史统计量(CV < CV_Low)"
+        T_high = mu_historical + 0.5 * sigma_historical
+        T_low = mu_historical - 0.5 * sigma_historical
+    elif cv_time > CV_High:
+        threshold_type = "本时间段统计量(CV > CV_High)"
+        T_high = mu_time + 0.8 * sigma_time
+        T_low = mu_time - 0.8 * sigma_time
+    else:
+        threshold_type = "本时间段分位数（常规）"
+        T_high = np.quantile(time_values, 0.75)
+        T_low = np.quantile(time_values, 0.25)
+
+    # 分级：<= T_low 为“中”，>= T_high 为“优”，其余为“良”
+    is_bad = time_values <= T_low
+    is_good = ~is_bad & (time_values >= T_high)
+    grades = np.select([is_bad, is_good], ["中", "优"], "良").astype(object)
+    n_bad, n_good = int(np.count_nonzero(is_bad)), int(np.count_nonzero(is_good))
+
+    threshold_info = {
+        "时间段": current_time,
+        "工位数": n_stations,
+        "本时间段均值(μ_t)": round(mu_time, 4),
+        "本时间段标准差(σ_t)": round(sigma_time, 4),
+        "本时间段CV": round(cv_time, 4),
+        "是否有历史数据": has_history,
+        "历史数据量": history.count if has_history else 0,
+        "历史均值(μ_历史)": round(mu_historical, 4) if has_history else "无",
+        "历史标准差(σ_历史)": round(sigma_historical, 4) if has_history else "无",
+        "阈值计算方式": threshold_type,
+        "T_high": round(T_high, 8),
+        "T_low": round(T_low, 8),
+        "等级分布": {"优": n_good, "良": n_stations - n_good - n_bad, "中": n_bad},
+    }
+
+    history.update(time_values)
+    return grades, T_high, T_low, threshold_info
+
+@Profiler.stage()
+def GradeThreshold(summary_df, CV_High, CV_Low, excel_save_path=None, start_date=None, end_date=None, stations=None):
+    """
+    逐时间段计算分级阈值并分级。历史统计量按全部时间段累计，
+    结果（含结论、阈值信息与 Excel）只保留 [start_date, end_date] 内、stations 中的工位
+    """
     required_cols = ["工位", "更新时间", "结果"]
     if not all(col in summary_df.columns for col in required_cols):
         raise ValueError(f"summary_df 必须包含以下列:{required_cols}")
@@ -14,136 +137,62 @@ def GradeThreshold(summary_df, CV_High, CV_Low, excel_save_path):
         return pd.DataFrame(), {}
 
     summary_df = summary_df.copy()
-    all_times = sorted(summary_df["更新时间"].unique())
-    print(f"===== 分级阈值计算(共 {len(all_times)} 个时间段)=====\n")
+    # 预先建立「时间段 → 行号」索引，避免每个时间段全表扫描
+    time_positions = summary_df.groupby("更新时间", sort=True).indices
+    all_times = list(time_positions)
 
     time_thresholds = {}
-    historical_data = pd.DataFrame()
-    summary_df["等级"] = None
+    history = RunningStats()
+    results = summary_df["结果"].to_numpy(dtype=np.float64)
+    grades = np.full(len(summary_df), None, dtype=object)
+    t_high_values = np.full(len(summary_df), np.nan)
+    t_low_values = np.full(len(summary_df), np.nan)
 
+    # 循环内不做格式化与输出，逐时间段的诊断信息都记录在 time_thresholds 中
     for current_time in all_times:
-        time_data = summary_df[summary_df["更新时间"] == current_time].copy()
-        time_values = time_data["结果"].values
-        n_stations = len(time_data)
-        if n_stations == 0:
-            warnings.warn(f"时间段 {current_time} 无工位数据，跳过")
-            continue
-
-        mu_time = np.mean(time_values)
-        sigma_time = np.std(time_values)
-        cv_time = sigma_time / abs(mu_time) if mu_time != 0 else 0
-
-        if not historical_data.empty:
-            historical_values = historical_data["结果"].values
-            mu_historical = np.mean(historical_values)
-            sigma_historical = np.std(historical_values)
-            has_history = True
-        else:
-            mu_historical = mu_time
-            sigma_historical = sigma_time
-            has_history = False
-            warnings.warn(f"时间段 {current_time} 是第一个时间段，无历史数据，使用本时间段数据作为参考")
-
-        if cv_time < CV_Low:
-            threshold_type = "历史统计量(CV < CV_Low)"
-            T_high = mu_historical + 0.5 * sigma_historical
-            T_low = mu_historical - 0.5 * sigma_historical
-        elif cv_time > CV_High:
-            threshold_type = "本时间段统计量(CV > CV_High)"
-            T_high = mu_time + 0.8 * sigma_time
-            T_low = mu_time - 0.8 * sigma_time
-        else:
-            threshold_type = "本时间段分位数（常规）"
-            T_high = np.quantile(time_values, 0.75)
-            T_low = np.quantile(time_values, 0.25)
-
-        def get_grade(value):
-            if value <= T_low:
-                return "中"
-            elif value >= T_high:
-                return "优"
-            else:
-                return "良"
-
-        summary_df.loc[summary_df["更新时间"] == current_time, "等级"] = summary_df.loc[summary_df["更新时间"] == current_time, "结果"].apply(get_grade)
-        summary_df.loc[summary_df["更新时间"] == current_time, "T_high"] = T_high
-        summary_df.loc[summary_df["更新时间"] == current_time, "T_low"] = T_low
-
-
-        time_thresholds[current_time] = {
-            "时间段": current_time,
-            "工位数": n_stations,
-            "本时间段均值(μ_t)": round(mu_time, 4),
-            "本时间段标准差(σ_t)": round(sigma_time, 4),
-            "本时间段CV": round(cv_time, 4),
-            "是否有历史数据": has_history,
-            "历史数据量": len(historical_data) if has_history else 0,
-            "历史均值(μ_历史)": round(mu_historical, 4) if has_history else "无",
-            "历史标准差(σ_历史)": round(sigma_historical, 4) if has_history else "无",
-            "阈值计算方式": threshold_type,
-            "T_high": round(T_high, 8),
-            "T_low": round(T_low, 8)
-        }
-
-        historical_data = pd.concat([historical_data, time_data], ignore_index=True)
-
-        print(f"=== 时间段 {current_time} ===")
-        print(f"工位数: {n_stations} | 本时间段CV: {cv_time:.4f} | 阈值方式: {threshold_type}")
-        print(f"历史数据量: {len(historical_data) - n_stations} (截至上一时间段)")
-        print(f"T_high: {T_high:.8f} | T_low: {T_low:.8f}")
-        print(f"等级分布: {summary_df[summary_df['更新时间'] == current_time]['等级'].value_counts().to_dict()}\n")
+        positions = time_positions[current_time]
+        period_grades, T_high, T_low, threshold_info = grade_period(current_time, results[positions], history, CV_High, CV_Low)
+        grades[positions] = period_grades
+        t_high_values[positions] = T_high
+        t_low_values[positions] = T_low
+        time_thresholds[current_time] = threshold_info
+
+    summary_df["等级"] = grades
+    summary_df["T_high"] = t_high_values
+    summary_df["T_low"] = t_low_values
+
+    # 历史统计量已包含范围之前的时间段，此后只保留需要输出的行
+    summary_df = DataFilter.select_rows(summary_df, "更新时间", "工位", start_date, end_date, stations).copy()
+    if start_date is not None or end_date is not None:
+        selected = DataFilter.date_mask(all_times, start_date, end_date)
+        all_times = [t for t, keep in zip(all_times, selected) if keep]
+        time_thresholds = {t: time_thresholds[t] for t in all_times}
 
     # 添加结论列
-    def generate_conclusion(row):
-        if row['等级'] == '优':
-            return ""
-        weighted_cols = ['检验成本_加权值', '不合格率_加权值', '返工成本_加权值', '报废成本_加权值']
-        values = {col: row[col] for col in weighted_cols if pd.notnull(row[col])}
-        sorted_items = sorted(values.items(), key=lambda x: x[1], reverse=True)
-        if row['等级'] == '良' and sorted_items:
-            col, val = sorted_items[0]
-            return f"{col}={val}"
-        elif row['等级'] == '中' and len(sorted_items) >= 2:
-            (col1, val1), (col2, val2) = sorted_items[:2]
-            return f"{col1}={val1}，{col2}={val2}"
-        elif row['等级'] == '中' and sorted_items:
-            col, val = sorted_items[0]
-            return f"{col}={val}"
-        return ""
-
-    summary_df['结论'] = summary_df.apply(generate_conclusion, axis=1)
+    summary_df['结论'] = generate_conclusion(summary_df)
 
     result_df = summary_df.copy()
 
-    print("===== 所有时间段处理完成 =====")
-    print(f"有效时间段数:{len(time_thresholds)}")
-    print(f"总打分记录数:{len(result_df)}")
-    if not result_df.empty:
-        print(f"全局等级分布:{result_df['等级'].value_counts().to_dict()}")
+    # 按 start_date 过滤后的第一个时间段可能已有历史数据，此时不输出该提示
+    if all_times and not time_thresholds[all_times[0]]["是否有历史数据"]:
+        logger.info("时间段 %s 是第一个时间段，无历史数据，使用本时间段数据作为参考", all_times[0])
+    if logger.isEnabledFor(logging.DEBUG):
+        for info in time_thresholds.values():
+            logger.debug("时间段 %s | 工位数: %d | 本时间段CV: %.4f | 阈值方式: %s | 历史数据量: %d | T_high: %.8f | T_low: %.8f | 等级分布: %s",
+                         info["时间段"], info["工位数"], info["本时间段CV"], info["阈值计算方式"], info["历史数据量"],
+                         info["T_high"], info["T_low"], info["等级分布"])
+    logger.info("分级阈值计算完成：有效时间段数 %d，总打分记录数 %d，全局等级分布 %s",
+                len(time_thresholds), len(result_df), result_df["等级"].value_counts().to_dict())
+
+    # 未指定保存路径时只返回内存中的结果
+    if excel_save_path is None:
+        return result_df, time_thresholds
 
     try:
-        result_df.to_excel(excel_save_path, index=False, engine="openpyxl")
-
-        wb = load_workbook(excel_save_path)
-        ws = wb.active
-        ws.title = "工位等级结果"
-
-        green_fill = PatternFill(start_color="E6F4EA", end_color="E6F4EA", fill_type="solid")
-        red_fill = PatternFill(start_color="FCE8E6", end_color="FCE8E6", fill_type="solid")
-
-        grade_col_idx = list(result_df.columns).index("等级") + 1
-        col_letter = chr(64 + grade_col_idx) if grade_col_idx <= 26 else 'Z'
-        data_range = f"{col_letter}2:{col_letter}{len(result_df) + 1}"
-
-        rule_good = CellIsRule(operator="equal", formula=['"优"'], fill=green_fill)
-        rule_bad = CellIsRule(operator="equal", formula=['"中"'], fill=red_fill)
-
-        ws.conditional_formatting.add(data_range, rule_good)
-        ws.conditional_formatting.add(data_range, rule_bad)
-
-        wb.save(excel_save_path)
-        print(f"\n✅ Excel已生成! 路径:{excel_save_path}")
-        print(f"格式说明：优=浅绿底，中=浅红底，良=无底色")
+        # 数据与“等级”列条件格式一次写出，不再写完后用 load_workbook 重新打开
+        FastExcel.write_frame(excel_save_path, result_df, sheet_name="工位等级结果",
+                              conditional_formats=[("等级", "优", "#E6F4EA"), ("等级", "中", "#FCE8E6")])
+        logger.info("Excel已生成! 路径:%s（格式说明：优=浅绿底，中=浅红底，良=无底色）", excel_save_path)
 
     except Exception as e:
         raise RuntimeError(f"Excel生成失败:{str(e)}")
@@ -1,72 +1,169 @@
 import pandas as pd
+import numpy as np
 import warnings
 import config
+import Profiler
+import DataFilter
+import ResultCache
 
-# 定义函数：结合专家打分和 CRITIC 权重
-def CombinedWeight(df, expert_weights, expert_weights_percent):
-    # 按更新时间排序
-    df = df.sort_values(by="更新时间")
-    z_values = sorted(df["更新时间"].unique())  # 时间从小到大
-    
+class CriticAccumulator:
+    """
+    CRITIC 权重的增量统计量
+
+    按指标对 (i, j) 维护两两同时非空的计数、和、平方和、交叉积及最小/最大值，
+    新增一个时间点的数据只需 O(k²) 即可得到截至该时间点的 CRITIC 权重。
+    数据先减去各指标首个非空值再累加，以减小平方和相减带来的舍入误差。
+    """
+
+    def __init__(self, cols):
+        k = len(cols)
+        self.cols = list(cols)
+        self.n_rows = 0
+        self.offset = np.full(k, np.nan)
+        self.count = np.zeros((k, k))
+        self.sum = np.zeros((k, k))
+        self.sum_sq = np.zeros((k, k))
+        self.cross = np.zeros((k, k))
+        self.min = np.full((k, k), np.inf)
+        self.max = np.full((k, k), -np.inf)
+
+    def update(self, values):
+        """
+        累加一个时间点的数据（形状 (m, k)），返回截至该时间点的 CRITIC 权重
+        """
+        return self.update_many(values, [0])[-1]
+
+    def update_many(self, values, starts):
+        """
+        按时间顺序累加多个时间点的数据，starts 为每个时间点在 values 中的起始行号，
+        返回每个时间点截至当时的 CRITIC 权重，形状 (时间点数, k)
+        """
+        values = np.asarray(values, dtype=np.float64)
+        starts = np.asarray(starts, dtype=np.intp)
+
+        # 首次出现的指标以其第一个非空值作为平移参考值
+        present = ~np.isnan(values)
+        new_cols = np.isnan(self.offset) & present.any(axis=0)
+        if new_cols.any():
+            first = present.argmax(axis=0)
+            self.offset[new_cols] = values[first[new_cols], np.flatnonzero(new_cols)]
+        x = values - np.where(np.isnan(self.offset), 0, self.offset)
+
+        # 逐行外积后按时间点分段求和，再沿时间累计
+        both = (present[:, :, None] & present[:, None, :])
+        x0 = np.where(present, x, 0)
+        x_i = np.broadcast_to(x0[:, :, None], both.shape)
+        x_raw = np.broadcast_to(x[:, :, None], both.shape)
+        batch = {
+            "count": both.astype(np.float64),
+            "sum": np.where(both, x_i, 0),
+            "sum_sq": np.where(both, x_i ** 2, 0),
+            "cross": x0[:, :, None] * x0[:, None, :],
+        }
+        cum = {}
+        for name, arr in batch.items():
+            cum[name] = np.cumsum(np.add.reduceat(arr, starts, axis=0), axis=0) + getattr(self, name)
+        cum["min"] = np.minimum.accumulate(np.vstack([self.min[None], np.minimum.reduceat(np.where(both, x_raw, np.inf), starts, axis=0)]), axis=0)[1:]
+        cum["max"] = np.maximum.accumulate(np.vstack([self.max[None], np.maximum.reduceat(np.where(both, x_raw, -np.inf), starts, axis=0)]), axis=0)[1:]
+        n_rows = self.n_rows + np.cumsum(np.diff(np.append(starts, len(values))))
+
+        # 保存最后一个时间点的状态
+        self.n_rows = int(n_rows[-1])
+        for name, arr in cum.items():
+            setattr(self, name, arr[-1].copy())
+
+        return critic_weights(n_rows, cum["count"], cum["sum"], cum["sum_sq"], cum["cross"], cum["min"], cum["max"])
+
+    def weights(self):
+        """
+        当前状态下的 CRITIC 权重
+        """
+        return critic_weights(np.array([self.n_rows]), self.count[None], self.sum[None], self.sum_sq[None],
+                              self.cross[None], self.min[None], self.max[None])[0]
+
+def critic_weights(n_rows, count, total, sum_sq, cross, min_vals, max_vals):
+    """
+    由累计统计量计算 CRITIC 权重，除 n_rows 外各参数形状均为 (时间点数, k, k)
+    """
+    k = count.shape[-1]
+    diag = np.arange(k)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # 1. 极差标准化后的标准差 = 原始标准差 / 极差；极差为0或数据不足时记为0
+        n = count[:, diag, diag]
+        s = total[:, diag, diag]
+        q = sum_sq[:, diag, diag]
+        variance = np.maximum(q - s ** 2 / n, 0) / (n - 1)
+        ranges = max_vals[:, diag, diag] - min_vals[:, diag, diag]
+        std_dev = np.where(ranges > 0, np.sqrt(variance) / ranges, 0)
+        std_dev = np.nan_to_num(std_dev, nan=0.0)
+
+        # 2. 两两相关系数（极差标准化不改变相关系数）；某一方在成对数据上为常数时为 NaN
+        s_t = np.swapaxes(total, 1, 2)
+        sxx = np.maximum(sum_sq - total ** 2 / count, 0)
+        syy = np.maximum(np.swapaxes(sum_sq, 1, 2) - s_t ** 2 / count, 0)
+        sxy = cross - total * s_t / count
+        constant = (max_vals <= min_vals)
+        constant = constant | np.swapaxes(constant, 1, 2)
+        sxx = np.where(constant, 0, sxx)
+        syy = np.where(constant, 0, syy)
+        divisor = np.sqrt(sxx * syy)
+        corr = np.where((count >= 1) & (divisor != 0), sxy / divisor, np.nan)
+        corr[:, diag, diag] = np.where(constant[:, diag, diag], np.nan, 1.0)
+
+    # 由累计量相减得到的相关系数有舍入误差：限制在 [-1, 1]，并把与 ±1 相差不超过 1e-12 的值取为 ±1，
+    # 否则完全相关时冲突性不为 0，分数全为 0 时平均分配权重的分支不会触发
+    corr = np.clip(corr, -1, 1)
+    corr = np.where(np.abs(np.abs(corr) - 1) <= 1e-12, np.sign(corr), corr)
+
+    # 3. 冲突性矩阵列求和；数据不足2条时无法计算相关性，默认冲突为0
+    conflict_sum = np.nansum(1 - corr, axis=1)
+    conflict_sum[np.asarray(n_rows) < 2] = 0
+
+    # 4. 计算CRITIC权重，分数全为0时平均分配
+    critic_score = std_dev * conflict_sum
+    score_sum = critic_score.sum(axis=1, keepdims=True)
+    equal = np.full_like(critic_score, 1 / k)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(score_sum == 0, equal, critic_score / score_sum)
+
+def combine_weights(critic_weights_df, expert_weights, expert_weights_percent):
+    """
+    按比例融合专家权重与每个时间点的CRITIC权重，并确保每行权重和为1
+    """
     # 计算专家权重（所有时间点保持一致）
     expert_df = pd.DataFrame(expert_weights)
     expert_mean_weights = expert_df.mean()  # 专家权重平均值，固定不变
-    
-    # 存储每个时间点的合并权重
-    combined_weights_list = []
-    
-    # 直接遍历每个时间点
-    for current_time in z_values:
-        # 获取截至当前时间点的所有历史数据（包括当前时间点）
-        current_data = df[df['更新时间'] <= current_time].copy()
-        
-        # 1. 极差标准化，处理除零情况
-        cols = ['检验成本', '不合格率', '返工成本', '报废成本']
-        max_vals = current_data[cols].max()
-        min_vals = current_data[cols].min()
-        ranges = max_vals - min_vals
-        # 当极差为0时，避免除零错误，标准化为0
-        normalized_df = (current_data[cols] - min_vals) / ranges.where(ranges != 0, 1)
-        
-        # 2. 计算标准差
-        std_dev = normalized_df.std()
-        # 处理只有一个数据点时标准差为NaN的情况
-        std_dev = std_dev.fillna(0)
-        
-        # 3. 计算冲突性矩阵及总和
-        if len(current_data) < 2:
-            # 数据不足2条时无法计算相关性，默认冲突为0
-            conflict_sum = pd.Series([0]*len(cols), index=cols)
-        else:
-            correlation_matrix = normalized_df.corr()
-            conflict_matrix = 1 - correlation_matrix  # 冲突性矩阵
-            conflict_sum = conflict_matrix.sum()
-        
-        # 4. 计算CRITIC权重
-        critic_score = std_dev * conflict_sum
-        # 处理分数为0的特殊情况（平均分配权重）
-        if critic_score.sum() == 0:
-            critic_weights = pd.Series([1/len(critic_score)]*len(critic_score), 
-                                      index=critic_score.index)
-        else:
-            critic_weights = critic_score / critic_score.sum()
-        
-        # 5. 合并权重（专家权重与CRITIC权重各占50%）
-        combined = expert_weights_percent * expert_mean_weights + (1 - expert_weights_percent) * critic_weights
-        combined = combined / combined.sum()  # 确保权重和为1
-        
-        # 存储当前时间点的权重，包含对应的时间
-        weight_dict = {"更新时间": current_time}
-        weight_dict.update(combined.round(4).to_dict())
-        combined_weights_list.append(weight_dict)
-    
-    # 将列表转换为DataFrame
-    weight_df = pd.DataFrame(combined_weights_list)
-    return weight_df
+
+    # 合并权重（专家权重与CRITIC权重各占50%）
+    combined = expert_weights_percent * expert_mean_weights + (1 - expert_weights_percent) * critic_weights_df
+    return combined.div(combined.sum(axis=1), axis=0)
+
+# 定义函数：结合专家打分和 CRITIC 权重
+@Profiler.stage()
+@ResultCache.memoize()
+def CombinedWeight(df, expert_weights, expert_weights_percent, start_date=None, end_date=None):
+    # CRITIC 统计量按时间累计：只丢弃 end_date 之后的数据，start_date 只过滤输出
+    df = DataFilter.select_rows(df, "更新时间", end_date=end_date)
+
+    # 按更新时间排序
+    df = df[df["更新时间"].notna()].sort_values(by="更新时间")
+    z_codes, z_values = pd.factorize(df["更新时间"], sort=True)  # 时间从小到大
+
+    # 按时间点增量累计统计量，一次得到每个时间点截至当时的 CRITIC 权重
+    cols = ['检验成本', '不合格率', '返工成本', '报废成本']
+    starts = np.flatnonzero(np.r_[True, z_codes[1:] != z_codes[:-1]])
+    accumulator = CriticAccumulator(cols)
+    critic_weights_df = pd.DataFrame(accumulator.update_many(df[cols].to_numpy(dtype=np.float64), starts), columns=cols)
+
+    # 每个时间点的权重，包含对应的时间
+    weight_df = combine_weights(critic_weights_df, expert_weights, expert_weights_percent).round(4)
+    weight_df.insert(0, "更新时间", np.asarray(z_values))
+    return DataFilter.select_rows(weight_df, "更新时间", start_date=start_date).reset_index(drop=True)
 
 def main():
     # Load the Excel file
     df = pd.read_excel("./data/final_result.xlsx", engine="openpyxl")
+    df = DataFilter.select_rows(df, "date", end_date=config.end_date)
     
     df["更新时间"] = df["date"]
     df["不合格率"] = 1 - df["合格率"]
@@ -89,7 +186,7 @@ def main():
     ]
 
     expert_weights_percent = 0.5
-    final_weights = CombinedWeight(df, expert_weights, expert_weights_percent)
+    final_weights = CombinedWeight(df, expert_weights, expert_weights_percent, config.start_date, config.end_date)
 
     # 设置显示所有行（取消行数限制）
     pd.set_option('display.max_rows', None)